@@ -2,11 +2,14 @@
 from __future__ import annotations
 
 import os
-from typing import TypedDict, Annotated, Sequence, List, Dict, Any, Optional
+from typing import TypedDict, Annotated, Sequence, List, Dict, Any, Optional, Callable, Awaitable, Tuple
 import operator
 import datetime
 import asyncio
+import inspect
 import json
+import logging
+import time
 from dotenv import load_dotenv
 load_dotenv()
 import datetime
@@ -23,12 +26,27 @@ from langgraph_swarm.swarm import SwarmState
 from functools import cache # Used for Python 3.9+
 from backend.agents.dynamic_agents.tools import (transfer_to_reflection_agent, transfer_to_main_agent, math_counting_tool,
                                  parallel_graphql_executor, graphql_introspection_agent_tool,
-                                 dma_code_lookup_tool, graphql_schema_tool_2
+                                 dma_code_lookup_tool, graphql_schema_tool_2,
+                                 dma_name_search_tool, zip_code_location_lookup_tool, zip_set_algebra_tool, stored_result_reader, label_zip_codes,
+                                 warm_up_reference_data
                                 )
 from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage, ToolMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langgraph.graph import StateGraph, START, END
-from backend.agents.dynamic_agents.prompts import REFLECTION_PROMPT, MAIN_PROMPT, CONTEXTUALIZER_SYSTEM_PROMPT
+from backend.agents.dynamic_agents.prompts import (REFLECTION_PROMPT, MAIN_PROMPT, CONTEXTUALIZER_SYSTEM_PROMPT,
+                                                   CONVERSATION_SUMMARY_PROMPT, REFINE_PROMPT, REFINE_PLAIN_TEXT_PROMPT)
+from backend.agents.dynamic_agents.prompt_cache import LLM_STREAM_USAGE, prompt_cache_stats
+from backend.agents.dynamic_agents.deadline import (CONTEXTUALIZER_DEADLINE_SHARE, DEADLINE_MIN_REFINE_SECONDS,
+                                                    DEADLINE_REFINE_RESERVE_SECONDS, deadline_stats, stage_timeout)
+from backend.agents.dynamic_agents.conversation_summary import format_turns, select_history, turns_to_summarize
+from backend.agents.dynamic_agents.answer_cache import ANSWER_CACHE, answer_cache, answer_cache_scope
+from backend.agents.dynamic_agents.answer_cleanup import HANDOFF_TOOL_PREFIX, clean_answer, refinement_skip_reason
+from backend.agents.dynamic_agents.result_store import thread_id_from_config
+from backend.agents.dynamic_agents.tool_outputs import resolve_result_handles, select_tool_outputs
+from backend.agents.dynamic_agents.query_classifier import (CONTEXTUALIZER_FAST_PATH, get_query_classifier,
+                                                            record_contextualizer_decision)
+from backend.agents.dynamic_agents.schema_cache import (SCHEMA_APPENDIX_DELIMITER_START, SCHEMA_APPENDIX_DELIMITER_END,
+                                                        expand_schema_references, schema_cache, schema_reference_message)
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langchain_core.runnables import RunnableConfig
 from pydantic import BaseModel, Field
@@ -37,6 +55,8 @@ from pydantic import BaseModel, Field
 from backend.core.llm import get_telogical_primary_llm, get_telogical_secondary_llm
 from backend.memory.postgres import get_telogical_postgres_saver
 
+log = logging.getLogger(__name__)
+
 # Module-level variables to hold the compiled graph instances
 _compiled_telogical_swarm: Optional[Any] = None
 _compiled_telogical_swarm_refined: Optional[Any] = None
@@ -62,8 +82,12 @@ async def get_saver() -> AsyncPostgresSaver:
 main_agent_tools = [
     parallel_graphql_executor,
     dma_code_lookup_tool,
+    dma_name_search_tool,
+    zip_code_location_lookup_tool,
+    zip_set_algebra_tool,
     graphql_schema_tool_2,
     math_counting_tool,
+    stored_result_reader,
     transfer_to_reflection_agent
 ]
 
@@ -108,14 +132,42 @@ async def create_swarm_workflow(checkpointer):
 
 # ------------------------------------ Agent 2 (Refined Workflow) ------------------------------------
 
+# Key in node_timings of the turn the timings belong to (the number of messages the turn started with)
+TIMINGS_TURN_KEY = "_turn"
+
+
+def _merge_timings(left: Optional[Dict[str, float]], right: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """
+    Reducer for node_timings: parallel branches each add their own entry.
+
+    node_timings is checkpointed with the thread, so the first entry of a new turn
+    replaces the previous turn's timings instead of being merged into them.
+    """
+    left, right = left or {}, right or {}
+    if right.get(TIMINGS_TURN_KEY) != left.get(TIMINGS_TURN_KEY):
+        return dict(right)
+    return {**left, **right}
+
+
 class RefinedAgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], operator.add]
     app_output: str
     # refined_output: str
     agent_tool_outputs: Annotated[Optional[List[str]], None]
-    graphql_schema: Annotated[Optional[str], None]
+    graphql_schema: Annotated[Optional[str], None]          # Schema reference ('schema:sha256:...'), see schema_cache
     internal_context_insights: Annotated[Optional[str], None] # NEW FIELD
     requires_schema_flag: Annotated[Optional[bool], None]    # For the boolean decision
+    schema_refreshed: Annotated[Optional[bool], None]        # Set by prepare_schema: schema (re)fetched this turn
+    schema_turn: Annotated[Optional[int], None]              # Set by prepare_schema: turn number of the session
+    last_schema_injection_turn: Annotated[Optional[int], None]  # Set by prepare_schema: turn the schema was last fetched
+    data_tool_calls: Annotated[Optional[int], None]          # Set by app_agent: tools called this turn, without hand-offs
+    conversation_summary: Annotated[Optional[str], None]     # Set by summarize_history: summary of the older turns
+    summarized_turns: Annotated[Optional[int], None]         # Set by summarize_history: turns the summary covers
+    contextualized_query: Annotated[Optional[str], None]     # Set by contextualize_query: self-contained latest query
+    answer_cache_scope: Annotated[Optional[str], None]       # Set by answer_cache: scope to cache this turn's answer in
+    answer_cache_hit: Annotated[Optional[bool], None]        # Set by answer_cache: answered from the cache
+    deadline_exceeded: Annotated[Optional[bool], None]       # Set by app_agent: the swarm was stopped at the deadline
+    node_timings: Annotated[Optional[Dict[str, float]], _merge_timings]  # Seconds per node of the latest turn
 
 
 class QueryContextAnalysis(BaseModel):
@@ -125,9 +177,13 @@ class QueryContextAnalysis(BaseModel):
     requires_database_access: bool = Field(
         description="True if the LATEST USER QUERY implies a need to consult Telogical's telecommunications database (and thus its GraphQL schema) for a factual answer. False for general conversation, greetings, questions about the AI's identity, or queries that can be answered from general knowledge without specific data lookup."
     )
+    standalone_query: str = Field(
+        default="",
+        description="The LATEST USER QUERY rewritten as one self-contained question, with references to earlier turns resolved and every provider, location, ZIP code, product and number kept. The query itself if it is already self-contained."
+    )
     
-# Global dictionary to track schema injection frequency per user/session
-schema_injection_tracker: Dict[str, Dict[str, int]] = {}
+# Schema injection frequency is tracked per thread in RefinedAgentState (schema_turn and
+# last_schema_injection_turn), so it is checkpointed with the conversation and shared by all workers
 
 MAX_TURNS_BETWEEN_SCHEMA_INJECTION = 20
 MIN_TURNS_BEFORE_REINJECT_ON_KEYWORD = 3
@@ -211,7 +267,7 @@ async def contextualize_query_node(state: RefinedAgentState, config: RunnableCon
             processed_history_messages.append(converted_msg)
 
     if not processed_history_messages:
-        return {"internal_context_insights": None, "requires_schema_flag": False} # Default
+        return {"internal_context_insights": None, "requires_schema_flag": False, "contextualized_query": None} # Default
 
     latest_user_query_content: Optional[str] = None
     current_message_to_analyze = processed_history_messages[-1]
@@ -219,7 +275,22 @@ async def contextualize_query_node(state: RefinedAgentState, config: RunnableCon
         latest_user_query_content = _extract_string_content_from_message(current_message_to_analyze)
     
     if not latest_user_query_content or not latest_user_query_content.strip():
-        return {"internal_context_insights": None, "requires_schema_flag": False}
+        return {"internal_context_insights": None, "requires_schema_flag": False, "contextualized_query": None}
+
+    # Greetings, thanks, bare zip codes and clear-cut data questions are decided locally
+    if CONTEXTUALIZER_FAST_PATH:
+        has_history = any(isinstance(m, (HumanMessage, AIMessage)) for m in processed_history_messages[:-1])
+        fast_path = get_query_classifier().classify(latest_user_query_content, has_history=has_history)
+        if fast_path.confident:
+            log.debug(f"Contextualizer skipped ({fast_path.source}, confidence {fast_path.confidence:.3f})")
+            # Queries referring to earlier turns (also elliptically) go to the LLM. The rest look
+            # standalone, but only a first message is known to be: later ones are not resolved,
+            # so they are not used as answer cache keys.
+            return {
+                "internal_context_insights": None,
+                "requires_schema_flag": fast_path.requires_database_access,
+                "contextualized_query": None if has_history else latest_user_query_content,
+            }
 
     history_for_prompt_messages: List[BaseMessage] = []
     if len(processed_history_messages) > 1:
@@ -249,9 +320,15 @@ async def contextualize_query_node(state: RefinedAgentState, config: RunnableCon
 
     formatted_insights_for_state: Optional[str] = None
     schema_needed_flag: bool = True # Default to False
+    standalone_query: Optional[str] = None  # Keys the answer cache; not set when the LLM gives none
+
+    # A share of the request's remaining time; the swarm and the refinement need the rest
+    contextualizer_timeout = stage_timeout(config, share=CONTEXTUALIZER_DEADLINE_SHARE)
 
     try:
-        analysis_result: QueryContextAnalysis = await context_llm_chain.ainvoke(prompt_input_dict)
+        analysis_result: QueryContextAnalysis = await asyncio.wait_for(
+            context_llm_chain.ainvoke(prompt_input_dict), contextualizer_timeout
+        )
         # print(f"Contextualize Insights:\n{analysis_result.contextual_insights}") # Optional debug
         # print(f"Schema Needed Flag: {analysis_result.requires_database_access}") # Optional debug
         
@@ -267,8 +344,16 @@ async def contextualize_query_node(state: RefinedAgentState, config: RunnableCon
                  f"(No specific bullet points generated by contextualizer)"
             )
         schema_needed_flag = analysis_result.requires_database_access
+        standalone_query = (analysis_result.standalone_query or "").strip() or None
+        record_contextualizer_decision(latest_user_query_content, schema_needed_flag)
         # print(f"Contextualize Node: Insights: {formatted_insights_for_state}, Requires Schema: {schema_needed_flag}")
 
+    except asyncio.TimeoutError:
+        # Out of time: the swarm goes ahead without insights and treats the query as a data question
+        deadline_stats.exceeded("contextualize_query")
+        log.warning(f"Contextualizer stopped after {contextualizer_timeout:.1f}s to meet the request deadline")
+        formatted_insights_for_state = None
+        schema_needed_flag = True
     except Exception as e:
         print(f"Error in contextualizer LLM call or parsing structured output: {e}")
         # Provide a fallback insight message indicating failure
@@ -279,12 +364,12 @@ async def contextualize_query_node(state: RefinedAgentState, config: RunnableCon
 
     return {
         "internal_context_insights": formatted_insights_for_state,
-        "requires_schema_flag": schema_needed_flag
+        "requires_schema_flag": schema_needed_flag,
+        "contextualized_query": standalone_query,
     }
 
 
-SCHEMA_APPENDIX_DELIMITER_START = "\n\n--- BEGIN ATTACHED GRAPHQL SCHEMA (FOR AI REFERENCE) ---\n"
-SCHEMA_APPENDIX_DELIMITER_END = "\n--- END ATTACHED GRAPHQL SCHEMA ---"
+# SCHEMA_APPENDIX_DELIMITER_START / _END are defined in schema_cache, which also parses them
 
 
 # (Other imports, constants like SCHEMA_APPENDIX_DELIMITER_START/END,
@@ -295,44 +380,44 @@ SCHEMA_APPENDIX_DELIMITER_END = "\n--- END ATTACHED GRAPHQL SCHEMA ---"
 # helper functions like _convert_to_base_message, _extract_string_content_from_message,
 # async_graphql_schema, and global constants like SCHEMA_TRIGGER_KEYWORDS,
 # MIN_TURNS_BEFORE_REINJECT_ON_KEYWORD, MAX_TURNS_BETWEEN_SCHEMA_INJECTION,
-# schema_injection_tracker, SCHEMA_APPENDIX_DELIMITER_START, SCHEMA_APPENDIX_DELIMITER_END
+# SCHEMA_APPENDIX_DELIMITER_START, SCHEMA_APPENDIX_DELIMITER_END
 # are defined as in your complete code that you provided last)
 
-async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
-    session_id = str(config.get("configurable", {}).get("thread_id", "default_session"))
-    if session_id not in schema_injection_tracker: # schema_injection_tracker should be defined globally
-        schema_injection_tracker[session_id] = {"turn_count": 0, "last_injection_turn": 0}
-    schema_injection_tracker[session_id]["turn_count"] += 1
-    current_turn = schema_injection_tracker[session_id]["turn_count"]
-
-    additional_messages_for_state: List[BaseMessage] = []
-    
-    # --- 1. Process Incoming Messages from main graph state ---
-    processed_input_messages: List[BaseMessage] = []
-    for msg_data in state.get("messages", []):
-        converted_msg = _convert_to_base_message(msg_data) # Ensure helper is defined
-        if converted_msg:
-            processed_input_messages.append(converted_msg)
+async def prepare_schema_node(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Decide whether the GraphQL schema must be (re)fetched this turn and fetch it.
 
-    # --- 2. Get information from state (set by contextualize_query_node and previous runs) ---
-    schema_to_use_for_this_run = state.get("graphql_schema")
-    context_insights_str = state.get("internal_context_insights")
-    # query_needs_schema_flag is retrieved but its use for appending schema to HumanMessage is now superseded by current_turn check
-    # query_needs_schema_flag = state.get("requires_schema_flag", True) # As per your snippet's default
+    Runs in parallel with contextualize_query (the decision only depends on the
+    turn count and the latest user message), so the schema fetch no longer waits
+    for the contextualizer LLM call.
 
-    # --- 3. Decide if the schema string in state needs to be updated from source ---
-    # (This Fetch Logic remains UNCHANGED from your provided code - it updates schema_to_use_for_this_run)
+    The turn count and the turn of the last fetch are kept in the thread's state.
+    Threads checkpointed before these fields existed start from the number of
+    user messages in their history. The state holds a reference to the schema;
+    the text is kept in the process schema cache.
+    """
+    session_id = str(config.get("configurable", {}).get("thread_id", "default_session"))
+    messages = state.get("messages", [])
+    previous_turn = state.get("schema_turn")
+    if previous_turn is None:
+        previous_turn = max(0, sum(1 for m in messages if isinstance(_convert_to_base_message(m), HumanMessage)) - 1)
+    current_turn = previous_turn + 1
+    last_injection_turn = state.get("last_schema_injection_turn") or 0
+
+    stored_schema = state.get("graphql_schema")
+    schema_to_use_for_this_run = schema_cache.resolve(stored_schema)
     latest_user_message_content = ""
-    if processed_input_messages and isinstance(processed_input_messages[-1], HumanMessage):
-        latest_user_message_content = _extract_string_content_from_message(processed_input_messages[-1])
+    latest_message = _convert_to_base_message(messages[-1]) if messages else None
+    if isinstance(latest_message, HumanMessage):
+        latest_user_message_content = _extract_string_content_from_message(latest_message)
 
     should_fetch_new_schema_from_source = False
-    if not schema_to_use_for_this_run:
+    if not stored_schema:
         should_fetch_new_schema_from_source = True
     elif latest_user_message_content and any(k.lower() in latest_user_message_content.lower() for k in SCHEMA_TRIGGER_KEYWORDS):
-        if (current_turn - schema_injection_tracker[session_id].get("last_injection_turn",0)) >= MIN_TURNS_BEFORE_REINJECT_ON_KEYWORD:
+        if (current_turn - last_injection_turn) >= MIN_TURNS_BEFORE_REINJECT_ON_KEYWORD:
             should_fetch_new_schema_from_source = True
-    elif (current_turn - schema_injection_tracker[session_id].get("last_injection_turn",0)) >= MAX_TURNS_BETWEEN_SCHEMA_INJECTION:
+    elif (current_turn - last_injection_turn) >= MAX_TURNS_BETWEEN_SCHEMA_INJECTION:
         should_fetch_new_schema_from_source = True
 
     if should_fetch_new_schema_from_source:
@@ -341,27 +426,206 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
             fetched_schema_str = schema_data.get("documentation")
             if fetched_schema_str and fetched_schema_str.strip():
                 schema_to_use_for_this_run = fetched_schema_str
-                schema_injection_tracker[session_id]["last_injection_turn"] = current_turn
+                last_injection_turn = current_turn
             elif not schema_to_use_for_this_run:
                 schema_to_use_for_this_run = None
         except Exception as e:
             print(f"Warning: Session {session_id}, Turn {current_turn}: Error fetching/updating GraphQL schema: {e}")
             if not schema_to_use_for_this_run:
                 schema_to_use_for_this_run = None
-    # --- End Schema Fetching Logic ---
+    elif schema_to_use_for_this_run is None:
+        # Referenced by the thread but not cached by this worker (restart, or another worker wrote it)
+        try:
+            fetched_schema_str = (await async_graphql_schema()).get("documentation")
+            if fetched_schema_str and fetched_schema_str.strip():
+                schema_to_use_for_this_run = fetched_schema_str
+        except Exception as e:
+            log.warning(f"Session {session_id}: could not reload the GraphQL schema: {e}")
+
+    return {
+        "graphql_schema": schema_cache.put(schema_to_use_for_this_run) if schema_to_use_for_this_run else stored_schema,
+        "schema_refreshed": should_fetch_new_schema_from_source,
+        "schema_turn": current_turn,
+        "last_schema_injection_turn": last_injection_turn,
+    }
+
+
+async def prefetch_node(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Speculatively prepare what the swarm needs while the contextualizer runs: the
+    compiled swarm (with its checkpointer connection) and the reference data indexes.
+    Both are cached, so after the first turn this returns at once.
+    """
+    results = await asyncio.gather(
+        dynamic_swarm(),
+        asyncio.to_thread(warm_up_reference_data),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            log.warning(f"Prefetch failed, the swarm will load it on demand: {result}")
+    return {}
+
+
+async def summarize_history_node(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Fold the turns that left the verbatim window into the running conversation summary.
+
+    Runs next to app_agent, so the swarm never waits for it; the new summary is
+    used from the next turn on.
+    """
+    messages = [m for m in (_convert_to_base_message(d) for d in state.get("messages", [])) if m]
+    previous_summary = state.get("conversation_summary")
+    turns, covered = turns_to_summarize(messages, state.get("summarized_turns") or 0)
+    if not turns:
+        return {}
+    prompt = ChatPromptTemplate.from_template(CONVERSATION_SUMMARY_PROMPT)
+    # Not an answer: keep its tokens out of the client's stream
+    chain = prompt | get_telogical_secondary_llm().with_config(tags=["skip_stream"])
+    # The run only ends when this branch does, so it must not outlast the request's deadline either
+    timeout = stage_timeout(config)
+    try:
+        response = await asyncio.wait_for(chain.ainvoke({
+            "previous_summary": previous_summary or "(none yet)",
+            "turns": format_turns(turns),
+        }), timeout)
+    except asyncio.TimeoutError:
+        deadline_stats.exceeded("summarize_history")
+        log.warning("Conversation summary not updated before the request deadline, will retry next turn")
+        return {}
+    except Exception as e:
+        log.warning(f"Conversation summary not updated, will retry next turn: {e}")
+        return {}
+    summary = response.text().strip() if isinstance(response, BaseMessage) else str(response).strip()
+    if not summary:
+        return {}
+    return {"conversation_summary": summary, "summarized_turns": covered}
+
+
+async def answer_cache_node(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
+    """
+    Answer a data question from the answer cache, keyed on the contextualizer's standalone query.
+
+    On a miss, the scope is kept in the state so the final node caches this turn's answer.
+    """
+    query = state.get("contextualized_query")
+    if not ANSWER_CACHE or not query or state.get("requires_schema_flag") is not True:
+        return {"answer_cache_scope": None, "answer_cache_hit": False}
+    try:
+        scope = answer_cache_scope((config or {}).get("configurable"))
+    except ValueError as e:
+        log.warning(f"Answer cache skipped, invalid data date: {e}")
+        return {"answer_cache_scope": None, "answer_cache_hit": False}
+    hit = answer_cache.lookup(query, scope)
+    if hit is None:
+        return {"answer_cache_scope": scope, "answer_cache_hit": False}
+
+    log.info(f"Answer cache {hit.match} hit (similarity {hit.similarity}) for '{query}'")
+    timings = summarize_node_timings(_timings_before_final_node(state))
+    trace = {
+        **hit.trace,
+        "timings": timings,
+        "answer_cache": {"match": hit.match, "similarity": hit.similarity, "cached_query": hit.cached_query,
+                         "age_seconds": round(hit.age_seconds, 1)},
+    }
+    messages: List[BaseMessage] = []
+    # The swarm did not run, so the schema it would have attached this turn is attached here
+    if state.get("graphql_schema") and (state.get("schema_turn") == 1 or state.get("schema_refreshed")):
+        messages.append(schema_reference_message(state["graphql_schema"]))
+    messages.append(AIMessage(content=hit.answer, custom_data={"trace": trace}))
+    return {
+        "messages": messages,
+        "answer_cache_scope": None,
+        "answer_cache_hit": True,
+        "requires_schema_flag": None,     # Clear for next cycle
+    }
+
+
+def route_after_answer_cache(state: RefinedAgentState) -> List[str]:
+    """
+    A cache hit ends the turn; on a miss the swarm starts, with the summary update next to it.
+
+    summarize_history is fanned out here rather than from the preparation join, where
+    it would share answer_cache's superstep and hold app_agent back until the summary
+    LLM call returned. After a hit it waits for the next turn.
+    """
+    return [END] if state.get("answer_cache_hit") else ["app_agent", "summarize_history"]
+
+
+def _remember_answer(state: RefinedAgentState, message: AIMessage) -> None:
+    """Cache a final answer that was looked up in the database, for the answer cache node."""
+    scope = state.get("answer_cache_scope")
+    content = message.content if isinstance(message.content, str) else ""
+    if not scope or not state.get("contextualized_query") or not (state.get("data_tool_calls") or 0):
+        return
+    if not content.strip() or content.startswith("Error:"):
+        return
+    if message.custom_data["trace"].get("refinement_skipped") == "deadline":
+        return  # Cut short; the next asker should get the full answer
+    trace = {key: value for key, value in message.custom_data.get("trace", {}).items()
+             if key in ("reasoning", "tool_calls")}
+    answer_cache.store(state["contextualized_query"], scope, content, trace)
+
+
+# Answer when the swarm is stopped at the deadline before it wrote anything
+DEADLINE_EXCEEDED_ANSWER = (
+    "I couldn't finish looking this up in the time available. Please try again, or narrow the question "
+    "down (for example to fewer providers or locations)."
+)
+
+
+async def _run_swarm_within(swarm: Any,
+                            swarm_input_state: Dict[str, Any],
+                            config: RunnableConfig,
+                            timeout: float) -> Tuple[Dict[str, Any], bool]:
+    """
+    Run the swarm for at most timeout seconds.
+
+    Returns:
+        The swarm's latest state (its input state if it produced none) and whether it was stopped.
+    """
+    latest = swarm_input_state
+
+    async def run() -> None:
+        nonlocal latest
+        async for values in swarm.astream(swarm_input_state, config=config, stream_mode="values"):
+            latest = values
+
+    try:
+        await asyncio.wait_for(run(), timeout)
+    except asyncio.TimeoutError:
+        return latest, True
+    return latest, False
+
+
+async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
+    session_id = str(config.get("configurable", {}).get("thread_id", "default_session"))
+    additional_messages_for_state: List[BaseMessage] = []
+    
+    # --- 1. Process Incoming Messages from main graph state ---
+    processed_input_messages: List[BaseMessage] = []
+    for msg_data in state.get("messages", []):
+        converted_msg = _convert_to_base_message(msg_data) # Ensure helper is defined
+        if converted_msg:
+            processed_input_messages.append(converted_msg)
+
+    # --- 2. Get information from state (set by contextualize_query, prepare_schema and previous runs) ---
+    schema_ref_for_this_run = state.get("graphql_schema")
+    schema_to_use_for_this_run = schema_cache.resolve(schema_ref_for_this_run)
+    context_insights_str = state.get("internal_context_insights")
+    # query_needs_schema_flag is retrieved but its use for appending schema to HumanMessage is now superseded by current_turn check
+    # query_needs_schema_flag = state.get("requires_schema_flag", True) # As per your snippet's default
+
+    # --- 3. The schema was fetched (if needed) by prepare_schema_node, in parallel with the contextualizer ---
+    current_turn = state.get("schema_turn") or 1
+    should_fetch_new_schema_from_source = bool(state.get("schema_refreshed"))
 
     # --- New: Inject schema as a SystemMessage into RefinedAgentState.messages (to be returned by this node) ---
     if schema_to_use_for_this_run and schema_to_use_for_this_run.strip():
         # Conditions: Schema is available AND (it's the first turn OR schema was just freshly fetched/updated this turn)
         if current_turn == 1 or should_fetch_new_schema_from_source:
-            schema_system_content = (
-                f"Context: The following GraphQL schema was identified as relevant for the current turn "
-                f"and is available to the agent system if needed for query formulation or understanding capabilities:\n"
-                f"{SCHEMA_APPENDIX_DELIMITER_START}"
-                f"{schema_to_use_for_this_run}"
-                f"{SCHEMA_APPENDIX_DELIMITER_END}"
-            )
-            schema_system_message = SystemMessage(content=schema_system_content)
+            # The thread keeps a reference; it is expanded to the full schema when the swarm's messages are built
+            schema_system_message = schema_reference_message(schema_cache.put(schema_to_use_for_this_run))
             additional_messages_for_state.append(schema_system_message)
             # print(f"DEBUG: Added schema SystemMessage to additional_messages_for_state for RefinedAgentState.")
 
@@ -369,13 +633,15 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
     # --- 4. Prepare messages_for_swarm ---
     messages_for_swarm: List[BaseMessage] = []
     
-    # 4a. Add Contextualizer's insights as a SystemMessage if available
-    if context_insights_str:
-        messages_for_swarm.append(SystemMessage(content=context_insights_str))
-        # print(f"DEBUG: Prepended contextual insights to messages_for_swarm.")
+    # 4a. Contextualizer's insights are added right before the latest user message (step 4d), so the
+    # history in front of them stays the same from turn to turn and can be served from the prompt cache
 
-    # 4b. Prepare a mutable copy of the main conversation history
-    current_history_for_swarm = list(processed_input_messages)
+    # 4b. Prepare the conversation history within its token budget (older turns are summarized),
+    # with the schema reference resolved
+    budgeted_history = select_history(
+        processed_input_messages, state.get("conversation_summary"), state.get("summarized_turns") or 0
+    )
+    current_history_for_swarm = expand_schema_references(budgeted_history, schema_to_use_for_this_run)
 
     # 4c. Append schema to the last HumanMessage ONLY IF it's the FIRST TURN of the session.
     # The `query_needs_schema_flag` is NOT used for this decision anymore.
@@ -410,6 +676,12 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
     
     # 4d. Add the (potentially modified on first turn) history to messages_for_swarm
     messages_for_swarm.extend(current_history_for_swarm)
+    if context_insights_str:
+        latest_human_index = next(
+            (i for i in range(len(messages_for_swarm) - 1, -1, -1) if isinstance(messages_for_swarm[i], HumanMessage)),
+            len(messages_for_swarm),
+        )
+        messages_for_swarm.insert(latest_human_index, SystemMessage(content=context_insights_str))
     
     # print(f"DEBUG: Messages for swarm prepared. Total messages: {len(messages_for_swarm)}") # Corrected print statement from your snippet
     # --- 5. Invoke the Swarm Agent ---
@@ -420,15 +692,28 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
     # if schema_to_use_for_this_run:
     #     swarm_input_state["current_graphql_schema"] = schema_to_use_for_this_run
 
-    result = await compiled_graph.ainvoke(swarm_input_state, config=config)
+    # Keep time for the refinement; without a request deadline the swarm runs to the end
+    swarm_timeout = stage_timeout(config, reserve=DEADLINE_REFINE_RESERVE_SECONDS)
+    deadline_exceeded = False
+    if swarm_timeout is None:
+        result = await compiled_graph.ainvoke(swarm_input_state, config=config)
+    else:
+        result, deadline_exceeded = await _run_swarm_within(compiled_graph, swarm_input_state, config, swarm_timeout)
 
     # --- 6. Extract Output from Swarm ---
     final_messages_from_swarm = result.get("messages", [])
-    current_agent_tool_outputs: List[str] = []
+    # The swarm's state starts with messages_for_swarm; what follows is this run's output
+    prompt_cache_stats.record_messages("swarm", final_messages_from_swarm[len(messages_for_swarm):])
+    current_agent_tool_outputs: List[ToolMessage] = []
     app_output_content = ""
+    data_tool_calls = 0
     for msg_from_swarm in final_messages_from_swarm:
+        if isinstance(msg_from_swarm, HumanMessage):
+            data_tool_calls = 0  # Only count the tools called for the latest user message
         if isinstance(msg_from_swarm, ToolMessage):
-            current_agent_tool_outputs.append(str(msg_from_swarm.content or ""))
+            current_agent_tool_outputs.append(msg_from_swarm)
+            if not (msg_from_swarm.name or "").startswith(HANDOFF_TOOL_PREFIX):
+                data_tool_calls += 1
         if isinstance(msg_from_swarm, AIMessage):
              app_output_content = str(msg_from_swarm.content or "")
              
@@ -444,6 +729,14 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
              last_msg_item = final_messages_from_swarm[-1]
              app_output_content = str(last_msg_item.content or "") if hasattr(last_msg_item, 'content') else str(last_msg_item)
 
+    if deadline_exceeded:
+        # The swarm was stopped mid-way: answer with what it wrote this turn, never with an earlier turn's answer
+        deadline_stats.exceeded("app_agent")
+        log.warning(f"Swarm stopped after {swarm_timeout:.1f}s to meet the request deadline")
+        partial_answers = [clean_answer(str(m.content or "")) for m in final_messages_from_swarm[len(messages_for_swarm):]
+                           if isinstance(m, AIMessage)]
+        app_output_content = next((a for a in reversed(partial_answers) if a), DEADLINE_EXCEEDED_ANSWER)
+
 
     # --- New: (Commented Out) Logic to Inject Swarm Internal Messages into RefinedAgentState ---
     # --- This would add all messages from the swarm's execution to the main graph's history ---
@@ -484,11 +777,13 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
         
     # Format agent tool outputs for tracing
     formatted_tool_outputs = []
-    for i, tool_output in enumerate(current_agent_tool_outputs):
+    for i, tool_message in enumerate(current_agent_tool_outputs):
         formatted_tool_outputs.append({
             "name": f"GraphQLTool-{i+1}",
             "input": "Query execution",
-            "output": tool_output
+            "output": str(tool_message.content or ""),
+            "tool": tool_message.name,        # Used by refine_output_refined to select outputs
+            "status": tool_message.status,
         })
             
     # Create structured tool output objects
@@ -505,9 +800,10 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
     return {
         "app_output": app_output_content,
         "agent_tool_outputs": detailed_tool_outputs,  # Use the formatted tool outputs
-        "graphql_schema": schema_to_use_for_this_run,      # Persist the schema string
+        "graphql_schema": schema_ref_for_this_run,         # Persist the schema reference
         "internal_context_insights": reasoning_narrative,  # Store reasoning for refine_output_refined
-        "requires_schema_flag": None,     # Clear for next cycle
+        "data_tool_calls": data_tool_calls,                # Decides whether refine_output is needed
+        "deadline_exceeded": deadline_exceeded,            # Stopped swarm answers are not refined
         "messages": additional_messages_for_state           # Add collected messages to state
     }
 
@@ -645,10 +941,19 @@ async def run_app_agent_refined(state: RefinedAgentState, config: RunnableConfig
 #     }
 
 # ------------------------------------ Refined Agent Workflow Components ------------------------------------
+# Stream the refined answer as plain text tokens instead of waiting for the structured output
+REFINE_STREAMING = os.getenv("REFINE_STREAMING", "true").strip().lower() in ("1", "true", "yes")
+
 class RefinedOutput(BaseModel):
     refined_text: str = Field(description="The final, polished text after removing AI reasoning, workflow narratives, and ensuring it aligns with Telogical's voice. This field should contain only the core information intended for the user, with original formatting and detail preserved.")
 
-async def refine_output_refined(state: RefinedAgentState) -> Dict[str, Any]:
+async def refine_output_refined(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
+    # Too close to the request's deadline for another LLM call: the swarm's answer is cleaned up instead
+    refine_timeout = stage_timeout(config)
+    if refine_timeout is not None and refine_timeout < DEADLINE_MIN_REFINE_SECONDS:
+        deadline_stats.exceeded("refine_output")
+        return _unrefined_output_update(state, "deadline")
+
     app_output_to_refine = state["app_output"]
     agent_tool_outputs: List[str] = state.get("agent_tool_outputs") or []
     
@@ -672,142 +977,244 @@ async def refine_output_refined(state: RefinedAgentState) -> Dict[str, Any]:
                 last_human_query_content = content_str
             break
 
+    # Only the successful, distinct data outputs, within the token budget; the refiner checks the
+    # answer against the stored results, not the few preview rows the swarm was handed
+    agent_tool_outputs = resolve_result_handles(agent_tool_outputs, thread_id_from_config(config))
+    selected_tool_outputs, tool_output_selection = select_tool_outputs(agent_tool_outputs, str(app_output_to_refine))
+    log.info(f"Refine tool output selection: {tool_output_selection}")
+
     formatted_tool_outputs = "No tool outputs were recorded or applicable for the previous agent step."
-    if agent_tool_outputs:
+    if selected_tool_outputs:
         formatted_tool_outputs = "Tool Outputs from Previous Agent Step:\n" + "\n".join(
-            f"{i+1}. {output_content}" for i, output_content in enumerate(agent_tool_outputs)
+            f"{i+1}. {output_content}" for i, output_content in enumerate(selected_tool_outputs)
         )
     elif isinstance(agent_tool_outputs, list) and not agent_tool_outputs:
         formatted_tool_outputs = "The previous agent step recorded that no tools were used or no outputs were generated from tools."
 
+    # Label the ZIP codes in play from local geo data, so the answer can name the places behind them;
+    # only the query's and the results' ZIP fields, not every five-digit number (channel counts, speeds)
+    zip_labels = label_zip_codes(last_human_query_content, selected_tool_outputs)
+    if zip_labels:
+        formatted_tool_outputs += "\n\nZIP Code Reference (Telogical geo data):\n" + "\n".join(
+            f"- {zipcode}: {label}" for zipcode, label in zip_labels.items()
+        )
+
     # print(f"Last Human Query Content: {last_human_query_content}")
     # print(f"Formatted Tool Outputs: {formatted_tool_outputs}")
     
-    # (Refiner prompt remains the same as it was extensive and specific)
-    # ... [Your existing long refiner_prompt SystemMessage content] ...
-    # For brevity in this response, I'm not repeating the giant prompt string.
-    # Assume REFINE_SYSTEM_PROMPT_CONTENT contains that long string.
-    
-    REFINE_SYSTEM_PROMPT_CONTENT = """ 
-    You are the **Refinement Specialist** for Telogical Systems' AI assistant. Your designated role is to meticulously process the output generated by the primary AI analysis component (`Agent Output to Refine`), ensuring that every user-facing response is impeccably polished, professional, and authentically represents the voice and high standards of Telogical Systems LLC. Consider yourself the final quality assurance step, transforming detailed analytical output into a refined, client-ready communication that directly reflects Telogical's expertise in providing exhaustive and precise data.
-    
-    Your primary task is to **refine and enhance** the provided `Agent Output to Refine` using the `Original Query` for context and the `Supporting Tool Outputs` as the ground truth for data. This means you must **remove specific unwanted elements** (AI thinking processes) while **preserving and often augmenting the integrity, detail, and factual substance of the information**. **Crucially, all refinements must ensure the final output remains a direct, relevant, and coherent answer to the `Original Query` that prompted the agent's output.** The goal is to produce responses that present information as Telogical's official product,  mirroring the thoroughness of a senior data analyst and appropriately addressing the user's `Original Query`, not as an AI searching a database or narrating its thought process.
-
-    **Key Refinement Guidelines:**
-
-    1.  **Client Priority: Preserve All Core Information, Detail, and Original Formatting Faithfully:**
-        * Your paramount goal is to present the original information with **absolute accuracy and maximum completeness as supported by the `Supporting Tool Outputs`**. Telogical's clients prioritize rich, detailed, and meticulously structured data over brevity or summarization. They expect the full depth of data available, akin to what a senior data analyst would provide from raw data sources.
-        * **ABSOLUTELY DO NOT** summarize, paraphrase, re-interpret (beyond correcting errors against tool outputs), condense, or otherwise alter the core data, factual details, or the substance of the information provided in the agent's output if they accurately reflect the `Supporting Tool Outputs`. Your task is **not** to "improve" or "re-word" the factual content if it is already clear and accurate against the source data; your role is to ensure it is presented cleanly as if from Telogical Systems directly. Any attempt to "make it more product-friendly" by reducing detail is counter to the client's needs.
-        * **MAINTAIN THE ORIGINAL FORMATTING AND LEVEL OF DETAIL WITH EXTREME FIDELITY, ESPECIALLY FOR TABLES, LISTS, AND ALL FORMS OF STRUCTURED DATA.** If the `Agent Output to Refine` includes tables, lists, code blocks, specific paragraph structures, or any other structured formatting containing factual information, these structures **MUST be replicated exactly as they were**, minus only the AI thought process elements. For example, if a table is provided, reproduce the table in its entirety and its original structure; **do not** convert it into a prose summary or alter its presentation in a way that reduces detail.
-        * Think of yourself as meticulously cleaning the "frame" (AI thought process, conversational fluff) around a picture (the core data and its original presentation structure). The picture itself—its detail, substance, and all essential formatting (like table structures, itemized lists, and their full content)—must remain entirely untouched and unreduced. Your refinement must not lead to *any* loss of information or any change in how detailed or structured information was originally conveyed. This commitment to comprehensive detail and faithful reproduction of format is a key client expectation.
-
-    2.  **Eliminate AI Thinking Processes and Workflow Narratives:**
-        * **REMOVE** all traces of the AI's internal reasoning or how it arrived at the information. This includes:
-            * Step-by-step explanations of its thought process.
-            * Internal deliberations or self-correction narratives.
-            * Descriptions of search methodologies, queries used, or data retrieval steps.
-            * Any language suggesting the AI is actively thinking, searching, or processing (e.g., "let me think about this," "I need to consider...," "first I'll look at...").
-
-    3.  **Adopt Telogical's Official Voice (Direct and Authoritative):**
-        * Present all information as definitive facts originating directly from Telogical Systems.
-        * **NEVER** use phrases that attribute the information to a database, a search process, or the AI's own discovery (e.g., "According to the database...", "I searched for...")..
-        * **AVOID** phrases such as:
-            * "According to the database..."
-            * "Based on my queries..."
-            * "I searched for..."
-            * "I found in the data..."
-            * "Based on the telecom package data..."
-            * "I checked the latest available package..."
-            * "My attempts to explore the database..."
-            * "According to the information I got from..."
-        * **INSTEAD, use direct and authoritative statements** like:
-            * "Here are the 2025 promotions..."
-            * "The latest package and promotion information for AT&T shows..."
-            * "We are experiencing technical difficulties..." (if applicable to the original message)
-            * "Here’s what we found regarding the most popular internet plans in Charleston, SC (zip code 29056):"
-            * "Here are the results..."
-            * "This information shows..."
-            
-    4.  **Advanced Scrutiny, Validation, and Enrichment Based on Tool Outputs:**
-        * You will be given the `Agent Output to Refine` and will always receive `Supporting Tool Outputs from Agent's Process`. These tool outputs are the **ground truth** for factual information.
-        * Your primary responsibility in this step is to critically compare the `Agent Output to Refine` against the `Supporting Tool Outputs`.
-
-        * **A. Data Validation and Correction:**
-            * Meticulously cross-validate all factual claims, details, and data points in the `Agent Output to Refine` against the information present in the `Supporting Tool Outputs`.
-            * **Extreme Vigilance on Numerical Accuracy (CRITICAL):** All numerical data (prices, fees, speeds, channel counts, item counts, etc.) presented in the `Agent Output to Refine` **MUST** be cross-validated against the `Supporting Tool Outputs`. Any discrepancies **MUST be corrected** to precisely reflect the `Supporting Tool Outputs`. **Inaccurate reporting of numerical data, especially prices, is a critical failure and severely damages company reputation.**
-            * **Report Numerical Data As-Is and Unaggregated:** Present all numerical figures, particularly prices and their individual components (e.g., standard price, promotional price, one-time fees, recurring fees, taxes, discounts), **exactly as they appear in the `Supporting Tool Outputs`**. **DO NOT SUM, AGGREGATE, OR SIMPLIFY** numerical data (e.g., do not combine a base price and multiple promotional discounts into a single 'final price' unless the `Supporting Tool Outputs` explicitly present it that way with full, transparent context of its derivation). Each component should be listed separately to provide complete transparency, mirroring how a data analyst presents detailed findings. **Avoid any form of calculation or summarization of numerical data unless explicitly instructed by the user's query AND clearly supported by the tool output's structure.**
-
-        * **B. Enhancing for Completeness and Volume (Adding Missed Data):**
-            * If the `Agent Output to Refine` has omitted relevant information, data points, or details that are **explicitly present in the `Supporting Tool Outputs`** and are pertinent to the `Original Query`, you **MUST** incorporate these missing pieces into your `refined_text`.
-            * The goal is to provide the **most comprehensive and voluminous response supported by the available tool data**. For instance, if the tool output lists 20 relevant markets and the `Agent Output to Refine` only mentions 10, your refined response must include all 20 markets along with their associated details as found in the tool output.
-            * This includes ensuring that if the data from tools pertains to specific geographical scopes like DMAs (Designated Market Areas), uses specific telecommunications terminology, or lists multiple options/variations, this level of detail and correct terminology is fully preserved and clearly presented in the final output.
+    # Compiled once at module load; the static system prompt comes first so providers can cache it
+    refiner_prompt_template = REFINE_PLAIN_TEXT_PROMPT if REFINE_STREAMING else REFINE_PROMPT
+    refine_inputs = {
+        "current_date": datetime.date.today(),
+        "original_query": last_human_query_content,
+        "agent_output": app_output_to_refine,
+        "tool_outputs": formatted_tool_outputs,
+    }
 
-        * **C. Clarification and Interpretation:**
-            * If the agent's interpretation of tool data in `Agent Output to Refine` is unclear, slightly misaligned, or poorly structured compared to the richness of the `Supporting Tool Outputs`, you must clarify and restructure it. Your refined version should accurately and clearly represent the information as found in the `Supporting Tool Outputs`, always maintaining the authoritative Telogical voice and adhering to the principle of providing complete data.
+    # Get the primary LLM from the framework
+    primary_llm = get_telogical_primary_llm()
 
-        * **D. Constraint:** You are **not** to re-run any tools or seek new information beyond what is provided in `Agent Output to Refine` and `Supporting Tool Outputs`. Your refinement is strictly limited to these inputs.
+    if REFINE_STREAMING:
+        # The /stream endpoint forwards these chunks as token events while they arrive
+        streaming_llm = primary_llm
+        if LLM_STREAM_USAGE and hasattr(primary_llm, "stream_usage"):
+            streaming_llm = primary_llm.bind(stream_usage=True)  # Usage arrives in the last chunk
+        chain = refiner_prompt_template | streaming_llm
+        streamed_parts: List[str] = []
+        response_message = None
+
+        async def stream_refinement() -> None:
+            nonlocal response_message
+            async for chunk in chain.astream(refine_inputs):
+                streamed_parts.append(chunk.text())
+                response_message = chunk if response_message is None else response_message + chunk
 
-    - **ALL TELECOMMUNICATIONS DATA IS CURRENT AS OF: {current_date}**
-    
-    Your role is to be the definitive voice of Telogical Systems. Filter out the AI's procedural explanations and internal monologue, delivering clear, authoritative information about telecommunications market data. The goal is to provide user responses that sound like polished, customer-facing product outputs, without revealing the AI or technical querying behind the scenes.
-    
-    Your final response should be structured to contain only the refined text. This will be captured in a field named `refined_text`.
-    
-    **Output Structure:**
-    - refined_text: The final, polished text after removing AI reasoning, workflow narratives, and ensuring it aligns with Telogical's voice. This field should contain only the core information intended for the user, with original formatting and detail preserved.
-    
-    **Example Output:**
-    - refined_text: "Here are the 2025 promotions for AT&T in Charleston, SC (zip code 29056):\n\n- AT&T Fiber 300: $55/month\n- AT&T Fiber 1000: $70/month\n- AT&T Internet 100: $50/month\n\nThese packages include...\n\n---"
-    """
-
-    refiner_prompt_template = ChatPromptTemplate.from_messages([
-        SystemMessage(content=REFINE_SYSTEM_PROMPT_CONTENT),
-        HumanMessage(content=f"Original Query: {last_human_query_content}\n\nAgent Output to Refine: {app_output_to_refine}\n\nSupporting Tool Outputs from Agent's Process: {formatted_tool_outputs}"),
-    ])
+        try:
+            await asyncio.wait_for(stream_refinement(), refine_timeout)
+            prompt_cache_stats.record("refine", response_message)
+            refined_content = "".join(streamed_parts).strip()
+            if not refined_content:
+                refined_content = str(app_output_to_refine)
+                log.warning("Refiner LLM streamed no text, using the agent output as is")
+        except asyncio.TimeoutError:
+            # The tokens streamed so far are superseded by the final message with the cleaned-up answer
+            deadline_stats.exceeded("refine_output")
+            return _unrefined_output_update(state, "deadline")
+        except Exception as e:
+            print(f"Error during refinement LLM call: {e}")
+            refined_content = f"Error: Refinement process encountered an exception. Original output: {str(app_output_to_refine)}"
+        return _refined_output_update(state, refined_content, tool_output_selection)
 
-    # Get the primary LLM from the framework
-    primary_llm = get_telogical_primary_llm()
-    structured_llm = primary_llm.with_structured_output(RefinedOutput)
+    structured_llm = primary_llm.with_structured_output(RefinedOutput, include_raw=True)
     chain = refiner_prompt_template | structured_llm
     
     try:
-        response_structured = await chain.ainvoke({})
+        response = await asyncio.wait_for(chain.ainvoke(refine_inputs), refine_timeout)
+        prompt_cache_stats.record("refine", response["raw"])
+        if response["parsing_error"] is not None:
+            raise response["parsing_error"]
+        response_structured = response["parsed"]
         if isinstance(response_structured, RefinedOutput):
             refined_content = response_structured.refined_text
         else: # Fallback if structured output fails unexpectedly
             refined_content = f"Error: Refinement failed. Unexpected response type: {type(response_structured)}. Output: {str(app_output_to_refine)}"
             print(f"Warning: Refiner LLM did not return RefinedOutput. Received: {response_structured}")
+    except asyncio.TimeoutError:
+        deadline_stats.exceeded("refine_output")
+        return _unrefined_output_update(state, "deadline")
     except Exception as e:
         print(f"Error during refinement LLM call: {e}")
         refined_content = f"Error: Refinement process encountered an exception. Original output: {str(app_output_to_refine)}"
 
+    return _refined_output_update(state, refined_content, tool_output_selection)
 
-    # Create the final AI message with trace information to enable reasoning visualization
-    final_ai_message = AIMessage(
-        content=refined_content,
-        custom_data={
-            "trace": {
-                "reasoning": state.get("internal_context_insights", "Agent processed user query through multi-step workflow."),
-                "tool_calls": state.get("agent_tool_outputs", []) if state.get("agent_tool_outputs") else []
-            }
-        }
-    )
+
+def _refined_output_update(state: RefinedAgentState,
+                           refined_content: str,
+                           tool_output_selection: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    timings = summarize_node_timings(_timings_before_final_node(state))
+    log.info(f"Refined workflow timings: {timings}")
+    message = _final_answer_message(state, refined_content, timings)
+    if tool_output_selection:
+        message.custom_data["trace"]["tool_output_selection"] = tool_output_selection
+    _remember_answer(state, message)
 
     return {
         # "refined_output": refined_content,
-        "messages": [final_ai_message] # This will be added to the state's messages
+        "messages": [message], # This will be added to the state's messages
+        "requires_schema_flag": None,     # Clear for next cycle
+    }
+
+
+def _timings_before_final_node(state: RefinedAgentState) -> Dict[str, float]:
+    """This turn's node timings up to app_agent; the final node's own time is added by its wrapper."""
+    return {
+        name: seconds for name, seconds in (state.get("node_timings") or {}).items()
+        if name not in ("refine_output", "finish_output", "answer_cache", TIMINGS_TURN_KEY)
+    }
+
+
+def _final_answer_message(state: RefinedAgentState,
+                          content: str,
+                          timings: Dict[str, Any],
+                          refinement_skipped: Optional[str] = None) -> AIMessage:
+    """The final AI message, with trace information to enable reasoning visualization."""
+    trace: Dict[str, Any] = {
+        "reasoning": state.get("internal_context_insights", "Agent processed user query through multi-step workflow."),
+        "tool_calls": state.get("agent_tool_outputs", []) if state.get("agent_tool_outputs") else [],
+        "timings": timings,
     }
+    if refinement_skipped:
+        trace["refinement_skipped"] = refinement_skipped
+    return AIMessage(content=content, custom_data={"trace": trace})
+
+
+def _refinement_skip_reason(state: RefinedAgentState) -> Optional[str]:
+    if state.get("deadline_exceeded"):
+        return "deadline"
+    return refinement_skip_reason(
+        state.get("app_output") or "",
+        state.get("requires_schema_flag"),
+        state.get("data_tool_calls") or 0,
+    )
+
+
+def route_after_app_agent(state: RefinedAgentState) -> str:
+    """Send the answer to refine_output, or to finish_output when refining it would add nothing."""
+    return "finish_output" if _refinement_skip_reason(state) else "refine_output"
+
+
+async def finish_output_node(state: RefinedAgentState) -> Dict[str, Any]:
+    """
+    Finish a turn without the refinement LLM call: greetings, answers without any
+    data lookup, short answers and answers of a swarm stopped at the deadline only
+    get the deterministic clean-up.
+    """
+    return _unrefined_output_update(state, _refinement_skip_reason(state))
+
+
+def _unrefined_output_update(state: RefinedAgentState, reason: Optional[str]) -> Dict[str, Any]:
+    timings = summarize_node_timings(_timings_before_final_node(state))
+    log.info(f"Refinement skipped ({reason}); refined workflow timings: {timings}")
+    content = clean_answer(state.get("app_output") or "")
+    message = _final_answer_message(state, content, timings, refinement_skipped=reason)
+    _remember_answer(state, message)
+    return {
+        "messages": [message],
+        "requires_schema_flag": None,     # Clear for next cycle
+    }
+
+# Nodes that run in parallel between START and app_agent
+PARALLEL_PREPARATION_NODES = ("contextualize_query", "prepare_schema", "prefetch")
+
+
+def _timed(name: str, node: Callable[..., Awaitable[Dict[str, Any]]]) -> Callable[..., Awaitable[Dict[str, Any]]]:
+    """Wrap a graph node so its wall-clock time is recorded in node_timings."""
+    takes_config = len(inspect.signature(node).parameters) > 1
+
+    # Not functools.wraps: LangGraph would follow __wrapped__ and stop passing config
+    async def timed_node(state: RefinedAgentState, config: RunnableConfig) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            update = await (node(state, config) if takes_config else node(state))
+        finally:
+            elapsed = time.perf_counter() - started
+            log.debug(f"Node {name} took {elapsed:.3f}s")
+        update = dict(update or {})
+        update["node_timings"] = {
+            **(update.get("node_timings") or {}),
+            name: round(elapsed, 4),
+            TIMINGS_TURN_KEY: len(state.get("messages") or []),
+        }
+        return update
+    timed_node.__name__ = timed_node.__qualname__ = getattr(node, "__name__", name)
+    return timed_node
+
+
+def summarize_node_timings(timings: Optional[Dict[str, float]]) -> Dict[str, Any]:
+    """
+    Per-node timings of a turn and what running the preparation nodes in parallel saved.
+
+    Returns:
+        Dict with 'nodes' (seconds per node), 'preparation_parallel' (the slowest
+        preparation branch, i.e. its share of the critical path), 'preparation_sequential'
+        (what the branches would take one after another) and 'saved'.
+    """
+    nodes = {name: seconds for name, seconds in (timings or {}).items() if name != TIMINGS_TURN_KEY}
+    preparation = [nodes[name] for name in PARALLEL_PREPARATION_NODES if name in nodes]
+    parallel = max(preparation, default=0.0)
+    sequential = sum(preparation)
+    return {
+        "nodes": nodes,
+        "preparation_parallel": round(parallel, 4),
+        "preparation_sequential": round(sequential, 4),
+        "saved": round(sequential - parallel, 4),
+    }
+
 
 async def create_refined_agent_workflow(checkpointer):
     workflow = StateGraph(RefinedAgentState)
-    workflow.add_node("contextualize_query", contextualize_query_node) # New node
-    workflow.add_node("app_agent", run_app_agent_refined)
-    workflow.add_node("refine_output", refine_output_refined)
-    
-    workflow.add_edge(START, "contextualize_query")
-    workflow.add_edge("contextualize_query", "app_agent")
-    workflow.add_edge("app_agent", "refine_output")
+    # Contextualizer, schema preparation and prefetch fan out from START and join before the swarm
+    workflow.add_node("contextualize_query", _timed("contextualize_query", contextualize_query_node))
+    workflow.add_node("prepare_schema", _timed("prepare_schema", prepare_schema_node))
+    workflow.add_node("prefetch", _timed("prefetch", prefetch_node))
+    workflow.add_node("app_agent", _timed("app_agent", run_app_agent_refined))
+    workflow.add_node("refine_output", _timed("refine_output", refine_output_refined))
+    workflow.add_node("finish_output", _timed("finish_output", finish_output_node))
+    workflow.add_node("summarize_history", _timed("summarize_history", summarize_history_node))
+    workflow.add_node("answer_cache", _timed("answer_cache", answer_cache_node))
+
+    for node in PARALLEL_PREPARATION_NODES:
+        workflow.add_edge(START, node)
+    # Repeated data questions are answered from the cache without running the swarm
+    workflow.add_edge(list(PARALLEL_PREPARATION_NODES), "answer_cache")
+    # The conversation summary for later turns is updated while the swarm works
+    workflow.add_conditional_edges("answer_cache", route_after_answer_cache, ["app_agent", "summarize_history", END])
+    workflow.add_edge("summarize_history", END)
+    # Answers that need no refinement skip the second LLM call
+    workflow.add_conditional_edges("app_agent", route_after_app_agent, ["refine_output", "finish_output"])
     workflow.add_edge("refine_output", END)
+    workflow.add_edge("finish_output", END)
     return workflow.compile(checkpointer=checkpointer)
 
 
@@ -0,0 +1,381 @@
+"""
+Vectorized group-by / filter / aggregate over JSON records.
+
+math_counting_tool could only count, so "median price by provider" or "packages
+with at least 1 Gbps per zip" left the arithmetic to the LLM. This engine
+flattens the requested fields of a list of (nested) records into columnar numpy
+arrays once and does filtering, grouping and aggregation on those arrays, which
+stays fast for results with 100k+ rows.
+
+Fields are dotted paths into each record ("price", "provider.name"). A list
+inside the records can be unnested first, turning each element into its own row
+("products" -> one row per product, addressed as "products.speed").
+"""
+
+import logging
+import numbers
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+FILTER_OPS = ("eq", "ne", "gt", "gte", "lt", "lte", "in", "not_in", "contains", "exists", "missing")
+METRIC_OPS = ("count", "sum", "avg", "min", "max", "median", "count_distinct", "distinct")
+MAX_DISTINCT_VALUES = 25
+
+
+class AggregationError(ValueError):
+    """Raised for invalid aggregation requests (unknown operators, non-numeric fields, ...)."""
+
+
+def _getter(path: str):
+    steps = [step for step in path.split(".") if step]
+
+    def get(record: Any) -> Any:
+        value = record
+        for step in steps:
+            if type(value) is not dict:
+                return None
+            value = value.get(step)
+        return value
+
+    return get
+
+
+def unnest(records: Iterable[Any], path: str) -> List[Dict[str, Any]]:
+    """
+    One row per element of the list at path, with that element in place of the list.
+
+    Records whose list is missing or empty are dropped, like an inner join.
+    """
+    steps = [step for step in path.split(".") if step]
+    rows: List[Dict[str, Any]] = []
+    for record in records:
+        parent = record
+        for step in steps[:-1]:
+            parent = parent.get(step) if isinstance(parent, dict) else None
+        items = parent.get(steps[-1]) if isinstance(parent, dict) and steps else None
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            rows.append(_replace_path(record, steps, item))
+    return rows
+
+
+def _replace_path(record: Dict[str, Any], steps: Sequence[str], value: Any) -> Dict[str, Any]:
+    copy = dict(record)
+    if len(steps) == 1:
+        copy[steps[0]] = value
+    else:
+        copy[steps[0]] = _replace_path(record[steps[0]], steps[1:], value)
+    return copy
+
+
+def _to_number(value: Any) -> float:
+    value_type = type(value)
+    if value_type is float or value_type is int:
+        return float(value)
+    if value is None or isinstance(value, bool):
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value.replace(",", "").replace("$", "").strip())
+        except ValueError:
+            return np.nan
+    return np.nan
+
+
+def _to_key(value: Any) -> str:
+    """Case-insensitive comparison / grouping key of a value."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip().lower()
+
+
+class Column:
+    """One field of the records as numpy arrays: raw values, numbers and comparison keys."""
+
+    def __init__(self, values: List[Any]):
+        self.values = np.empty(len(values), dtype=object)
+        self.values[:] = values
+        self._numbers: Optional[np.ndarray] = None
+        self._keys: Optional[np.ndarray] = None
+
+    @property
+    def numbers(self) -> np.ndarray:
+        """Float values, NaN where the value is not numeric."""
+        if self._numbers is None:
+            self._numbers = np.fromiter((_to_number(v) for v in self.values), dtype=np.float64, count=len(self.values))
+        return self._numbers
+
+    @property
+    def keys(self) -> np.ndarray:
+        """Lowercased string keys ('null' for missing values)."""
+        if self._keys is None:
+            # Columns repeat few distinct values, so key each distinct value once
+            cache: Dict[Tuple[type, Any], str] = {}
+            keys = []
+            for value in self.values:
+                try:
+                    key = cache[(type(value), value)]
+                except KeyError:
+                    key = cache[(type(value), value)] = _to_key(value)
+                except TypeError:  # unhashable, e.g. a list
+                    key = _to_key(value)
+                keys.append(key)
+            self._keys = np.array(keys, dtype=object)
+        return self._keys
+
+    @property
+    def present(self) -> np.ndarray:
+        return np.array([v is not None for v in self.values], dtype=bool)
+
+
+class Table:
+    """Columnar view of a list of records; columns are extracted on first use."""
+
+    def __init__(self, records: Sequence[Any]):
+        self.records = records
+        self._columns: Dict[str, Column] = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def column(self, path: str) -> Column:
+        if path not in self._columns:
+            if "." not in path:
+                # Fast path for top-level fields, the common case
+                values = [r.get(path) if type(r) is dict else None for r in self.records]
+            else:
+                get = _getter(path)
+                values = [get(record) for record in self.records]
+            self._columns[path] = Column(values)
+        return self._columns[path]
+
+    def mask(self, filters: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Boolean mask of the rows passing all filters."""
+        mask = np.ones(len(self.records), dtype=bool)
+        for spec in filters:
+            mask &= self._filter_mask(spec)
+        return mask
+
+    def _filter_mask(self, spec: Dict[str, Any]) -> np.ndarray:
+        field, op, value = spec.get("field"), spec.get("op", "eq"), spec.get("value")
+        if not field:
+            raise AggregationError(f"Filter {spec} has no 'field'.")
+        if op not in FILTER_OPS:
+            raise AggregationError(f"Unknown filter op '{op}'. Use one of {list(FILTER_OPS)}.")
+        column = self.column(field)
+
+        if op == "exists":
+            return column.present
+        if op == "missing":
+            return ~column.present
+        if op in ("gt", "gte", "lt", "lte"):
+            threshold = _to_number(value)
+            if np.isnan(threshold):
+                raise AggregationError(f"Filter '{op}' on '{field}' needs a numeric value, got {value!r}.")
+            numbers = column.numbers
+            with np.errstate(invalid="ignore"):
+                return {"gt": numbers > threshold, "gte": numbers >= threshold,
+                        "lt": numbers < threshold, "lte": numbers <= threshold}[op]
+        if op in ("in", "not_in"):
+            wanted = value if isinstance(value, (list, tuple, set)) else [value]
+            matched = self._equals_any(column, wanted)
+            return matched if op == "in" else ~matched
+        if op == "contains":
+            needle = _to_key(value)
+            return np.fromiter(
+                (
+                    any(_to_key(item) == needle for item in v) if isinstance(v, list)
+                    else v is not None and needle in _to_key(v)
+                    for v in column.values
+                ),
+                dtype=bool,
+                count=len(column.values),
+            )
+        matched = self._equals_any(column, [value])
+        return matched if op == "eq" else ~matched
+
+    @staticmethod
+    def _equals_any(column: Column, wanted: Iterable[Any]) -> np.ndarray:
+        wanted = list(wanted)
+        numbers = [_to_number(w) for w in wanted]
+        if wanted and not any(np.isnan(numbers)):
+            return np.isin(column.numbers, numbers)
+        return np.isin(column.keys, [_to_key(w) for w in wanted])
+
+
+def _group_ids(table: Table, rows: np.ndarray, group_by: Sequence[str]) -> Tuple[np.ndarray, List[Tuple[Any, ...]]]:
+    """Dense group id per selected row and the group key values, ordered by key."""
+    if not group_by:
+        return np.zeros(len(rows), dtype=np.int64), [()]
+    codes = np.zeros(len(rows), dtype=np.int64)
+    uniques_per_field = []
+    for field in group_by:
+        keys = table.column(field).keys[rows]
+        uniques, inverse = np.unique(keys.astype(str), return_inverse=True)
+        codes = codes * len(uniques) + inverse
+        uniques_per_field.append(uniques)
+    group_codes, gid = np.unique(codes, return_inverse=True)
+
+    # Label each group with the original value of its first row, not the lowercased key
+    first_rows = rows[np.unique(gid, return_index=True)[1]]
+    labels = [
+        tuple(table.column(field).values[row] for field in group_by)
+        for row in first_rows
+    ]
+    return gid.reshape(-1), labels
+
+
+def _sorted_by_group(gid: np.ndarray, values: np.ndarray, n_groups: int):
+    """Values without NaN sorted by (group, value), with each group's start offset and size."""
+    valid = ~np.isnan(values)
+    gid, values = gid[valid], values[valid]
+    order = np.lexsort((values, gid))
+    gid, values = gid[order], values[order]
+    counts = np.bincount(gid, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return values, starts, counts
+
+
+def _metric(table: Table, rows: np.ndarray, gid: np.ndarray, n_groups: int, op: str, field: Optional[str]) -> List[Any]:
+    if op == "count" and not field:
+        return np.bincount(gid, minlength=n_groups).tolist()
+    if not field:
+        raise AggregationError(f"Metric '{op}' needs a 'field'.")
+    column = table.column(field)
+
+    if op == "count":
+        return np.bincount(gid, weights=column.present[rows], minlength=n_groups).astype(int).tolist()
+    if op in ("count_distinct", "distinct"):
+        keys = column.keys[rows].astype(str)
+        present = column.present[rows]
+        uniques, inverse = np.unique(keys[present], return_inverse=True)
+        pairs = np.unique(gid[present] * max(len(uniques), 1) + inverse)
+        pair_groups = pairs // max(len(uniques), 1)
+        if op == "count_distinct":
+            return np.bincount(pair_groups, minlength=n_groups).tolist()
+        # Map each distinct key back to an original value for display
+        first_index = np.unique(inverse, return_index=True)[1]
+        originals = column.values[rows][present][first_index]
+        per_group: List[List[Any]] = [[] for _ in range(n_groups)]
+        for pair, group in zip(pairs, pair_groups):
+            if len(per_group[group]) < MAX_DISTINCT_VALUES:
+                per_group[group].append(originals[pair % max(len(uniques), 1)])
+        return per_group
+
+    numbers = column.numbers[rows]
+    if np.isnan(numbers).all() and len(numbers):
+        raise AggregationError(f"Field '{field}' has no numeric values; '{op}' needs numbers.")
+    if op in ("sum", "avg"):
+        valid = ~np.isnan(numbers)
+        sums = np.bincount(gid[valid], weights=numbers[valid], minlength=n_groups)
+        if op == "sum":
+            return [round(float(v), 6) for v in sums]
+        counts = np.bincount(gid[valid], minlength=n_groups)
+        return [round(float(s / c), 6) if c else None for s, c in zip(sums, counts)]
+
+    values, starts, counts = _sorted_by_group(gid, numbers, n_groups)
+    result: List[Any] = []
+    for start, count in zip(starts, counts):
+        if not count:
+            result.append(None)
+        elif op == "min":
+            result.append(float(values[start]))
+        elif op == "max":
+            result.append(float(values[start + count - 1]))
+        else:  # median
+            middle = start + count // 2
+            median = values[middle] if count % 2 else (values[middle - 1] + values[middle]) / 2
+            result.append(round(float(median), 6))
+    return result
+
+
+def metric_name(metric: Dict[str, Any]) -> str:
+    """Output name of a metric, e.g. {'op': 'median', 'field': 'price.amount'} -> 'median_price_amount'."""
+    if metric.get("as"):
+        return str(metric["as"])
+    field = metric.get("field")
+    return f"{metric['op']}_{field.replace('.', '_')}" if field else metric["op"]
+
+
+def _sort_key(value: Any) -> Tuple[int, str, Any]:
+    """Sort key for group values of mixed types: numbers, then strings, then anything else."""
+    if isinstance(value, numbers.Real):  # also numpy scalars
+        return (0, "", value)
+    return (1, type(value).__name__, value if isinstance(value, str) else str(value))
+
+
+def aggregate(records: Sequence[Any],
+              metrics: Optional[Sequence[Dict[str, Any]]] = None,
+              group_by: Optional[Sequence[str]] = None,
+              filters: Optional[Sequence[Dict[str, Any]]] = None,
+              unnest_path: Optional[str] = None,
+              sort_by: Optional[str] = None,
+              descending: bool = True,
+              limit: int = 50) -> Dict[str, Any]:
+    """
+    Filter, group and aggregate a list of records.
+
+    Args:
+        records: The rows, usually dicts.
+        metrics: [{'op': one of METRIC_OPS, 'field': dotted path, 'as': optional name}];
+            defaults to a row count.
+        group_by: Dotted paths to group by; no grouping gives a single group.
+        filters: [{'field': path, 'op': one of FILTER_OPS, 'value': ...}], combined with AND.
+            String comparisons are case-insensitive; numeric strings compare as numbers.
+        unnest_path: List inside each record to expand into one row per element first.
+        sort_by: Metric name (or group_by field) to sort the groups by; defaults to the group keys.
+        descending: Sort direction when sort_by is given.
+        limit: Maximum number of groups to return.
+
+    Returns:
+        Dictionary with 'total_rows', 'matched_rows', 'group_count', 'groups' (each with
+        the group_by values and the metrics) and 'truncated'.
+
+    Raises:
+        AggregationError: If the request is invalid.
+    """
+    metrics = list(metrics or [{"op": "count"}])
+    group_by = list(group_by or [])
+    for metric in metrics:
+        if metric.get("op") not in METRIC_OPS:
+            raise AggregationError(f"Unknown metric op '{metric.get('op')}'. Use one of {list(METRIC_OPS)}.")
+
+    if unnest_path:
+        records = unnest(records, unnest_path)
+    table = Table(records)
+    rows = np.flatnonzero(table.mask(filters or []))
+    gid, labels = _group_ids(table, rows, group_by)
+    n_groups = len(labels) if len(rows) or not group_by else 0
+
+    columns = {metric_name(m): _metric(table, rows, gid, n_groups, m["op"], m.get("field")) for m in metrics}
+    groups = []
+    for i in range(n_groups):
+        group = dict(zip(group_by, labels[i]))
+        group.update({name: values[i] for name, values in columns.items()})
+        groups.append(group)
+
+    if sort_by:
+        if groups and sort_by not in groups[0]:
+            raise AggregationError(f"Cannot sort by '{sort_by}'. Use one of {list(groups[0])}.")
+        present = [g for g in groups if g.get(sort_by) is not None]
+        missing = [g for g in groups if g.get(sort_by) is None]
+        groups = sorted(present, key=lambda g: _sort_key(g[sort_by]), reverse=descending) + missing
+
+    limit = max(1, limit)
+    return {
+        "total_rows": len(table),
+        "matched_rows": int(len(rows)),
+        "group_count": n_groups,
+        "groups": groups[:limit],
+        "truncated": n_groups > limit,
+    }
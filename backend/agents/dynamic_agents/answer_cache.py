@@ -0,0 +1,265 @@
+"""
+Answer cache for repeated market questions.
+
+Many users ask the same question ("AT&T fiber prices in 73034") within one
+data day, and each one ran the whole contextualize -> swarm -> refine pipeline.
+The answer cache node looks the contextualizer's standalone query up after the
+preparation nodes and, on a hit, answers with the cached refined answer and its
+trace without calling the swarm.
+
+Entries are scoped to the data date and the user's locale. A query matches an
+entry with the same normalized text, or one whose embedding is at least
+ANSWER_CACHE_SIMILARITY cosine-similar. Embeddings miss the parts that make a
+similar question a different one, so a semantic match also needs the same exact
+terms: numbers (ZIP codes, speeds, prices), negations ("with HBO" and "without
+HBO") and place names from the geo data ("Oklahoma" and "Oklahoma City").
+Embeddings come from a LangChain Embeddings class named by
+ANSWER_CACHE_EMBEDDINGS ("package.module:ClassName"), e.g. a local
+sentence-transformers model, and otherwise from HashedNgramEmbeddings, which
+needs no model and works offline.
+"""
+
+import datetime
+import importlib
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from backend.agents.dynamic_agents.query_classifier import normalize_query
+
+log = logging.getLogger(__name__)
+
+ANSWER_CACHE = os.getenv("ANSWER_CACHE", "true").strip().lower() in ("1", "true", "yes")
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.9"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "21600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+ANSWER_CACHE_EMBEDDINGS = os.getenv("ANSWER_CACHE_EMBEDDINGS", "")
+DEFAULT_LOCALE = "en-US"
+HASHED_NGRAM_DIMENSIONS = 1024
+
+# Request setting (agent_config) naming the date the data should be as of, e.g. "2026-10-01"
+DATA_DATE_KEY = "data_date"
+
+_NUMBER = re.compile(r"\d+")
+# Words that turn a question into its opposite; they must match exactly
+_NEGATIONS = frozenset("no not non without except excluding exclude never none".split())
+# Words that do not change what a market question asks for
+_STOPWORDS = frozenset(
+    "a an the of in for on at to from by with and or is are was were be do does did what whats which who how "
+    "show me give list tell find get i we you my our can could would please zip code codes area there any "
+    "all about current currently available".split()
+)
+
+
+def content_words(text: str) -> List[str]:
+    """The words of a query that change what it asks for, plural 's' removed."""
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+            for word in normalize_query(text).split() if word not in _STOPWORDS]
+
+
+class HashedNgramEmbeddings(Embeddings):
+    """
+    Embeddings from hashed words, word pairs and character trigrams.
+
+    Deterministic across processes (crc32, not hash()), needs no model files and
+    is fast enough to run on every lookup. Only content words count, so it
+    captures reworded and reordered queries, not synonyms.
+    """
+
+    def __init__(self, dimensions: int = HASHED_NGRAM_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> List[Tuple[str, float]]:
+        # Content words only, so wording and word order matter little
+        words = content_words(text)
+        features = [(f"w:{word}", 1.0) for word in words]
+        features += [(f"b:{a} {b}", 0.3) for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"<{word}>"
+            features += [(f"c:{padded[i:i + 3]}", 0.2) for i in range(len(padded) - 2)]
+        return features
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions)
+        for feature, weight in self._features(text):
+            digest = zlib.crc32(feature.encode("utf-8"))
+            vector[digest % self.dimensions] += weight if digest & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def load_embeddings(spec: str = ANSWER_CACHE_EMBEDDINGS) -> Embeddings:
+    """The Embeddings named by 'package.module:ClassName' (created without arguments), or HashedNgramEmbeddings."""
+    if not spec:
+        return HashedNgramEmbeddings()
+    try:
+        module_name, _, attribute = spec.partition(":")
+        factory = getattr(importlib.import_module(module_name), attribute)
+        return factory()
+    except Exception as e:
+        log.warning(f"Answer cache embeddings '{spec}' unavailable, using hashed n-grams: {e}")
+        return HashedNgramEmbeddings()
+
+
+def geo_place_names(text: str) -> List[str]:
+    """City, county and state names of the geo data in a text; none if the geo data is unavailable."""
+    # Imported here: tools loads the agents' whole tool set
+    from backend.agents.dynamic_agents.tools import get_shared_zip_finder
+
+    finder = get_shared_zip_finder()
+    return finder.location_index.find_place_names(text) if finder else []
+
+
+def answer_cache_scope(configurable: Optional[Dict[str, Any]] = None, today: Optional[datetime.date] = None) -> str:
+    """
+    Scope of cached answers: the data date (answers change when the data does) and the locale.
+
+    The data date is the request's DATA_DATE_KEY setting, or today's date.
+
+    Raises:
+        ValueError: If the requested data date is not an ISO date.
+    """
+    configurable = configurable or {}
+    locale = configurable.get("locale") or DEFAULT_LOCALE
+    data_date = configurable.get(DATA_DATE_KEY)
+    if isinstance(data_date, datetime.date):
+        data_date = data_date.isoformat()
+    elif data_date:
+        data_date = datetime.date.fromisoformat(str(data_date).strip()[:10]).isoformat()
+    else:
+        data_date = (today or datetime.date.today()).isoformat()
+    return f"{data_date}|{locale}"
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    trace: Dict[str, Any]
+    vector: np.ndarray
+    exact_terms: FrozenSet[str]
+    stored_at: float
+
+
+@dataclass(frozen=True)
+class AnswerCacheHit:
+    answer: str
+    trace: Dict[str, Any]
+    match: str  # 'exact' or 'semantic'
+    similarity: float
+    cached_query: str
+    age_seconds: float = field(default=0.0)
+
+
+class AnswerCache:
+    """Refined answers by scope and query, with exact and embedding lookup, a TTL and an LRU size bound."""
+
+    def __init__(self,
+                 embeddings: Optional[Embeddings] = None,
+                 min_similarity: float = ANSWER_CACHE_SIMILARITY,
+                 ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 max_size: int = ANSWER_CACHE_SIZE,
+                 clock: Callable[[], float] = time.monotonic,
+                 place_names: Callable[[str], List[str]] = geo_place_names):
+        self._embeddings = embeddings
+        self._place_names = place_names
+        self.min_similarity = min_similarity
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, str], CachedAnswer]" = OrderedDict()
+        self._counts = {"lookups": 0, "exact_hits": 0, "semantic_hits": 0, "misses": 0,
+                        "stores": 0, "evictions": 0, "expired": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            self._embeddings = load_embeddings()
+        return self._embeddings
+
+    def _embed(self, query: str) -> np.ndarray:
+        return np.asarray(self.embeddings.embed_query(normalize_query(query)), dtype=float)
+
+    def exact_terms(self, query: str) -> FrozenSet[str]:
+        """The parts of a query a semantic match must share: numbers, negations and place names."""
+        words = normalize_query(query).split()
+        terms = {word for word in words if _NUMBER.fullmatch(word) or word in _NEGATIONS}
+        terms.update(f"place:{name}" for name in self._place_names(query))
+        return frozenset(terms)
+
+    def _expire(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if now - entry.stored_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        self._counts["expired"] += len(expired)
+
+    def lookup(self, query: str, scope: str) -> Optional[AnswerCacheHit]:
+        """The cached answer for a query in a scope, if there is a close enough one."""
+        key = (scope, normalize_query(query))
+        terms = self.exact_terms(query)
+        with self._lock:
+            self._counts["lookups"] += 1
+            now = self._clock()
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counts["exact_hits"] += 1
+                return AnswerCacheHit(entry.answer, entry.trace, "exact", 1.0, entry.query, now - entry.stored_at)
+            # Similar embeddings are not enough: another ZIP code, "without" or "Oklahoma City" is another question
+            candidates = [(k, e) for k, e in self._entries.items() if k[0] == scope and e.exact_terms == terms]
+        best: Optional[Tuple[float, Tuple[str, str], CachedAnswer]] = None
+        if candidates:
+            vector = self._embed(query)
+            similarities = np.stack([entry.vector for _, entry in candidates]) @ vector
+            index = int(np.argmax(similarities))
+            if similarities[index] >= self.min_similarity:
+                best = (float(similarities[index]), *candidates[index])
+        with self._lock:
+            if best is None or best[1] not in self._entries:
+                self._counts["misses"] += 1
+                return None
+            similarity, best_key, entry = best
+            self._entries.move_to_end(best_key)
+            self._counts["semantic_hits"] += 1
+            return AnswerCacheHit(entry.answer, entry.trace, "semantic", round(similarity, 4), entry.query,
+                                  self._clock() - entry.stored_at)
+
+    def store(self, query: str, scope: str, answer: str, trace: Dict[str, Any]) -> None:
+        """Cache a refined answer and its trace."""
+        normalized = normalize_query(query)
+        if not normalized or not answer:
+            return
+        entry = CachedAnswer(query, answer, trace, self._embed(query), self.exact_terms(query), self._clock())
+        with self._lock:
+            self._entries[(scope, normalized)] = entry
+            self._entries.move_to_end((scope, normalized))
+            self._counts["stores"] += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counts["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counts)
+            stats["entries"] = len(self._entries)
+        hits = stats["exact_hits"] + stats["semantic_hits"]
+        stats["hit_rate"] = round(hits / stats["lookups"], 4) if stats["lookups"] else 0.0
+        stats["enabled"] = ANSWER_CACHE
+        return stats
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,93 @@
+"""
+Deterministic clean-up of agent answers, used instead of the refinement LLM call
+when refinement would add nothing.
+
+Refinement is a second call to the primary LLM with a long system prompt; it
+checks the answer against the tool outputs and strips AI narration. Greetings,
+questions back to the user and other answers given without any data lookup have
+nothing to check, so refinement_skip_reason routes them past it and clean_answer
+removes the narration with a few rules instead.
+"""
+
+import os
+import re
+from typing import Optional
+
+REFINE_SKIP = os.getenv("REFINE_SKIP", "true").strip().lower() in ("1", "true", "yes")
+# Answers up to this many characters are not refined (0 disables the size rule)
+REFINE_SKIP_MAX_CHARS = int(os.getenv("REFINE_SKIP_MAX_CHARS", "300"))
+
+HANDOFF_TOOL_PREFIX = "transfer_to_"
+LATEST_MESSAGE_TAG = "[LATEST_MESSAGE] "
+
+# Sentences that only describe what the assistant is doing
+_NARRATION = re.compile(
+    r"^(let me|let's|i'll|i will|i need to|i'm going to|i am going to|i should|first,? i|now,? i|next,? i|"
+    r"i (have |)(searched|checked|queried|looked|used|ran|called|retrieved|fetched))\b",
+    re.IGNORECASE,
+)
+# Attributions to the data source that open a sentence, e.g. "According to the database, ..."
+_ATTRIBUTION = re.compile(
+    r"(^|(?<=[.!?]\s))(according to|based on) (the|my|our) "
+    r"(database|data|queries|query results|search results|search|tool outputs?)[,:]?\s+(\w)",
+    re.IGNORECASE | re.MULTILINE,
+)
+_SENTENCE_END = re.compile(r"(?<=[.!?:])\s+")
+_SCHEMA_APPENDIX = re.compile(
+    r"\n*--- BEGIN ATTACHED GRAPHQL SCHEMA \(FOR AI REFERENCE\) ---.*?--- END ATTACHED GRAPHQL SCHEMA ---",
+    re.DOTALL,
+)
+
+
+def refinement_skip_reason(answer: str,
+                           requires_database_access: Optional[bool],
+                           data_tool_calls: int,
+                           enabled: bool = REFINE_SKIP,
+                           max_chars: int = REFINE_SKIP_MAX_CHARS) -> Optional[str]:
+    """
+    Why the refinement LLM call can be skipped for an answer, if it can.
+
+    Args:
+        answer: The swarm's answer.
+        requires_database_access: The contextualizer's verdict for the query (None if unknown).
+        data_tool_calls: Tools the swarm called this turn, not counting hand-offs between agents.
+
+    Returns:
+        'no_database_access', 'no_tool_outputs' or 'short_answer', or None to refine.
+    """
+    if not enabled or not answer.strip():
+        return None
+    if data_tool_calls == 0:
+        return "no_database_access" if requires_database_access is False else "no_tool_outputs"
+    if max_chars and len(answer) <= max_chars:
+        return "short_answer"
+    return None
+
+
+def _is_narration(paragraph: str) -> bool:
+    sentences = [s for s in _SENTENCE_END.split(paragraph.strip()) if s]
+    return bool(sentences) and all(_NARRATION.match(sentence) for sentence in sentences)
+
+
+def clean_answer(text: str) -> str:
+    """
+    Remove AI narration from an answer without changing its data.
+
+    Drops leading and trailing paragraphs that only narrate ("Let me look that
+    up."), attributions to the data source at the start of a sentence
+    ("According to the database, ..."), message tags and any leaked schema
+    appendix. Tables, lists and all other content are kept as they are.
+    """
+    text = _SCHEMA_APPENDIX.sub("", text or "").replace(LATEST_MESSAGE_TAG, "")
+    paragraphs = [p for p in re.split(r"\n\s*\n", text.strip()) if p.strip()]
+    while len(paragraphs) > 1 and _is_narration(paragraphs[0]):
+        paragraphs.pop(0)
+    while len(paragraphs) > 1 and _is_narration(paragraphs[-1]):
+        paragraphs.pop()
+
+    cleaned = []
+    for paragraph in paragraphs:
+        # Capitalize what starts the sentence once the attribution in front of it is gone
+        paragraph = _ATTRIBUTION.sub(lambda m: m.group(1) + m.group(5).upper(), paragraph)
+        cleaned.append("\n".join(line.rstrip() for line in paragraph.splitlines()))
+    return "\n\n".join(cleaned).strip()
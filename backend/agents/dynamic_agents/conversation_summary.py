@@ -0,0 +1,129 @@
+"""
+Rolling conversation summary with a token budget for the swarm's history.
+
+RefinedAgentState.messages only ever grows. Instead of passing all of it to the
+swarm, select_history keeps the last CONVERSATION_KEEP_TURNS turns verbatim
+(fewer if they exceed CONVERSATION_TOKEN_BUDGET) and puts the running summary
+of everything older in front of them. The summary is written to the state by
+the summarize_history node, which runs next to the swarm rather than before it,
+so a turn never waits for it; the turns it has not folded in yet are passed
+verbatim as far as the budget allows.
+"""
+
+import logging
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from backend.agents.dynamic_agents.token_budget import count_tokens
+
+log = logging.getLogger(__name__)
+
+# Turns kept verbatim; 0 passes the whole history and turns summarization off
+CONVERSATION_KEEP_TURNS = int(os.getenv("CONVERSATION_KEEP_TURNS", "6"))
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "12000"))
+SUMMARY_INTRO = "Summary of the earlier conversation (older turns are not shown):\n"
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> List[List[BaseMessage]]:
+    """Group messages into turns, each starting at a HumanMessage (messages before the first one join the first turn)."""
+    turns: List[List[BaseMessage]] = []
+    has_human = False
+    for message in messages:
+        if not turns or (isinstance(message, HumanMessage) and has_human):
+            turns.append([])
+            has_human = False
+        turns[-1].append(message)
+        has_human = has_human or isinstance(message, HumanMessage)
+    return turns
+
+
+def _message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    return count_tokens(content) + 4  # role and separators
+
+
+def _is_context(message: BaseMessage) -> bool:
+    """System messages carry context (the schema), not conversation; they are never summarized away."""
+    return isinstance(message, SystemMessage)
+
+
+def select_history(messages: Sequence[BaseMessage],
+                   summary: Optional[str],
+                   summarized_turns: int,
+                   keep_turns: int = CONVERSATION_KEEP_TURNS,
+                   token_budget: int = CONVERSATION_TOKEN_BUDGET) -> List[BaseMessage]:
+    """
+    The history to pass to the swarm: summary, latest context message and the most recent turns.
+
+    Args:
+        messages: The thread's messages, the current user message last.
+        summary: The running summary of the first summarized_turns turns, if any.
+        summarized_turns: How many turns (from the start) the summary covers.
+        keep_turns: Turns that are always kept verbatim, budget permitting.
+        token_budget: Tokens for the whole history; the current turn is always kept.
+
+    Returns:
+        The selected messages in conversation order.
+    """
+    if keep_turns <= 0:
+        return list(messages)
+    turns = split_turns(messages)
+    if len(turns) <= keep_turns and not summary:
+        return list(messages)
+
+    # Newest turns first, until the budget or (for turns the summary covers) the keep window is used up
+    summary_message = SystemMessage(content=SUMMARY_INTRO + summary) if summary else None
+    used = _message_tokens(summary_message) if summary_message else 0
+    kept: List[List[BaseMessage]] = []
+    for index in range(len(turns) - 1, -1, -1):
+        turn = [m for m in turns[index] if not _is_context(m)]
+        if kept:
+            covered = index < summarized_turns
+            if covered and len(kept) >= keep_turns:
+                break
+            tokens = sum(_message_tokens(m) for m in turn)
+            if used + tokens > token_budget:
+                break
+        else:
+            tokens = sum(_message_tokens(m) for m in turn)
+        kept.insert(0, turn)
+        used += tokens
+    first_kept = len(turns) - len(kept)
+
+    # The latest context message from the dropped turns (the schema) stays available
+    context = [m for turn in turns[:first_kept] for m in turn if _is_context(m)][-1:]
+    kept_context = {id(m) for turn in turns[first_kept:] for m in turn if _is_context(m)}
+    history: List[BaseMessage] = ([summary_message] if summary_message else []) + context
+    for index in range(first_kept, len(turns)):
+        history.extend(m for m in turns[index] if not _is_context(m) or id(m) in kept_context)
+    return history
+
+
+def turns_to_summarize(messages: Sequence[BaseMessage],
+                       summarized_turns: int,
+                       keep_turns: int = CONVERSATION_KEEP_TURNS) -> Tuple[List[List[BaseMessage]], int]:
+    """
+    Turns that have left the keep window but are not in the summary yet.
+
+    Returns:
+        The turns, and how many turns the summary covers once they are added.
+    """
+    if keep_turns <= 0:
+        return [], summarized_turns
+    turns = split_turns(messages)
+    covered = max(summarized_turns, len(turns) - keep_turns)
+    return turns[summarized_turns:covered], covered
+
+
+def format_turns(turns: List[List[BaseMessage]]) -> str:
+    """Plain-text transcript of turns for the summarizer prompt."""
+    lines = []
+    for turn in turns:
+        for message in turn:
+            if isinstance(message, HumanMessage):
+                lines.append(f"USER: {message.content}")
+            elif isinstance(message, AIMessage):
+                lines.append(f"ASSISTANT: {message.content}")
+    return "\n".join(lines)
@@ -0,0 +1,145 @@
+"""
+End-to-end request deadlines.
+
+Every GraphQL call has its own timeout, but nothing capped a whole request: the
+swarm could keep looping for minutes. The service turns the request's time
+budget (agent_config "timeout_seconds", or REQUEST_DEADLINE_SECONDS) into an
+absolute deadline in the run's configurable ("deadline", seconds since the
+epoch), which every graph node, subgraph and tool sees through RunnableConfig.
+
+Nodes and tools shorten their own timeouts to the time that is left and degrade
+instead of failing when it runs out:
+
+- contextualize_query gets a share of the budget and falls back to the local
+  query classifier;
+- app_agent stops the swarm so that DEADLINE_REFINE_RESERVE_SECONDS are left,
+  and answers with what the swarm had so far;
+- refine_output is skipped (the swarm's answer is only cleaned up) when less
+  than DEADLINE_MIN_REFINE_SECONDS are left, or when the LLM call overruns;
+- GraphQL requests time out at the deadline and are not sent after it.
+
+DeadlineStats counts these events per component (served at /admin/metrics).
+"""
+
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Mapping, Optional
+
+from langchain_core.runnables.config import ensure_config
+
+# Time budget of a request when the client sets none (0: no deadline) and the most a client may ask for
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "120"))
+REQUEST_DEADLINE_MAX_SECONDS = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", "600"))
+# Time kept for refine_output while the swarm runs, and the least time a refinement is started with
+DEADLINE_REFINE_RESERVE_SECONDS = float(os.getenv("DEADLINE_REFINE_RESERVE_SECONDS", "15"))
+DEADLINE_MIN_REFINE_SECONDS = float(os.getenv("DEADLINE_MIN_REFINE_SECONDS", "5"))
+# Share of the remaining time the contextualizer LLM call may use
+CONTEXTUALIZER_DEADLINE_SHARE = 0.25
+DEADLINE_KEY = "deadline"
+TIMEOUT_SECONDS_KEY = "timeout_seconds"
+
+
+def request_deadline(timeout_seconds: Any = None, now: Optional[float] = None) -> Optional[float]:
+    """
+    Absolute deadline of a request that starts now.
+
+    Args:
+        timeout_seconds: The client's time budget; REQUEST_DEADLINE_SECONDS if None.
+            Capped at REQUEST_DEADLINE_MAX_SECONDS.
+
+    Returns:
+        Seconds since the epoch, or None if the request has no deadline.
+
+    Raises:
+        ValueError: If timeout_seconds is not a positive, finite number.
+    """
+    if timeout_seconds is None:
+        budget = REQUEST_DEADLINE_SECONDS
+    else:
+        try:
+            budget = float(timeout_seconds)
+        except (TypeError, ValueError):
+            raise ValueError(f"{TIMEOUT_SECONDS_KEY} must be a number of seconds, got {timeout_seconds!r}")
+        if not math.isfinite(budget) or budget <= 0:
+            raise ValueError(f"{TIMEOUT_SECONDS_KEY} must be a positive, finite number, got {timeout_seconds!r}")
+    if budget <= 0:
+        return None
+    if REQUEST_DEADLINE_MAX_SECONDS > 0:
+        budget = min(budget, REQUEST_DEADLINE_MAX_SECONDS)
+    return (time.time() if now is None else now) + budget
+
+
+def remaining_seconds(config: Optional[Mapping[str, Any]] = None) -> Optional[float]:
+    """
+    Seconds left until the request's deadline (negative once it has passed).
+
+    Args:
+        config: The run's RunnableConfig; the current run's config if None, which
+            also reaches tools running on executor threads.
+
+    Returns:
+        None if the request has no deadline.
+    """
+    if config is None:
+        config = ensure_config()
+    deadline = (config.get("configurable") or {}).get(DEADLINE_KEY)
+    if deadline is None:
+        return None
+    return float(deadline) - time.time()
+
+
+def stage_timeout(config: Optional[Mapping[str, Any]] = None,
+                  reserve: float = 0.0,
+                  share: float = 1.0,
+                  cap: Optional[float] = None) -> Optional[float]:
+    """
+    Timeout for a stage of the request.
+
+    Args:
+        reserve: Seconds to leave for the stages after this one.
+        share: Fraction of the remaining time (after the reserve) the stage may use.
+        cap: The stage's own timeout, used when it is shorter.
+
+    Returns:
+        Seconds (0 when the time is up), or cap if the request has no deadline.
+    """
+    remaining = remaining_seconds(config)
+    if remaining is None:
+        return cap
+    timeout = max(0.0, (remaining - reserve) * share)
+    return timeout if cap is None else min(timeout, cap)
+
+
+class DeadlineStats:
+    """Deadline events by component: stages skipped or cut short, and timeouts shortened."""
+
+    def __init__(self) -> None:
+        self._exceeded: Counter = Counter()
+        self._shortened: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def exceeded(self, component: str) -> None:
+        """A stage was skipped or cut short because the deadline was (nearly) reached."""
+        with self._lock:
+            self._exceeded[component] += 1
+
+    def shortened(self, component: str) -> None:
+        """A stage ran with a shorter timeout than its own because of the deadline."""
+        with self._lock:
+            self._shortened[component] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            exceeded, shortened = dict(self._exceeded), dict(self._shortened)
+        return {
+            "exceeded": exceeded,
+            "exceeded_total": sum(exceeded.values()),
+            "shortened_timeouts": shortened,
+            "default_seconds": REQUEST_DEADLINE_SECONDS,
+        }
+
+
+deadline_stats = DeadlineStats()
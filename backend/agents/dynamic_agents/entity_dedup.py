@@ -0,0 +1,178 @@
+"""
+Cross-query deduplication of GraphQL entities.
+
+Parallel queries over several zip codes or providers return the same package,
+promotion or channel objects again and again, and every copy ends up in the
+ToolMessage and later in the refine prompt. dedup_entities moves objects that
+occur more than once into a shared entity table and leaves a {"$ref": "..."}
+in each place they occurred, so every query result still lists exactly the
+entities it returned.
+
+An object is an entity if it carries one of ENTITY_ID_KEYS (or another
+'...FactId' key). Copies are only merged when they are identical; the same id
+selected with different fields gives separate table entries.
+"""
+
+import json
+import logging
+import os
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from backend.agents.dynamic_agents.token_budget import count_tokens
+
+log = logging.getLogger(__name__)
+
+ENTITY_ID_KEYS = tuple(
+    key.strip()
+    for key in os.getenv("GRAPHQL_ENTITY_ID_KEYS", "packageFactId,promotionFactId,channelFactId").split(",")
+    if key.strip()
+)
+# Objects smaller than this (serialized) are left inline; a reference would not be shorter.
+DEDUP_MIN_CHARS = int(os.getenv("GRAPHQL_DEDUP_MIN_CHARS", "64"))
+
+REF_KEY = "$ref"
+
+
+def entity_ref(obj: Dict[str, Any]) -> Optional[str]:
+    """Reference name of an entity, e.g. 'packageFactId:123', or None if the object has no id."""
+    for key in ENTITY_ID_KEYS:
+        if obj.get(key) is not None:
+            break
+    else:
+        key = next((k for k, v in obj.items() if k.endswith("FactId") and v is not None), None)
+        if key is None:
+            return None
+    typename = obj.get("__typename")
+    return f"{typename}.{key}:{obj[key]}" if typename else f"{key}:{obj[key]}"
+
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def _count(value: Any, counts: Counter) -> None:
+    """Count identical entity copies; entities are units, their insides are not counted again."""
+    if isinstance(value, dict):
+        ref = entity_ref(value)
+        if ref is not None:
+            counts[(ref, _canonical(value))] += 1
+            return
+        for child in value.values():
+            _count(child, counts)
+    elif isinstance(value, list):
+        for child in value:
+            _count(child, counts)
+
+
+def _replace(value: Any, names: Dict[Tuple[str, str], str], entities: Dict[str, Any]) -> Any:
+    if isinstance(value, dict):
+        ref = entity_ref(value)
+        if ref is not None:
+            name = names.get((ref, _canonical(value)))
+            if name is None:
+                return value
+            entities.setdefault(name, value)
+            return {REF_KEY: name}
+        return {key: _replace(child, names, entities) for key, child in value.items()}
+    if isinstance(value, list):
+        return [_replace(child, names, entities) for child in value]
+    return value
+
+
+def dedup_entities(values: Iterable[Any]) -> Tuple[List[Any], Dict[str, Any]]:
+    """
+    Replace entities that occur more than once across values by references.
+
+    Args:
+        values: JSON values, e.g. the results of several queries.
+
+    Returns:
+        (values with repeated entities replaced by {'$ref': name}, entity table name -> object)
+    """
+    values = list(values)
+    counts: Counter = Counter()
+    for value in values:
+        _count(value, counts)
+
+    names: Dict[Tuple[str, str], str] = {}
+    variants: Counter = Counter()
+    for (ref, canonical), count in counts.items():
+        if count < 2 or len(canonical) < DEDUP_MIN_CHARS:
+            continue
+        variants[ref] += 1
+        # The same id with a different field selection gets its own entry
+        names[(ref, canonical)] = ref if variants[ref] == 1 else f"{ref}~{variants[ref]}"
+
+    if not names:
+        return values, {}
+    entities: Dict[str, Any] = {}
+    return [_replace(value, names, entities) for value in values], entities
+
+
+def expand_refs(value: Any, entities: Dict[str, Any]) -> Any:
+    """Inverse of dedup_entities: put the entities back in place of their references."""
+    if isinstance(value, dict):
+        if set(value) == {REF_KEY} and value[REF_KEY] in entities:
+            return entities[value[REF_KEY]]
+        return {key: expand_refs(child, entities) for key, child in value.items()}
+    if isinstance(value, list):
+        return [expand_refs(child, entities) for child in value]
+    return value
+
+
+def _count_refs(value: Any) -> int:
+    if isinstance(value, dict):
+        return 1 if REF_KEY in value else sum(_count_refs(child) for child in value.values())
+    if isinstance(value, list):
+        return sum(_count_refs(child) for child in value)
+    return 0
+
+
+def dedup_query_results(results: Dict[str, Any], fields: Tuple[str, ...] = ("result", "result_preview")) -> Optional[Dict[str, Any]]:
+    """
+    Deduplicate entities across the results of one parallel GraphQL call, in place.
+
+    Args:
+        results: Results keyed by query_id, as returned by ParallelGraphQLExecutor.
+        fields: Fields of each result entry that hold GraphQL data.
+
+    Returns:
+        {'entities': table, 'stats': savings} or None if nothing was repeated. The
+        stats give the entity and reference counts and the bytes and tokens of the
+        data before and after (the table included).
+    """
+    slots = [
+        (entry, field)
+        for entry in results.values()
+        if isinstance(entry, dict)
+        for field in fields
+        if entry.get(field) is not None
+    ]
+    if not slots:
+        return None
+    before = [entry[field] for entry, field in slots]
+    after, entities = dedup_entities(before)
+    if not entities:
+        return None
+
+    text_before = _canonical(before)
+    text_after = _canonical([after, entities])
+    for (entry, field), value in zip(slots, after):
+        entry[field] = value
+    references = _count_refs(after)
+    stats = {
+        "entities": len(entities),
+        "references": references,
+        "bytes_before": len(text_before.encode("utf-8")),
+        "bytes_after": len(text_after.encode("utf-8")),
+        "tokens_before": count_tokens(text_before),
+        "tokens_after": count_tokens(text_after),
+    }
+    stats["bytes_saved"] = stats["bytes_before"] - stats["bytes_after"]
+    stats["tokens_saved"] = stats["tokens_before"] - stats["tokens_after"]
+    log.info(
+        f"Entity dedup: {len(entities)} entities, {references} references, "
+        f"saved {stats['bytes_saved']} bytes / {stats['tokens_saved']} tokens"
+    )
+    return {"entities": entities, "stats": stats}
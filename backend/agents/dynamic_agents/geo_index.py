@@ -0,0 +1,828 @@
+"""
+Precomputed lookup indexes over the reference geo data (data/geo-data.csv, data/DMAs.csv).
+
+The ZipCodeFinder only supports exact (lowercased) matches on city, county and
+state names. The indexes in this module let it recover from the spellings LLMs
+actually produce ("Oklahoma Cty", "St Louis", "Cleveland County") without
+spending another model turn on guessing.
+"""
+
+import bisect
+import logging
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Abbreviations that are spelled both ways in place names. Both the indexed
+# names and the queries are rewritten to the long form before matching.
+PLACE_NAME_ALIASES: Dict[str, str] = {
+    "st": "saint",
+    "ste": "sainte",
+    "ft": "fort",
+    "mt": "mount",
+    "mtn": "mountain",
+    "pt": "point",
+}
+
+# Trailing words that name the kind of county-equivalent rather than the place.
+COUNTY_SUFFIXES: Tuple[str, ...] = (
+    "city and borough",
+    "census area",
+    "municipality",
+    "borough",
+    "county",
+    "parish",
+)
+# Counties whose name ends in "City"; every other county-equivalent ending in "city" is an
+# independent city (St. Louis city, Baltimore city, Carson City, ...) and is labelled as is
+CITY_NAMED_COUNTIES = frozenset({"charles city", "james city"})
+
+_PUNCTUATION_TO_DROP = re.compile(r"[.'`’]")
+_PUNCTUATION_TO_SPACE = re.compile(r"[^a-z0-9 ]+")
+
+
+def normalize_place_name(name: str, strip_county_suffix: bool = False) -> str:
+    """
+    Normalize a place name for matching.
+
+    Lowercases, removes punctuation, expands common abbreviations (St/Saint,
+    Ft/Fort, ...) and optionally drops county suffixes ("County", "Parish", ...).
+
+    Args:
+        name: Raw place name, e.g. "St. Louis County".
+        strip_county_suffix: Drop a trailing county-equivalent suffix.
+
+    Returns:
+        The normalized name, e.g. "saint louis".
+    """
+    if not name:
+        return ""
+    text = str(name).lower().replace("&", " and ")
+    text = _PUNCTUATION_TO_DROP.sub("", text)
+    text = _PUNCTUATION_TO_SPACE.sub(" ", text)
+    tokens = [PLACE_NAME_ALIASES.get(token, token) for token in text.split()]
+    normalized = " ".join(tokens)
+
+    if strip_county_suffix:
+        for suffix in COUNTY_SUFFIXES:
+            if normalized.endswith(" " + suffix):
+                normalized = normalized[: -len(suffix) - 1]
+                break
+    return normalized
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Character trigrams of a normalized name, padded so word edges count."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Inverted trigram index over a fixed set of normalized names.
+
+    Scoring is the Dice coefficient between trigram sets, computed for every
+    name at once with numpy. The top candidates are then re-ranked with a
+    character-level similarity ratio so that near-ties resolve sensibly.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = sorted(set(n for n in names if n))
+        postings: Dict[str, List[int]] = {}
+        sizes = np.zeros(len(self.names), dtype=np.int32)
+        for name_id, name in enumerate(self.names):
+            grams = _trigrams(name)
+            sizes[name_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(name_id)
+        self._sizes = sizes
+        self._postings: Dict[str, np.ndarray] = {
+            gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+        self._ids = {name: name_id for name_id, name in enumerate(self.names)}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def mask_for(self, names: Iterable[str]) -> np.ndarray:
+        """Boolean mask over the index selecting the given names."""
+        mask = np.zeros(len(self.names), dtype=bool)
+        mask[[self._ids[n] for n in names if n in self._ids]] = True
+        return mask
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        min_score: float = 0.0,
+        allowed: Optional[np.ndarray] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the names most similar to a normalized query.
+
+        Args:
+            query: Normalized query string.
+            limit: Maximum number of names to return.
+            min_score: Drop names scoring below this value (0..1).
+            allowed: Optional boolean mask (see mask_for) restricting the candidates.
+
+        Returns:
+            List of (name, score) tuples, best first.
+        """
+        if not query or not self.names:
+            return []
+        exact_id = self._ids.get(query)
+        if exact_id is not None and (allowed is None or allowed[exact_id]):
+            exact = [(query, 1.0)]
+            if limit == 1:
+                return exact
+        else:
+            exact = []
+
+        query_grams = _trigrams(query)
+        hits = [self._postings[g] for g in query_grams if g in self._postings]
+        if not hits:
+            return exact
+        overlap = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        dice = (2.0 * overlap) / (self._sizes + len(query_grams))
+        if allowed is not None:
+            dice = np.where(allowed, dice, 0.0)
+
+        # Over-fetch before re-ranking so the finer ratio can reorder near-ties.
+        shortlist_size = min(len(self.names), max(limit * 2, 10))
+        shortlist = np.argpartition(-dice, shortlist_size - 1)[:shortlist_size]
+
+        scored: List[Tuple[str, float]] = list(exact)
+        for name_id in shortlist:
+            if dice[name_id] <= 0 or name_id == exact_id:
+                continue
+            name = self.names[name_id]
+            ratio = SequenceMatcher(None, query, name).ratio()
+            score = round(0.5 * float(dice[name_id]) + 0.5 * ratio, 4)
+            if score >= min_score:
+                scored.append((name, score))
+
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+
+class LocationIndex:
+    """
+    Typo- and alias-tolerant index over the city, county and state names of the geo data.
+
+    Each location type has its own TrigramIndex over normalized names. A
+    normalized name maps back to every original (lowercased) CSV value and the
+    states it occurs in, so a hit can be fed straight back into
+    ZipCodeFinder.get_zipcode.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, str, str, str]]):
+        """
+        Build the index.
+
+        Args:
+            rows: (city, county, state_full, state_abbr) tuples, already lowercased.
+        """
+        # location_type -> normalized name -> {(csv value, state_abbr)}
+        self._entries: Dict[str, Dict[str, Set[Tuple[str, str]]]] = {
+            "city": {},
+            "county": {},
+            "state": {},
+        }
+        self._state_abbr_by_name: Dict[str, str] = {}
+
+        for city, county, state_full, state_abbr in rows:
+            state_abbr = (state_abbr or "").lower()
+            if state_full:
+                self._state_abbr_by_name[state_full.lower()] = state_abbr
+                self._add("state", state_full, state_abbr, False)
+            if city:
+                self._add("city", city, state_abbr, False)
+            if county:
+                self._add("county", county, state_abbr, True)
+
+        self._indexes: Dict[str, TrigramIndex] = {
+            location_type: TrigramIndex(entries.keys())
+            for location_type, entries in self._entries.items()
+        }
+        # location_type -> state_abbr -> mask of the names occurring in that state
+        self._state_masks: Dict[str, Dict[str, np.ndarray]] = {}
+        for location_type in ("city", "county"):
+            names_by_state: Dict[str, List[str]] = {}
+            for key, values in self._entries[location_type].items():
+                for _, value_state in values:
+                    names_by_state.setdefault(value_state, []).append(key)
+            index = self._indexes[location_type]
+            self._state_masks[location_type] = {
+                abbr: index.mask_for(keys) for abbr, keys in names_by_state.items()
+            }
+        log.info(
+            "LocationIndex built: "
+            + ", ".join(f"{t}={len(i)}" for t, i in self._indexes.items())
+        )
+
+    def _add(self, location_type: str, value: str, state_abbr: str, strip_suffix: bool) -> None:
+        key = normalize_place_name(value, strip_county_suffix=strip_suffix)
+        if key:
+            self._entries[location_type].setdefault(key, set()).add((value.lower(), state_abbr))
+
+    @classmethod
+    def from_dataframe(cls, df: Any, columns: Dict[str, str]) -> "LocationIndex":
+        """
+        Build the index from the ZipCodeFinder DataFrame.
+
+        Args:
+            df: DataFrame with lowercased city/county/state columns.
+            columns: The ZipCodeFinder.COLUMNS mapping of logical to actual column names.
+        """
+        unique_rows = df[
+            [columns["city"], columns["county"], columns["state_full"], columns["state_abbr"]]
+        ].drop_duplicates()
+        return cls(unique_rows.itertuples(index=False, name=None))
+
+    def find_place_names(self, text: str, max_words: int = 4) -> List[str]:
+        """
+        The city, county and state names in a text (exact, normalized), longest match first.
+
+        "Oklahoma City" is one name, not "Oklahoma" and a city. State
+        abbreviations are not matched: "in", "or" and "me" are also words.
+
+        Returns:
+            The normalized names in order of appearance.
+        """
+        words = normalize_place_name(text).split()
+        found: List[str] = []
+        i = 0
+        while i < len(words):
+            for size in range(min(max_words, len(words) - i), 0, -1):
+                name = " ".join(words[i:i + size])
+                if any(name in entries for entries in self._entries.values()):
+                    found.append(name)
+                    i += size
+                    break
+            else:
+                i += 1
+        return found
+
+    def _state_abbr(self, state: Optional[str]) -> Optional[str]:
+        """Resolve a state name or abbreviation to a lowercase abbreviation."""
+        if not state or not state.strip():
+            return None
+        value = state.strip().lower()
+        if len(value) == 2:
+            return value
+        return self._state_abbr_by_name.get(value, value)
+
+    def search(
+        self,
+        location: str,
+        location_type: str,
+        state: Optional[str] = None,
+        limit: int = 5,
+        min_score: float = 0.45,
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank candidate locations for a possibly misspelled name.
+
+        Args:
+            location: Location name as given by the caller, e.g. "Oklahoma Cty".
+            location_type: 'city', 'county' or 'state'.
+            state: Optional state name or abbreviation restricting the candidates.
+            limit: Maximum number of candidates to return.
+            min_score: Minimum similarity (0..1) for a candidate to be returned.
+
+        Returns:
+            Candidates best first, each with 'location' (the CSV spelling),
+            'location_type', 'state' (abbreviation) and 'score'.
+        """
+        location_type = getattr(location_type, "value", location_type)
+        index = self._indexes.get(location_type)
+        if index is None:
+            return []
+
+        query = normalize_place_name(location, strip_county_suffix=location_type == "county")
+        state_abbr = None if location_type == "state" else self._state_abbr(state)
+
+        allowed = None
+        if state_abbr:
+            allowed = self._state_masks.get(location_type, {}).get(state_abbr)
+            if allowed is None:
+                return []
+
+        candidates: List[Dict[str, Any]] = []
+        for name, score in index.search(query, limit=limit, min_score=min_score, allowed=allowed):
+            for value, value_state in sorted(self._entries[location_type][name]):
+                if state_abbr and value_state != state_abbr:
+                    continue
+                candidates.append({
+                    "location": value,
+                    "location_type": location_type,
+                    "state": value_state.upper(),
+                    "score": score,
+                })
+            if len(candidates) >= limit:
+                break
+        return candidates[:limit]
+
+
+_ZIP_PATTERN = re.compile(r"(?<![\d.$])(\d{5})(?:-\d{4})?(?![\d.])")
+
+
+def normalize_zipcode(zipcode: Any) -> str:
+    """Normalize a ZIP code given as int, 'ZIP+4' or short string to five characters."""
+    value = str(zipcode).strip()
+    if "-" in value:
+        value = value.split("-", 1)[0]
+    return value.zfill(5) if value.isdigit() else value.upper()
+
+
+class ReverseGeoIndex:
+    """
+    O(1) ZIP code -> place index over the geo data.
+
+    A ZIP code can straddle counties, cities or even states, so every ZIP code
+    maps to all of its (city, county, state, state_abbr, state_fips) rows.
+    """
+
+    FIELDS = ("city", "county", "state", "state_abbr", "state_fips")
+
+    def __init__(self, rows: Iterable[Tuple[str, str, str, str, str, Any]]):
+        """
+        Build the index.
+
+        Args:
+            rows: (zipcode, city, county, state, state_abbr, state_fips) tuples.
+        """
+        index: Dict[str, List[Dict[str, Any]]] = {}
+        for zipcode, city, county, state, state_abbr, state_fips in rows:
+            entry = {
+                "city": str(city).title(),
+                "county": str(county).title(),
+                "state": str(state).title(),
+                "state_abbr": str(state_abbr).upper(),
+                "state_fips": int(state_fips) if str(state_fips).isdigit() else None,
+            }
+            places = index.setdefault(normalize_zipcode(zipcode), [])
+            if entry not in places:
+                places.append(entry)
+        self._index = index
+        self._sorted: Optional[List[str]] = None
+        self._areas: Optional[Dict[Tuple[str, str, str], List[str]]] = None
+
+    @classmethod
+    def from_dataframe(cls, df: Any, columns: Dict[str, str]) -> "ReverseGeoIndex":
+        """
+        Build the index from the ZipCodeFinder DataFrame.
+
+        Args:
+            df: DataFrame with the geo data columns.
+            columns: The ZipCodeFinder.COLUMNS mapping of logical to actual column names.
+        """
+        fips = df["state_fips"] if "state_fips" in df.columns else [None] * len(df)
+        return cls(zip(
+            df[columns["zip"]], df[columns["city"]], df[columns["county"]],
+            df[columns["state_full"]], df[columns["state_abbr"]], fips,
+        ))
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, zipcode: Any) -> bool:
+        return normalize_zipcode(zipcode) in self._index
+
+    @property
+    def zipcodes(self) -> List[str]:
+        """All known ZIP codes."""
+        return list(self._index)
+
+    def get(self, zipcode: Any) -> List[Dict[str, Any]]:
+        """All place rows for a ZIP code (empty list if unknown)."""
+        return self._index.get(normalize_zipcode(zipcode), [])
+
+    def lookup(self, zipcodes: Iterable[Any]) -> Dict[str, Any]:
+        """
+        Look up many ZIP codes at once.
+
+        Args:
+            zipcodes: ZIP codes, in any of the formats accepted by normalize_zipcode.
+
+        Returns:
+            Dictionary with 'results' (ZIP code -> list of place rows) and 'not_found'.
+        """
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        not_found: List[str] = []
+        for zipcode in zipcodes:
+            key = normalize_zipcode(zipcode)
+            if key in results or key in not_found:
+                continue
+            places = self._index.get(key)
+            if places:
+                results[key] = places
+            else:
+                not_found.append(key)
+        return {"results": results, "not_found": not_found}
+
+    def label(self, zipcode: Any) -> Optional[str]:
+        """Human-readable label such as 'Norman, Cleveland County, OK' (None if unknown)."""
+        places = self.get(zipcode)
+        if not places:
+            return None
+        labels = []
+        for place in places:
+            county = place["county"]
+            name = county.lower()
+            if not name.endswith(COUNTY_SUFFIXES) and not (name.endswith("city") and name not in CITY_NAMED_COUNTIES):
+                county = f"{county} County"
+            label = f"{place['city']}, {county}, {place['state_abbr']}"
+            if label not in labels:
+                labels.append(label)
+        return " / ".join(labels)
+
+    def _area_index(self) -> Tuple[List[str], Dict[Tuple[str, str, str], List[str]]]:
+        """Sorted numeric ZIP codes and the ZIP codes of every ('city'|'county', name, state)."""
+        if self._sorted is None or self._areas is None:
+            areas: Dict[Tuple[str, str, str], List[str]] = {}
+            for zipcode, places in self._index.items():
+                if not zipcode.isdigit():  # placeholder codes such as '731HH'
+                    continue
+                for place in places:
+                    for kind in ("city", "county"):
+                        areas.setdefault((kind, place[kind], place["state_abbr"]), []).append(zipcode)
+            self._areas = areas
+            self._sorted = sorted(z for z in self._index if z.isdigit())
+        return self._sorted, self._areas
+
+    def suggest(self, zipcode: Any, limit: int = 5) -> Dict[str, Any]:
+        """
+        Valid ZIP codes near an unknown one.
+
+        The numerically closest known ZIP code with the same three-digit prefix (the
+        same postal sectional center, so the same region) stands in for the place the
+        unknown code was meant to be; the suggestions are the known ZIP codes of that
+        city, then of its county, closest first.
+
+        Returns:
+            {'zipcode', 'near': label of the closest known ZIP code or None,
+             'suggestions': [{'zipcode', 'label'}]}
+        """
+        key = normalize_zipcode(zipcode)
+        result: Dict[str, Any] = {"zipcode": key, "near": None, "suggestions": []}
+        if not key.isdigit() or len(key) != 5:
+            return result
+        ordered, areas = self._area_index()
+        position = bisect.bisect_left(ordered, key)
+        neighbours = [z for z in ordered[max(0, position - 1):position + 1] if z[:3] == key[:3] and z != key]
+        if not neighbours:
+            return result
+        target = int(key)
+        nearest = min(neighbours, key=lambda z: abs(int(z) - target))
+        result["near"] = self.label(nearest)
+
+        candidates: List[str] = []
+        for kind in ("city", "county"):
+            for place in self.get(nearest):
+                area = sorted(areas.get((kind, place[kind], place["state_abbr"]), []), key=lambda z: abs(int(z) - target))
+                candidates.extend(z for z in area if z not in candidates)
+            if len(candidates) >= limit:
+                break
+        result["suggestions"] = [{"zipcode": z, "label": self.label(z)} for z in candidates[:limit]]
+        return result
+
+    def find_known_zipcodes(self, text: str, limit: int = 200) -> List[str]:
+        """
+        Extract the five-digit numbers in a text that are known ZIP codes, in order of appearance.
+
+        Numbers preceded by '$' or part of decimals are ignored, so prices are not mistaken for ZIP codes.
+        """
+        found: List[str] = []
+        seen: Set[str] = set()
+        for match in _ZIP_PATTERN.finditer(text or ""):
+            zipcode = match.group(1)
+            if zipcode in seen:
+                continue
+            seen.add(zipcode)
+            if zipcode in self._index:
+                found.append(zipcode)
+                if len(found) >= limit:
+                    break
+        return found
+
+
+# Number of set bits in every byte value, for counting packed bitsets.
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint16)
+
+ZIP_SET_OPERATIONS: Tuple[str, ...] = ("union", "intersection", "difference", "count")
+
+
+class ZipSetIndex:
+    """
+    Packed bitsets of ZIP codes for every state and county in the geo data.
+
+    Every known ZIP code gets a dense integer id (its position in sorted order),
+    and each state and county is stored as a np.packbits array over those ids,
+    so set algebra over footprints is a handful of byte-wise numpy operations
+    instead of list juggling.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, str, str, str]]):
+        """
+        Build the index.
+
+        Args:
+            rows: (zipcode, county, state_full, state_abbr) tuples.
+        """
+        rows = [
+            (normalize_zipcode(zipcode), county, state_full, (state_abbr or "").lower())
+            for zipcode, county, state_full, state_abbr in rows
+        ]
+        self._zipcodes: List[str] = sorted({row[0] for row in rows})
+        self._ids: Dict[str, int] = {zipcode: i for i, zipcode in enumerate(self._zipcodes)}
+
+        state_members: Dict[str, List[int]] = {}
+        county_members: Dict[Tuple[str, str], List[int]] = {}
+        self._state_abbr_by_name: Dict[str, str] = {}
+        county_keys: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for zipcode, county, state_full, state_abbr in rows:
+            zip_id = self._ids[zipcode]
+            state_members.setdefault(state_abbr, []).append(zip_id)
+            # Normalizing is the expensive part; do it once per distinct county
+            raw_key = (county, state_abbr)
+            county_key = county_keys.get(raw_key)
+            if county_key is None:
+                county_key = county_keys[raw_key] = (
+                    normalize_place_name(county, strip_county_suffix=True), state_abbr
+                )
+                if state_full:
+                    self._state_abbr_by_name[state_full.strip().lower()] = state_abbr
+            if county_key[0]:
+                county_members.setdefault(county_key, []).append(zip_id)
+
+        self._states: Dict[str, np.ndarray] = {
+            abbr: self.from_ids(ids) for abbr, ids in state_members.items()
+        }
+        self._counties: Dict[Tuple[str, str], np.ndarray] = {
+            key: self.from_ids(ids) for key, ids in county_members.items()
+        }
+        # normalized county name -> states it occurs in, to resolve counties given without a state
+        self._county_states: Dict[str, List[str]] = {}
+        for name, abbr in self._counties:
+            self._county_states.setdefault(name, []).append(abbr)
+        log.info(
+            f"ZipSetIndex built: zipcodes={len(self._zipcodes)}, states={len(self._states)}, "
+            f"counties={len(self._counties)}"
+        )
+
+    @classmethod
+    def from_dataframe(cls, df: Any, columns: Dict[str, str]) -> "ZipSetIndex":
+        """
+        Build the index from the ZipCodeFinder DataFrame.
+
+        Args:
+            df: DataFrame with the geo data columns.
+            columns: The ZipCodeFinder.COLUMNS mapping of logical to actual column names.
+        """
+        return cls(zip(
+            df[columns["zip"]], df[columns["county"]],
+            df[columns["state_full"]], df[columns["state_abbr"]],
+        ))
+
+    def __len__(self) -> int:
+        return len(self._zipcodes)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the precomputed bitsets."""
+        return sum(bits.nbytes for bits in self._states.values()) + sum(
+            bits.nbytes for bits in self._counties.values()
+        )
+
+    def empty(self) -> np.ndarray:
+        """An empty bitset."""
+        return np.zeros((len(self._zipcodes) + 7) // 8, dtype=np.uint8)
+
+    def from_ids(self, ids: Iterable[int]) -> np.ndarray:
+        """Pack ZIP code ids into a bitset."""
+        ids = np.fromiter(ids, dtype=np.int64)
+        bits = self.empty()
+        # Same layout as np.packbits: id 0 is the most significant bit of byte 0
+        np.bitwise_or.at(bits, ids >> 3, (0x80 >> (ids & 7)).astype(np.uint8))
+        return bits
+
+    def _state_abbr(self, state: str) -> str:
+        # Only lowercased: normalize_place_name would expand abbreviations such as 'MT' (Mount)
+        value = state.strip().lower()
+        return value if len(value) == 2 else self._state_abbr_by_name.get(value, value)
+
+    def state(self, state: str) -> Optional[np.ndarray]:
+        """Bitset of a state, by name or abbreviation (None if unknown)."""
+        return self._states.get(self._state_abbr(state))
+
+    def county(self, county: str, state: Optional[str] = None) -> Optional[np.ndarray]:
+        """
+        Bitset of a county (None if unknown).
+
+        Args:
+            county: County name, with or without its suffix ("Cleveland", "Jefferson Parish").
+            state: State name or abbreviation. County names repeat across states, so
+                without one the county is only found if its name is unique.
+        """
+        name = normalize_place_name(county, strip_county_suffix=True)
+        if state:
+            return self._counties.get((name, self._state_abbr(state)))
+        states = self._county_states.get(name, [])
+        return self._counties[(name, states[0])] if len(states) == 1 else None
+
+    def county_states(self, county: str) -> List[str]:
+        """Abbreviations of the states that have a county with this name."""
+        name = normalize_place_name(county, strip_county_suffix=True)
+        return sorted(abbr.upper() for abbr in self._county_states.get(name, []))
+
+    def zipcodes(self, zipcodes: Iterable[Any]) -> Tuple[np.ndarray, List[str]]:
+        """
+        Bitset of explicit ZIP codes.
+
+        Returns:
+            The bitset and the ZIP codes that are not in the geo data.
+        """
+        ids: List[int] = []
+        unknown: List[str] = []
+        for zipcode in zipcodes:
+            key = normalize_zipcode(zipcode)
+            if key in self._ids:
+                ids.append(self._ids[key])
+            elif key not in unknown:
+                unknown.append(key)
+        return self.from_ids(ids), unknown
+
+    @staticmethod
+    def combine(operation: str, bitsets: List[np.ndarray]) -> np.ndarray:
+        """
+        Fold bitsets left to right with a set operation.
+
+        'difference' keeps what is in the first set and in none of the others.
+        """
+        if not bitsets:
+            raise ValueError("At least one set is required.")
+        if operation not in ("union", "intersection", "difference"):
+            raise ValueError(f"Unsupported set operation: {operation}")
+        result = bitsets[0].copy()
+        for bits in bitsets[1:]:
+            if operation == "union":
+                np.bitwise_or(result, bits, out=result)
+            elif operation == "intersection":
+                np.bitwise_and(result, bits, out=result)
+            else:
+                np.bitwise_and(result, np.invert(bits), out=result)
+        return result
+
+    @staticmethod
+    def count(bits: np.ndarray) -> int:
+        """Number of ZIP codes in a bitset."""
+        return int(_POPCOUNT[bits].sum())
+
+    def to_zipcodes(self, bits: np.ndarray, limit: Optional[int] = None) -> List[str]:
+        """The ZIP codes in a bitset, in ascending order."""
+        ids = np.flatnonzero(np.unpackbits(bits, count=len(self._zipcodes)))
+        if limit is not None:
+            ids = ids[:limit]
+        return [self._zipcodes[i] for i in ids]
+
+    def count_by_state(self, bits: np.ndarray) -> Dict[str, int]:
+        """Per-state ZIP code counts of a bitset, largest first, omitting empty states."""
+        counts = {
+            abbr.upper(): self.count(np.bitwise_and(bits, state_bits))
+            for abbr, state_bits in self._states.items()
+        }
+        return dict(sorted(((k, v) for k, v in counts.items() if v), key=lambda kv: (-kv[1], kv[0])))
+
+
+def _text(value: Any) -> str:
+    """str() of a CSV cell, with missing values (None or NaN) as ''."""
+    return "" if value is None or value != value else str(value)
+
+
+def normalize_dma_code(code: Any) -> str:
+    """Canonical DMA code string: 501, '501', '0501' and '501.0' all become '501'."""
+    text = str(code).strip()
+    if text.endswith(".0"):
+        text = text[:-2]
+    return str(int(text)) if text.isdigit() else text
+
+
+class DMAIndex:
+    """
+    Dict-backed index over DMAs.csv: code -> names, and typo-tolerant name -> codes.
+
+    Every DMA is searchable by its DMA, LongDMA and NielsenDMA names, and by
+    each market city within them ("Portland-Auburn, ME" also answers to
+    "Auburn" and "Auburn ME").
+    """
+
+    COLUMNS = ("DMA", "LongDMA", "NielsenDMA")
+
+    def __init__(self, rows: Iterable[Dict[str, Any]]):
+        """
+        Build the index.
+
+        Args:
+            rows: Dicts with a 'DMACode' key and the name COLUMNS.
+        """
+        self._by_code: Dict[str, Dict[str, str]] = {}
+        names: Dict[str, Set[str]] = {}
+        for row in rows:
+            code = normalize_dma_code(row["DMACode"])
+            entry = {column: _text(row.get(column)) for column in self.COLUMNS}
+            self._by_code.setdefault(code, entry)
+            for name in self._searchable_names(entry):
+                names.setdefault(name, set()).add(code)
+        self._codes_by_name = names
+        self._names = TrigramIndex(names)
+        log.info(f"DMAIndex built: codes={len(self._by_code)}, names={len(self._names)}")
+
+    @staticmethod
+    def _searchable_names(entry: Dict[str, str]) -> Set[str]:
+        result = set()
+        for value in entry.values():
+            place, _, state = value.rpartition(",")
+            if not place:
+                place, state = state, ""
+            state = normalize_place_name(state)
+            result.add(normalize_place_name(value))
+            for city in re.split(r"[-/&]| and ", place):
+                city = normalize_place_name(city)
+                if city:
+                    result.add(city)
+                    if state:
+                        result.add(f"{city} {state}")
+        result.discard("")
+        return result
+
+    @classmethod
+    def from_dataframe(cls, df: Any) -> "DMAIndex":
+        """Build the index from the DMAs.csv DataFrame."""
+        return cls(df.to_dict("records"))
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def get(self, code: Any) -> Optional[Dict[str, str]]:
+        """DMA, LongDMA and NielsenDMA of a code (None if unknown)."""
+        return self._by_code.get(normalize_dma_code(code))
+
+    def lookup(self, codes: Iterable[Any], return_all_columns: bool = False) -> Dict[str, Any]:
+        """
+        Look up many DMA codes at once.
+
+        Args:
+            codes: DMA codes as strings or integers.
+            return_all_columns: Return the DMA, LongDMA and NielsenDMA names instead of just the DMA name.
+
+        Returns:
+            Dictionary with 'results' (code as given -> name, column dict or None) and 'not_found'.
+        """
+        results: Dict[str, Any] = {}
+        not_found: List[str] = []
+        for code in codes:
+            key = str(code)
+            entry = self.get(code)
+            if entry is None:
+                if key not in results:
+                    not_found.append(key)
+                results[key] = None
+            else:
+                results[key] = dict(entry) if return_all_columns else entry["DMA"]
+        return {"results": results, "not_found": not_found}
+
+    def search(self, name: str, limit: int = 3, min_score: float = 0.6) -> List[Dict[str, Any]]:
+        """
+        Find the DMAs matching a market or city name, tolerating typos.
+
+        Args:
+            name: Market or city name, e.g. "Oklahoma City" or "Dallas-Ft. Worth".
+            limit: Maximum number of DMAs to return.
+            min_score: Drop matches scoring below this value (0..1).
+
+        Returns:
+            List of dicts with dma_code, the name columns, the matched name and score, best first.
+        """
+        best: Dict[str, Tuple[float, str]] = {}
+        for matched, score in self._names.search(normalize_place_name(name), limit=limit * 4, min_score=min_score):
+            for code in self._codes_by_name[matched]:
+                if code not in best or score > best[code][0]:
+                    best[code] = (score, matched)
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], item[0]))
+        # An exact name hit makes the partial ones noise ("New York" vs "...-York, PA")
+        if ranked and ranked[0][1][0] == 1.0:
+            ranked = [item for item in ranked if item[1][0] == 1.0]
+        ranked = ranked[:limit]
+        return [
+            {"dma_code": code, **self._by_code[code], "matched": matched, "score": score}
+            for code, (score, matched) in ranked
+        ]
@@ -0,0 +1,208 @@
+"""
+Hedged GraphQL requests.
+
+A few upstream queries land on a slow backend node and take many times the
+usual latency. With hedging, a read-only query that has not answered after the
+p-th percentile of its operation's observed latency gets one duplicate request;
+whichever answers first (successfully) is used and the other one is cancelled.
+
+Hedges are paid for from a budget: every request adds HEDGE_BUDGET_RATIO of a
+token (up to a small burst) and every hedge spends a whole one, so hedging adds
+at most that fraction of load however slow the backend gets.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+GRAPHQL_HEDGING = os.getenv("GRAPHQL_HEDGING", "false").strip().lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("GRAPHQL_HEDGE_PERCENTILE", "95"))
+HEDGE_BUDGET_RATIO = float(os.getenv("GRAPHQL_HEDGE_BUDGET_RATIO", "0.05"))
+HEDGE_MIN_SAMPLES = int(os.getenv("GRAPHQL_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_BUDGET_BURST = 5.0
+LATENCY_WINDOW = 500
+
+_OPERATION_PATTERN = re.compile(r"^\s*(?:(query|mutation|subscription)\b[^{]*)?\{\s*(\w+)", re.IGNORECASE)
+
+
+def operation_info(query: str) -> Tuple[str, str]:
+    """
+    Kind and root field of a GraphQL document, e.g. ('query', 'fetchPackages').
+
+    Shorthand documents ('{ fetchPackages { ... } }') are queries.
+    """
+    text = re.sub(r"#[^\n]*", "", query or "")
+    match = _OPERATION_PATTERN.match(text)
+    if not match:
+        return "query", "unknown"
+    return (match.group(1) or "query").lower(), match.group(2)
+
+
+class LatencyTracker:
+    """Rolling window of successful request latencies per operation."""
+
+    def __init__(self, window: int = LATENCY_WINDOW, min_samples: int = HEDGE_MIN_SAMPLES):
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, operation: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[operation].append(seconds)
+
+    def percentile(self, operation: str, percentile: float) -> Optional[float]:
+        """The percentile latency in seconds, or None until min_samples have been seen."""
+        with self._lock:
+            samples = list(self._samples.get(operation, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return float(np.percentile(samples, percentile))
+
+
+class HedgeBudget:
+    """Token bucket that limits hedges to a fraction of all requests."""
+
+    def __init__(self, ratio: float = HEDGE_BUDGET_RATIO, burst: float = HEDGE_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        """Called once per request."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take a token for a hedge, if there is one."""
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class Hedger:
+    """
+    Runs requests with hedging and keeps the hedging metrics.
+
+    Metrics: requests, hedged (duplicates sent), hedge_wins (the duplicate answered
+    first), budget_denied (a hedge was due but the budget was empty), hedge_rate and
+    win_rate.
+    """
+
+    def __init__(self,
+                 enabled: bool = GRAPHQL_HEDGING,
+                 percentile: float = HEDGE_PERCENTILE,
+                 tracker: Optional[LatencyTracker] = None,
+                 budget: Optional[HedgeBudget] = None):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.tracker = tracker or LatencyTracker()
+        self.budget = budget or HedgeBudget()
+        self._counts = {"requests": 0, "hedged": 0, "hedge_wins": 0, "budget_denied": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counts)
+        stats["hedge_rate"] = round(stats["hedged"] / stats["requests"], 4) if stats["requests"] else 0.0
+        stats["win_rate"] = round(stats["hedge_wins"] / stats["hedged"], 4) if stats["hedged"] else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+    async def run(self,
+                  query: str,
+                  send: Callable[[], Awaitable[Dict[str, Any]]],
+                  is_success: Callable[[Dict[str, Any]], bool],
+                  can_hedge: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """
+        Send a request, hedging it if it is read-only and slow.
+
+        Latencies are measured from the call of send, so an attempt should not
+        wait for resources (e.g. a concurrency slot) inside it.
+
+        Args:
+            query: The GraphQL document, used to find the operation and whether it is read-only.
+            send: Starts one attempt of the request.
+            is_success: Whether an attempt's result counts as an answer.
+            can_hedge: Whether a duplicate can start right away (e.g. a free
+                concurrency slot); checked before the budget is spent.
+
+        Returns:
+            The result of the attempt that answered first.
+        """
+        kind, operation = operation_info(query)
+        self._count("requests")
+        self.budget.deposit()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        delay = self.tracker.percentile(operation, self.percentile) if self.enabled and kind == "query" else None
+        primary = asyncio.ensure_future(send())
+        if delay is None:
+            result = await primary
+            if is_success(result):
+                self.tracker.record(operation, loop.time() - started)
+            return result
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done:
+            result = primary.result()
+            if is_success(result):
+                self.tracker.record(operation, loop.time() - started)
+            return result
+        if can_hedge is not None and not can_hedge():
+            result = await primary
+            if is_success(result):
+                self.tracker.record(operation, loop.time() - started)
+            return result
+        if not self.budget.try_spend():
+            self._count("budget_denied")
+            result = await primary
+            if is_success(result):
+                self.tracker.record(operation, loop.time() - started)
+            return result
+
+        self._count("hedged")
+        hedge_started = loop.time()
+        hedge = asyncio.ensure_future(send())
+        pending = {primary, hedge}
+        result: Dict[str, Any] = {}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer an answer; an error only wins if both attempts fail
+                winner = next((task for task in done if is_success(task.result())), None)
+                if winner is not None:
+                    result = winner.result()
+                    if winner is hedge:
+                        self._count("hedge_wins")
+                        self.tracker.record(operation, loop.time() - hedge_started)
+                    else:
+                        self.tracker.record(operation, loop.time() - started)
+                    return result
+                result = next(iter(done)).result()
+            return result
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+shared_hedger = Hedger()
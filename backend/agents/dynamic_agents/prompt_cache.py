@@ -0,0 +1,82 @@
+"""
+Prompt-cache telemetry.
+
+OpenAI and Azure OpenAI cache prompt prefixes of 1024 tokens and more
+automatically and report the cached part of each prompt in the response's
+usage. The prompts in prompts.py keep their static system prompt in front of
+everything that changes per request, so that part can be served from the
+cache; PromptCacheStats adds up prompt and cached tokens per component to
+show the hit rate (served at /admin/metrics).
+"""
+
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+
+# Ask for usage when streaming (OpenAI's stream_options); turn off for Azure API versions before 2024-09-01
+LLM_STREAM_USAGE = os.getenv("LLM_STREAM_USAGE", "true").strip().lower() in ("1", "true", "yes")
+
+
+def prompt_token_usage(message: Any) -> Optional[Tuple[int, int]]:
+    """
+    Prompt tokens and cached prompt tokens of an LLM response.
+
+    Reads usage_metadata (input_tokens, input_token_details.cache_read) and falls back
+    to the provider's token_usage in response_metadata.
+
+    Returns:
+        (prompt_tokens, cached_tokens), or None if the response reports no usage.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if usage and usage.get("input_tokens"):
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        return int(usage["input_tokens"]), int(cached)
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    if token_usage.get("prompt_tokens"):
+        cached = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        return int(token_usage["prompt_tokens"]), int(cached)
+    return None
+
+
+class PromptCacheStats:
+    """Prompt and cached prompt tokens by component ('swarm', 'refine', ...)."""
+
+    def __init__(self) -> None:
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"calls": 0, "calls_without_usage": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        )
+        self._lock = threading.Lock()
+
+    def record(self, component: str, message: Any) -> Optional[Tuple[int, int]]:
+        """Count one LLM response; returns its (prompt_tokens, cached_tokens) if reported."""
+        usage = prompt_token_usage(message)
+        with self._lock:
+            counts = self._counts[component]
+            counts["calls"] += 1
+            if usage is None:
+                counts["calls_without_usage"] += 1
+            else:
+                counts["prompt_tokens"] += usage[0]
+                counts["cached_tokens"] += usage[1]
+        return usage
+
+    def record_messages(self, component: str, messages: Iterable[BaseMessage]) -> None:
+        """Count the LLM responses (AI messages) among messages."""
+        for message in messages:
+            if message.type == "ai":
+                self.record(component, message)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            stats: Dict[str, Dict[str, Any]] = {component: dict(counts) for component, counts in self._counts.items()}
+        for counts in stats.values():
+            prompt_tokens = counts["prompt_tokens"]
+            counts["uncached_tokens"] = prompt_tokens - counts["cached_tokens"]
+            counts["hit_rate"] = round(counts["cached_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0
+        return stats
+
+
+prompt_cache_stats = PromptCacheStats()
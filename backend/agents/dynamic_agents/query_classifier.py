@@ -0,0 +1,298 @@
+"""
+Local fast path for the contextualizer's requires_database_access decision.
+
+The contextualizer is a secondary-LLM call on every turn, also for "hi",
+"thanks" or a bare zip code. QueryClassifier decides those turns locally in
+microseconds: rules catch conversational messages and bare zip codes, and a
+small multinomial naive Bayes model over the query's words handles the rest.
+Only when neither is confident enough does the LLM run, and always for queries
+that refer to earlier turns, including bare zip codes and fragments such as
+"and in 73069?" once the conversation has history.
+
+The model is trained from SEED_EXAMPLES plus the contextualizer's own past
+decisions, which record_contextualizer_decision appends to
+CONTEXTUALIZER_DECISION_LOG (JSON lines of {"query", "requires_database_access"})
+when that path is set. Decisions are cached per normalized query.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+CONTEXTUALIZER_FAST_PATH = os.getenv("CONTEXTUALIZER_FAST_PATH", "true").strip().lower() in ("1", "true", "yes")
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("CONTEXTUALIZER_FAST_PATH_CONFIDENCE", "0.97"))
+# Largest share of a query's words the model may not know; unknown words are often provider or place names
+FAST_PATH_MAX_UNKNOWN_SHARE = float(os.getenv("CONTEXTUALIZER_FAST_PATH_MAX_UNKNOWN_SHARE", "0.1"))
+CONTEXTUALIZER_DECISION_LOG = os.getenv("CONTEXTUALIZER_DECISION_LOG", "")
+DECISION_CACHE_SIZE = 10_000
+
+_CONVERSATIONAL = re.compile(
+    r"(hi|hello|hey|hiya|yo|good (morning|afternoon|evening)|greetings|"
+    r"thanks?|thank you|thx|ty|cheers|much appreciated|"
+    r"ok|okay|k|cool|great|nice|perfect|awesome|got it|sounds good|"
+    r"bye|goodbye|see you|have a (good|nice|great) (day|one)|"
+    r"who are you|what are you|what can you do|how are you|help)"
+    r"( (there|again|so much|a lot|you|team))*",
+)
+_BARE_ZIP_CODES = re.compile(r"(\d{5}(-\d{4})?)( *(,|and|or)? *\d{5}(-\d{4})?)*")
+# Words that refer back to the conversation; such queries need the contextualizer's insights
+_REFERENCES = {"it", "that", "this", "those", "these", "there", "them", "they", "same", "above",
+               "previous", "earlier", "else", "instead", "also", "again"}
+# Elliptical follow-ups ("and in 73069?", "what about cox?", "for fiber only") that continue the previous turn
+_FRAGMENT_START = re.compile(
+    r"(and|or|but|plus|so|then|also|what about|how about|same|only|just|in|for|at|with|without|from|near|vs|versus)\b"
+)
+
+# Labelled examples the model starts from: True when Telogical's data is needed
+SEED_EXAMPLES: List[Tuple[str, bool]] = [
+    ("what internet plans are available in 73069", True),
+    ("show me fiber packages from at&t in charleston sc", True),
+    ("how much does comcast charge for 300 mbps", True),
+    ("list the promotions for verizon fios", True),
+    ("which providers offer service in zip code 29056", True),
+    ("compare spectrum and cox internet prices in phoenix", True),
+    ("what channels are included in directv choice", True),
+    ("how many packages does t-mobile have in dallas", True),
+    ("what is the cheapest tv package in oklahoma city", True),
+    ("give me the dma for norman ok", True),
+    ("what are the install fees for frontier fiber", True),
+    ("find bundles with internet and tv in miami", True),
+    ("what speeds does google fiber offer in austin", True),
+    ("show mobile plans with unlimited data", True),
+    ("which competitors are in the tulsa market", True),
+    ("what promotions are running for xfinity this month", True),
+    ("price of the 1 gig plan", True),
+    ("download and upload speed of optimum 500", True),
+    ("how many zip codes are in the new york dma", True),
+    ("what is the contract length for dish packages", True),
+    ("hello how are you doing today", False),
+    ("thanks that was helpful", False),
+    ("who built you", False),
+    ("what can you help me with", False),
+    ("tell me a joke", False),
+    ("good morning", False),
+    ("what is your name", False),
+    ("nice job thank you", False),
+    ("can you explain what you do", False),
+    ("bye for now", False),
+    ("what does mbps mean", False),
+    ("how do i use this assistant", False),
+    ("are you a bot", False),
+    ("ok sounds good", False),
+    ("thank you very much for your help", False),
+    ("what is telogical", False),
+]
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cased words of a query with punctuation removed, for rules and cache keys."""
+    text = (query or "").replace("[LATEST_MESSAGE]", "").lower()
+    text = re.sub(r"[^\w\s&+-]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _features(normalized: str) -> List[str]:
+    features = []
+    for word in normalized.split():
+        if re.fullmatch(r"\d{5}(-\d{4})?", word):
+            features.append("<zip>")
+        elif re.fullmatch(r"\d+(\.\d+)?", word):
+            features.append("<number>")
+        else:
+            features.append(word)
+    return features
+
+
+@dataclass(frozen=True)
+class FastPathDecision:
+    """
+    Local verdict on a query; requires_database_access is None when the LLM has to decide.
+
+    standalone is False for bare zip codes and elliptical fragments, which only
+    stand alone at the start of a conversation.
+    """
+    requires_database_access: Optional[bool]
+    confidence: float
+    source: str  # 'rule', 'model' or 'ambiguous'
+    standalone: bool = True
+
+    @property
+    def confident(self) -> bool:
+        return self.requires_database_access is not None
+
+
+class NaiveBayesModel:
+    """Multinomial naive Bayes with add-one smoothing over query words."""
+
+    def __init__(self) -> None:
+        self._words: Dict[bool, Counter] = {True: Counter(), False: Counter()}
+        self._documents: Counter = Counter()
+        self._vocabulary: set = set()
+        self._totals: Dict[bool, int] = {True: 0, False: 0}
+
+    def train(self, examples: Iterable[Tuple[str, bool]]) -> "NaiveBayesModel":
+        for query, label in examples:
+            self._words[bool(label)].update(_features(normalize_query(query)))
+            self._documents[bool(label)] += 1
+        self._vocabulary = set(self._words[True]) | set(self._words[False])
+        self._totals = {label: sum(self._words[label].values()) + len(self._vocabulary) for label in (True, False)}
+        return self
+
+    @property
+    def examples(self) -> int:
+        return sum(self._documents.values())
+
+    def probability(self, normalized: str, max_unknown_share: float = FAST_PATH_MAX_UNKNOWN_SHARE) -> Optional[float]:
+        """
+        P(requires database access | words), or None without training data or when
+        more than max_unknown_share of the words are unknown.
+
+        Unknown words would be skipped, leaving the verdict to the filler words
+        around them: "what can you tell me about windstream" looks like small talk.
+        """
+        features = _features(normalized)
+        if not self._documents[True] or not self._documents[False] or not features:
+            return None
+        unknown = sum(1 for feature in features if feature not in self._vocabulary)
+        if unknown == len(features) or unknown / len(features) > max_unknown_share:
+            return None
+        log_odds = math.log(self._documents[True] / self._documents[False])
+        for feature in features:
+            if feature in self._vocabulary:
+                log_odds += math.log((self._words[True][feature] + 1) / self._totals[True])
+                log_odds -= math.log((self._words[False][feature] + 1) / self._totals[False])
+        return 1.0 / (1.0 + math.exp(-max(-50.0, min(50.0, log_odds))))
+
+
+class QueryClassifier:
+    """
+    Rules plus a bag-of-words model deciding requires_database_access, with a cache
+    per normalized query and skip-rate statistics.
+    """
+
+    def __init__(self,
+                 model: Optional[NaiveBayesModel] = None,
+                 min_confidence: float = FAST_PATH_MIN_CONFIDENCE,
+                 cache_size: int = DECISION_CACHE_SIZE):
+        self.model = model or NaiveBayesModel().train(SEED_EXAMPLES)
+        self.min_confidence = min_confidence
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, FastPathDecision]" = OrderedDict()
+        self._counts = {"queries": 0, "skipped": 0, "rule": 0, "model": 0, "cache_hits": 0, "llm": 0}
+        self._lock = threading.Lock()
+
+    def _decide(self, normalized: str) -> FastPathDecision:
+        if not normalized:
+            return FastPathDecision(False, 1.0, "rule")
+        if _CONVERSATIONAL.fullmatch(normalized):
+            return FastPathDecision(False, 1.0, "rule")
+        if _BARE_ZIP_CODES.fullmatch(normalized):
+            return FastPathDecision(True, 1.0, "rule", standalone=False)
+        if _REFERENCES.intersection(normalized.split()):
+            return FastPathDecision(None, 0.0, "ambiguous")
+        standalone = not _FRAGMENT_START.match(normalized)
+        probability = self.model.probability(normalized)
+        if probability is None:
+            return FastPathDecision(None, 0.0, "ambiguous", standalone)
+        confidence = max(probability, 1.0 - probability)
+        if confidence < self.min_confidence:
+            return FastPathDecision(None, confidence, "ambiguous", standalone)
+        return FastPathDecision(probability >= 0.5, confidence, "model", standalone)
+
+    def classify(self, query: str, has_history: bool = False) -> FastPathDecision:
+        """
+        Decide a query locally if possible; count it for the skip rate.
+
+        Args:
+            query: The latest user message.
+            has_history: Whether earlier turns exist. Bare zip codes and elliptical
+                fragments then go to the LLM, which resolves them against those turns.
+        """
+        normalized = normalize_query(query)
+        with self._lock:
+            self._counts["queries"] += 1
+            decision = self._cache.get(normalized)
+            if decision is not None:
+                self._cache.move_to_end(normalized)
+                self._counts["cache_hits"] += 1
+        if decision is None:
+            decision = self._decide(normalized)
+            with self._lock:
+                self._cache[normalized] = decision
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        if has_history and not decision.standalone:
+            decision = FastPathDecision(None, decision.confidence, "ambiguous", standalone=False)
+        with self._lock:
+            if decision.confident:
+                self._counts["skipped"] += 1
+                self._counts[decision.source] += 1
+            else:
+                self._counts["llm"] += 1
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counts)
+            stats["cached_queries"] = len(self._cache)
+        stats["skip_rate"] = round(stats["skipped"] / stats["queries"], 4) if stats["queries"] else 0.0
+        stats["training_examples"] = self.model.examples
+        stats["enabled"] = CONTEXTUALIZER_FAST_PATH
+        return stats
+
+
+def load_decision_log(path: str = CONTEXTUALIZER_DECISION_LOG) -> List[Tuple[str, bool]]:
+    """Examples from the contextualizer decision log; unreadable lines are skipped."""
+    examples: List[Tuple[str, bool]] = []
+    if not path or not os.path.exists(path):
+        return examples
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                examples.append((str(entry["query"]), bool(entry["requires_database_access"])))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return examples
+
+
+_log_lock = threading.Lock()
+
+
+def record_contextualizer_decision(query: str,
+                                   requires_database_access: bool,
+                                   path: str = CONTEXTUALIZER_DECISION_LOG) -> None:
+    """Append an LLM decision to the training log, if one is configured."""
+    if not path:
+        return
+    line = json.dumps({"query": query, "requires_database_access": bool(requires_database_access)})
+    try:
+        with _log_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        log.warning(f"Could not record contextualizer decision in {path}: {e}")
+
+
+_shared_classifier: Optional[QueryClassifier] = None
+_shared_classifier_lock = threading.Lock()
+
+
+def get_query_classifier() -> QueryClassifier:
+    """The process-wide classifier, trained on the seed examples and the decision log."""
+    global _shared_classifier
+    if _shared_classifier is None:
+        with _shared_classifier_lock:
+            if _shared_classifier is None:
+                logged = load_decision_log()
+                model = NaiveBayesModel().train(SEED_EXAMPLES + logged)
+                log.info(f"Contextualizer fast path trained on {len(SEED_EXAMPLES)} seed and {len(logged)} logged examples")
+                _shared_classifier = QueryClassifier(model=model)
+    return _shared_classifier
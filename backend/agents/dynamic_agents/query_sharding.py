@@ -0,0 +1,269 @@
+"""
+Cost estimation and sharding of oversized GraphQL queries.
+
+LLM-generated queries sometimes put hundreds of zip codes into one zipCodes
+argument, or ask for every channel across many markets, and then time out as a
+whole. estimate_query_cost rates a query from its list arguments (literal lists
+and comma-separated strings such as zipCodes: "73034,73102"), its
+selection depth and the number of nested selections (potential list fields).
+plan_shards splits a query over the threshold along its largest list argument
+into several smaller queries, and merge_results puts their data back together.
+"""
+
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+GRAPHQL_SHARD_MAX_COST = int(os.getenv("GRAPHQL_SHARD_MAX_COST", "1000"))
+GRAPHQL_MAX_SHARDS = int(os.getenv("GRAPHQL_MAX_SHARDS", "20"))
+# String arguments that hold comma-separated lists in the schema, e.g. zipCodes: "73034,73102,73114"
+GRAPHQL_LIST_STRING_ARGUMENTS = frozenset(
+    name.strip() for name in os.getenv("GRAPHQL_LIST_STRING_ARGUMENTS", "zipCodes,productCategories").split(",")
+    if name.strip()
+)
+
+# Integer fields that count rows, so the shards' values are added up; other scalars keep the first shard's value
+GRAPHQL_SHARD_COUNT_FIELDS = frozenset(
+    name.strip() for name in os.getenv("GRAPHQL_SHARD_COUNT_FIELDS", "count,totalCount").split(",") if name.strip()
+)
+
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"')
+_LIST_ARGUMENT = re.compile(r'\[((?:"(?:[^"\\]|\\.)*"|[^\[\]"])*)\]')
+_LIST_ITEM = re.compile(r'"(?:[^"\\]|\\.)*"|[\w.+-]+')
+_SCALAR = re.compile(r"[\w.+-]+")
+_ARGUMENT_NAME = re.compile(r"(?<![\w$])(\w+)\s*:\s*")
+_PARENTHESES = re.compile(r"\([^()]*\)")
+
+
+@dataclass
+class QueryCost:
+    """Estimated cost of a GraphQL query."""
+    list_arguments: Dict[str, int] = field(default_factory=dict)
+    depth: int = 0
+    nested_selections: int = 0
+
+    @property
+    def items(self) -> int:
+        """Combinations of list argument values the query asks for."""
+        return math.prod(n for n in self.list_arguments.values() if n) if self.list_arguments else 1
+
+    @property
+    def cost(self) -> int:
+        return max(1, self.items) * max(1, self.depth) * (1 + self.nested_selections)
+
+
+@dataclass
+class Argument:
+    """A literal argument value in a query; span is where its items are written."""
+    name: str
+    items: List[str]
+    span: Tuple[int, int]
+    is_list: bool
+    separator: str = ", "
+
+    @property
+    def values(self) -> List[str]:
+        """The items unquoted."""
+        return [item[1:-1] if item.startswith('"') else item for item in self.items]
+
+
+def _argument_positions(query: str) -> List[bool]:
+    """For every character, whether it is inside the parentheses of an argument list and outside strings."""
+    inside: List[bool] = []
+    depth = 0
+    in_string = escaped = False
+    for char in query:
+        if in_string:
+            inside.append(False)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        inside.append(depth > 0 and char != '"')
+    return inside
+
+
+def _arguments(query: str) -> List[Argument]:
+    """
+    Literal arguments of a query's fields (and of the input objects in them).
+
+    Lists of scalars (zipCodes: ["73069", "73071"]) and the comma-separated strings
+    of GRAPHQL_LIST_STRING_ARGUMENTS (zipCodes: "73069,73071") are lists; other
+    strings, numbers and enums are single values. Variable declarations
+    (query Q($zipCode: String!)), variables as values and field aliases
+    (zipCode: zip, outside parentheses) are not arguments.
+    """
+    inside = _argument_positions(query)
+    arguments: List[Argument] = []
+    for match in _ARGUMENT_NAME.finditer(query):
+        if not inside[match.start()]:
+            continue
+        name, position = match.group(1), match.end()
+        if query.startswith("[", position):
+            value = _LIST_ARGUMENT.match(query, position)
+            if value and not re.sub(r"[\s,]", "", _LIST_ITEM.sub("", value.group(1))):
+                arguments.append(Argument(name, _LIST_ITEM.findall(value.group(1)), value.span(1), True))
+        elif query.startswith('"', position):
+            value = _STRING.match(query, position)
+            if not value:
+                continue
+            start, end = value.start() + 1, value.end() - 1
+            if name in GRAPHQL_LIST_STRING_ARGUMENTS:
+                items = [item.strip() for item in query[start:end].split(",") if item.strip()]
+                arguments.append(Argument(name, items, (start, end), True, ","))
+            else:
+                arguments.append(Argument(name, [value.group(0)], value.span(), False))
+        else:
+            value = _SCALAR.match(query, position)
+            if value:
+                arguments.append(Argument(name, [value.group(0)], value.span(), False))
+    return arguments
+
+
+def _list_arguments(query: str) -> List[Argument]:
+    """The list arguments of a query, literal lists and comma-separated strings."""
+    return [argument for argument in _arguments(query) if argument.is_list]
+
+
+def argument_values(query: str, name: str) -> List[str]:
+    """
+    Literal values of an argument anywhere in a query, unquoted.
+
+    Lists (zipCodes: ["73069", "73071"]) give one value per item and strings are
+    split at commas (zipCodes: "73069,73071"); variables ($zips) are not resolved.
+    """
+    values: List[str] = []
+    for argument in _arguments(query):
+        if argument.name == name:
+            for value in argument.values:
+                values.extend(item.strip() for item in value.split(",") if item.strip())
+    return values
+
+
+def estimate_query_cost(query: str) -> QueryCost:
+    """
+    Estimate how expensive a query is for the backend.
+
+    cost = (product of the literal list argument lengths) x (selection depth)
+           x (1 + selections nested below the root field)
+    """
+    cost = QueryCost()
+    for argument in _list_arguments(query):
+        cost.list_arguments[argument.name] = max(cost.list_arguments.get(argument.name, 0), len(argument.items))
+
+    # Braces inside arguments are input objects, not selections
+    text = _STRING.sub('""', query)
+    previous = None
+    while previous != text:
+        previous, text = text, _PARENTHESES.sub("", text)
+    depth = max_depth = selections = 0
+    for char in text:
+        if char == "{":
+            depth += 1
+            selections += 1
+            max_depth = max(max_depth, depth)
+        elif char == "}":
+            depth -= 1
+    cost.depth = max(0, max_depth - 1)  # the operation's own braces select nothing
+    cost.nested_selections = max(0, selections - 2)  # neither the operation nor the root field
+    return cost
+
+
+def plan_shards(query: str,
+                max_cost: int = GRAPHQL_SHARD_MAX_COST,
+                max_shards: int = GRAPHQL_MAX_SHARDS) -> List[str]:
+    """
+    Split a query whose estimated cost exceeds max_cost along its largest list argument.
+
+    Only queries are split, not mutations, and only when the argument occurs once.
+
+    Returns:
+        The shard queries, or [query] if it is cheap enough or cannot be split.
+    """
+    estimate = estimate_query_cost(query)
+    if estimate.cost <= max_cost or re.match(r"\s*(mutation|subscription)\b", query, re.IGNORECASE):
+        return [query]
+    arguments = _list_arguments(query)
+    if not arguments:
+        return [query]
+    largest = max(arguments, key=lambda argument: len(argument.items))
+    if sum(1 for argument in arguments if argument.name == largest.name) > 1:
+        return [query]
+    items = largest.items
+    shard_count = min(len(items), max_shards, math.ceil(estimate.cost / max_cost))
+    if shard_count < 2:
+        return [query]
+    size = math.ceil(len(items) / shard_count)
+    start, end = largest.span
+    shards = [
+        query[:start] + largest.separator.join(items[i:i + size]) + query[end:]
+        for i in range(0, len(items), size)
+    ]
+    log.info(f"Sharding query (estimated cost {estimate.cost} > {max_cost}) into {len(shards)} shards by '{largest.name}'")
+    return shards
+
+
+def merge_data(parts: List[Any], key: Optional[str] = None) -> Any:
+    """
+    Merge the 'data' of shard results: lists are concatenated, objects merged key
+    by key, the integers of GRAPHQL_SHARD_COUNT_FIELDS added up, and for other
+    values (years, codes, prices) the first non-null one is kept.
+    """
+    parts = [part for part in parts if part is not None]
+    if not parts:
+        return None
+    if all(isinstance(part, list) for part in parts):
+        return [item for part in parts for item in part]
+    if all(isinstance(part, dict) for part in parts):
+        keys: List[str] = []
+        for part in parts:
+            keys.extend(key for key in part if key not in keys)
+        return {key: merge_data([part.get(key) for part in parts], key) for key in keys}
+    if key in GRAPHQL_SHARD_COUNT_FIELDS and all(isinstance(part, int) and not isinstance(part, bool) for part in parts):
+        return sum(parts)
+    return parts[0]
+
+
+def merge_results(query_id: str, shard_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine the executor results of a sharded query into one result for its query_id.
+
+    The merged result succeeds if any shard did; failed shards are listed under
+    'shard_errors' so the answer can say that it is incomplete.
+    """
+    succeeded = [r for r in shard_results if r.get("status") == "success"]
+    failed = [r for r in shard_results if r.get("status") != "success"]
+    if not succeeded:
+        first = failed[0]
+        return {
+            "query_id": query_id,
+            "status": "error",
+            "error": first.get("error"),
+            "details": first.get("details"),
+            "shards": len(shard_results),
+        }
+    errors = [error for r in succeeded for error in (r.get("errors") or [])]
+    merged: Dict[str, Any] = {
+        "query_id": query_id,
+        "status": "success",
+        "result": merge_data([r.get("result") for r in succeeded]),
+        "errors": errors or None,
+        "shards": len(shard_results),
+    }
+    if failed:
+        merged["shard_errors"] = [f"{r.get('error')}: {r.get('details')}" for r in failed]
+    return merged
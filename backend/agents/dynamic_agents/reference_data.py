@@ -0,0 +1,282 @@
+"""
+Binary snapshots of the reference CSVs in data/ (geo-data.csv, DMAs.csv).
+
+Parsing and normalizing geo-data.csv with pandas takes a noticeable slice of a
+worker's startup. The prepared table is therefore saved next to the CSV as an
+uncompressed .npz file of plain numpy columns (no pickle), which loads in a few
+milliseconds. A snapshot is only used while it matches its CSV: same mtime and
+size, or failing that the same SHA-256. Anything else rebuilds it from the CSV.
+
+FileWatcher notices when a CSV is replaced, so the tools can hot-reload it.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import types
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_SUFFIX = ".npz"
+# Bump when the snapshot layout changes, so old files are rebuilt.
+SNAPSHOT_FORMAT = 1
+_META_KEY = "__meta__"
+_COLUMN_PREFIX = "col:"
+
+REFERENCE_DATA_SNAPSHOTS = os.getenv("REFERENCE_DATA_SNAPSHOTS", "true").strip().lower() not in ("0", "false", "no")
+
+
+def snapshot_path(csv_path: str) -> str:
+    """Path of the snapshot that belongs to a CSV ('data/geo-data.csv' -> 'data/geo-data.npz')."""
+    return os.path.splitext(csv_path)[0] + SNAPSHOT_SUFFIX
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_meta(csv_path: str, version: str) -> Dict[str, Any]:
+    stat = os.stat(csv_path)
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "version": version,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+    }
+
+
+def save_snapshot(path: str, df: pd.DataFrame, meta: Dict[str, Any]) -> None:
+    """
+    Write a DataFrame as a pickle-free .npz snapshot.
+
+    Text columns are stored as fixed-width unicode arrays, everything else with
+    its numpy dtype. The file is written to a temporary name and renamed into
+    place, so concurrent readers never see a partial snapshot.
+
+    Args:
+        path: Snapshot path.
+        df: The prepared table.
+        meta: Source metadata (see load_table), stored alongside the columns.
+    """
+    arrays: Dict[str, np.ndarray] = {}
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object:
+            arrays[_COLUMN_PREFIX + column] = values.fillna("").astype(str).to_numpy(dtype=str)
+        else:
+            arrays[_COLUMN_PREFIX + column] = values.to_numpy()
+    meta = dict(meta, columns=list(df.columns))
+    arrays[_META_KEY] = np.array(json.dumps(meta))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=SNAPSHOT_SUFFIX + ".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates files readable by the owner only
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_snapshot(path: str) -> Optional[Tuple[pd.DataFrame, Dict[str, Any]]]:
+    """
+    Read a snapshot written by save_snapshot.
+
+    Returns:
+        (DataFrame, meta) or None if the file is missing or unreadable.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data[_META_KEY]))
+            columns = {}
+            for column in meta["columns"]:
+                values = data[_COLUMN_PREFIX + column]
+                columns[column] = values.astype(object) if values.dtype.kind == "U" else values
+        return pd.DataFrame(columns), meta
+    except Exception as e:
+        log.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+
+def load_table(csv_path: str, prepare: Callable[[str], Optional[pd.DataFrame]], version: str) -> Optional[pd.DataFrame]:
+    """
+    Load a prepared reference table, from its snapshot when it is still fresh.
+
+    Args:
+        csv_path: Source CSV.
+        prepare: Builds the prepared DataFrame from the CSV (returns None on failure).
+        version: Identifies the preparation logic; a snapshot made by another
+            version is rebuilt.
+
+    Returns:
+        The prepared DataFrame, or None if the CSV could not be prepared.
+    """
+    if not REFERENCE_DATA_SNAPSHOTS or not os.path.exists(csv_path):
+        return prepare(csv_path)
+
+    path = snapshot_path(csv_path)
+    meta = _source_meta(csv_path, version)
+    cached = read_snapshot(path)
+    if cached is not None:
+        df, cached_meta = cached
+        same_build = cached_meta.get("format") == SNAPSHOT_FORMAT and cached_meta.get("version") == version
+        if same_build and (cached_meta.get("mtime_ns"), cached_meta.get("size")) == (meta["mtime_ns"], meta["size"]):
+            log.info(f"Loaded {len(df)} rows from snapshot {path}")
+            return df
+        # The CSV was touched or copied; only its content decides whether the snapshot is stale
+        if same_build and cached_meta.get("sha256") and cached_meta["sha256"] == file_sha256(csv_path):
+            log.info(f"Loaded {len(df)} rows from snapshot {path} (CSV content unchanged)")
+            _write_snapshot(path, df, dict(meta, sha256=cached_meta["sha256"]))
+            return df
+        log.info(f"Snapshot {path} is stale, rebuilding from {csv_path}")
+
+    df = prepare(csv_path)
+    if df is not None:
+        _write_snapshot(path, df, dict(meta, sha256=file_sha256(csv_path)))
+    return df
+
+
+def _write_snapshot(path: str, df: pd.DataFrame, meta: Dict[str, Any]) -> None:
+    """save_snapshot that only logs on failure (e.g. a read-only data directory)."""
+    try:
+        save_snapshot(path, df, meta)
+    except Exception as e:
+        log.warning(f"Could not write snapshot {path}: {e}")
+
+
+# Referenced by data structures, but not part of them
+_NOT_DATA = (type, types.FunctionType, types.MethodType, types.BuiltinFunctionType, types.ModuleType)
+
+
+def deep_sizeof(obj: Any) -> int:
+    """
+    Bytes held by an object and everything it references, each object counted once.
+
+    numpy arrays count their buffers and DataFrames their deep memory usage. Used
+    to report what a reloaded dataset holds without tracing allocations, which
+    would slow down every thread of the process and count their allocations too.
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or item is None or isinstance(item, _NOT_DATA):
+            continue
+        seen.add(id(item))
+        if isinstance(item, (pd.DataFrame, pd.Series, pd.Index)):
+            usage = item.memory_usage(deep=True)
+            total += int(usage.sum() if hasattr(usage, "sum") else usage)
+            continue
+        if isinstance(item, np.ndarray):
+            total += sys.getsizeof(item)  # Includes the buffer if the array owns it (views count once, via their base)
+            if item.base is not None:
+                stack.append(item.base)
+            if item.dtype == object:
+                stack.extend(item.ravel().tolist())
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, int, float, bool)):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        else:
+            if hasattr(item, "__dict__"):
+                stack.append(vars(item))
+            for slot in getattr(type(item), "__slots__", ()):
+                stack.append(getattr(item, slot, None))
+    return total
+
+
+class FileWatcher:
+    """
+    Polls files for changes and reports them once they have settled.
+
+    A change is only reported when two consecutive polls see the same new
+    mtime and size, so a CSV that is still being copied into place is not
+    picked up half-written. Polling keeps this free of extra dependencies.
+    """
+
+    def __init__(self, paths: Iterable[str], callback: Callable[[List[str]], Any], interval: float = 5.0):
+        """
+        Args:
+            paths: Files to watch.
+            callback: Called from the watcher thread with the list of changed paths.
+            interval: Seconds between polls.
+        """
+        self.paths = list(paths)
+        self.callback = callback
+        self.interval = interval
+        self._known = {path: self._stat(path) for path in self.paths}
+        self._pending: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> List[str]:
+        """Poll once and return the paths whose change has settled since the last report."""
+        changed = []
+        for path in self.paths:
+            current = self._stat(path)
+            if current == self._known[path]:
+                self._pending.pop(path, None)
+            elif path in self._pending and self._pending[path] == current:
+                del self._pending[path]
+                self._known[path] = current
+                if current is not None:
+                    changed.append(path)
+            else:
+                self._pending[path] = current
+        return changed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            changed = self.check()
+            if changed:
+                try:
+                    self.callback(changed)
+                except Exception as e:
+                    log.error(f"Reference data watcher callback failed: {e}")
+
+    def start(self) -> "FileWatcher":
+        """Start polling in a daemon thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="reference-data-watcher", daemon=True)
+            self._thread.start()
+            log.info(f"Watching {', '.join(self.paths)} every {self.interval}s")
+        return self
+
+    def stop(self) -> None:
+        """Stop polling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
@@ -0,0 +1,224 @@
+"""
+Server-side store for large tool results, referenced by short handles.
+
+Large GraphQL results used to travel through the context over and over: the
+ToolMessage, every following LLM call, the arguments of the counting tool and
+finally the refine prompt. parallel_graphql_executor now keeps each result here
+and hands the LLM a handle plus a small preview. Tools that work on the data
+(counting, reading a page of rows) take the handle instead of the data.
+
+The store is in-memory, per process and keyed by the conversation's thread_id,
+so results stay available to follow-up questions in the same thread without
+re-querying. It is bounded both per thread and in total; the least recently
+used results and threads are evicted first.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.runnables import RunnableConfig
+
+log = logging.getLogger(__name__)
+
+RESULT_STORE_MAX_BYTES_PER_THREAD = int(os.getenv("RESULT_STORE_MAX_BYTES_PER_THREAD", str(32 * 1024 * 1024)))
+RESULT_STORE_MAX_BYTES = int(os.getenv("RESULT_STORE_MAX_BYTES", str(512 * 1024 * 1024)))
+RESULT_STORE_MAX_HANDLES_PER_THREAD = int(os.getenv("RESULT_STORE_MAX_HANDLES_PER_THREAD", "200"))
+
+DEFAULT_THREAD = "default"
+
+
+@dataclass
+class StoredResult:
+    """A result kept in the ResultStore."""
+    handle: str
+    data: Any
+    size_bytes: int
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+
+    def describe(self) -> Dict[str, Any]:
+        """Summary of the result without its data."""
+        return {
+            "handle": self.handle,
+            "size_bytes": self.size_bytes,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created_at)),
+            "list_paths": dict(find_list_paths(self.data)),
+            **self.metadata,
+        }
+
+
+class ResultStore:
+    """
+    Size-bounded, thread-scoped store of tool results.
+
+    Handles are only resolved within the thread that created them.
+    """
+
+    def __init__(self,
+                 max_bytes_per_thread: int = RESULT_STORE_MAX_BYTES_PER_THREAD,
+                 max_bytes: int = RESULT_STORE_MAX_BYTES,
+                 max_handles_per_thread: int = RESULT_STORE_MAX_HANDLES_PER_THREAD):
+        self.max_bytes_per_thread = max_bytes_per_thread
+        self.max_bytes = max_bytes
+        self.max_handles_per_thread = max_handles_per_thread
+        # thread_id -> handle -> StoredResult, both in least-recently-used order
+        self._threads: "OrderedDict[str, OrderedDict[str, StoredResult]]" = OrderedDict()
+        self._thread_bytes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def put(self, thread_id: Optional[str], data: Any, size_bytes: Optional[int] = None, **metadata: Any) -> str:
+        """
+        Store a result.
+
+        Args:
+            thread_id: Conversation thread the result belongs to.
+            data: JSON-serializable result.
+            size_bytes: Size of the serialized result, if already known.
+            **metadata: Extra fields shown when the result is listed (e.g. query_id).
+
+        Returns:
+            The handle, e.g. 'res_1a2b3c4d5e'.
+        """
+        thread_id = thread_id or DEFAULT_THREAD
+        if size_bytes is None:
+            size_bytes = len(json.dumps(data, default=str))
+        stored = StoredResult(handle=f"res_{uuid.uuid4().hex[:10]}", data=data, size_bytes=size_bytes, metadata=metadata)
+        with self._lock:
+            results = self._threads.setdefault(thread_id, OrderedDict())
+            self._threads.move_to_end(thread_id)
+            results[stored.handle] = stored
+            self._thread_bytes[thread_id] = self._thread_bytes.get(thread_id, 0) + size_bytes
+            self._total_bytes += size_bytes
+            self._evict(thread_id)
+        return stored.handle
+
+    def _evict(self, thread_id: str) -> None:
+        """Drop old results of a thread, then whole idle threads, until both bounds hold."""
+        results = self._threads[thread_id]
+        while len(results) > 1 and (
+            self._thread_bytes[thread_id] > self.max_bytes_per_thread
+            or len(results) > self.max_handles_per_thread
+        ):
+            _, dropped = results.popitem(last=False)
+            self._release(thread_id, dropped.size_bytes)
+        while self._total_bytes > self.max_bytes and len(self._threads) > 1:
+            oldest_thread, oldest_results = next(iter(self._threads.items()))
+            if oldest_thread == thread_id:
+                break
+            del self._threads[oldest_thread]
+            self._total_bytes -= self._thread_bytes.pop(oldest_thread, 0)
+            log.info(f"Evicted {len(oldest_results)} stored results of thread {oldest_thread}")
+
+    def _release(self, thread_id: str, size_bytes: int) -> None:
+        self._thread_bytes[thread_id] -= size_bytes
+        self._total_bytes -= size_bytes
+
+    def get(self, thread_id: Optional[str], handle: str) -> Optional[StoredResult]:
+        """The stored result for a handle, or None if it is unknown, expired or from another thread."""
+        thread_id = thread_id or DEFAULT_THREAD
+        with self._lock:
+            results = self._threads.get(thread_id)
+            if results is None or handle not in results:
+                return None
+            self._threads.move_to_end(thread_id)
+            results.move_to_end(handle)
+            return results[handle]
+
+    def list(self, thread_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Summaries of a thread's stored results, oldest first."""
+        with self._lock:
+            results = list(self._threads.get(thread_id or DEFAULT_THREAD, {}).values())
+        return [stored.describe() for stored in results]
+
+    def clear(self, thread_id: Optional[str] = None) -> None:
+        """Drop one thread's results, or everything."""
+        with self._lock:
+            if thread_id is None:
+                self._threads.clear()
+                self._thread_bytes.clear()
+                self._total_bytes = 0
+            elif thread_id in self._threads:
+                del self._threads[thread_id]
+                self._total_bytes -= self._thread_bytes.pop(thread_id, 0)
+
+
+def thread_id_from_config(config: Optional[RunnableConfig]) -> str:
+    """The thread_id of a run, or DEFAULT_THREAD outside of a conversation."""
+    if not config:
+        return DEFAULT_THREAD
+    return str((config.get("configurable") or {}).get("thread_id") or DEFAULT_THREAD)
+
+
+def resolve_path(data: Any, path: Optional[str]) -> Any:
+    """
+    Follow a dotted path into JSON data, e.g. 'fetchPackages.packages' or 'items.0.name'.
+
+    Raises:
+        KeyError: If a step of the path does not exist.
+    """
+    value = data
+    for step in (path or "").split("."):
+        if not step:
+            continue
+        if isinstance(value, dict) and step in value:
+            value = value[step]
+        elif isinstance(value, list) and step.lstrip("-").isdigit() and -len(value) <= int(step) < len(value):
+            value = value[int(step)]
+        else:
+            raise KeyError(step)
+    return value
+
+
+def find_list_paths(data: Any, limit: int = 10, max_depth: int = 6) -> List[Tuple[str, int]]:
+    """
+    Paths to the lists inside JSON data with their lengths, longest first.
+
+    Lists inside lists are not descended into; only the first item's shape matters
+    for telling the LLM where the rows are.
+    """
+    found: List[Tuple[str, int]] = []
+
+    def walk(value: Any, path: str, depth: int) -> None:
+        if isinstance(value, list):
+            found.append((path, len(value)))
+        elif isinstance(value, dict) and depth < max_depth:
+            for key, child in value.items():
+                walk(child, f"{path}.{key}" if path else str(key), depth + 1)
+
+    walk(data, "", 0)
+    found.sort(key=lambda item: (-item[1], item[0]))
+    return found[:limit]
+
+
+def make_preview(value: Any, max_items: int = 3, max_string: int = 200) -> Any:
+    """
+    A small, structure-preserving preview of JSON data.
+
+    Lists keep their first max_items items followed by a '... N more items' marker,
+    long strings are cut to max_string characters.
+    """
+    if isinstance(value, dict):
+        return {key: make_preview(child, max_items, max_string) for key, child in value.items()}
+    if isinstance(value, list):
+        preview = [make_preview(child, max_items, max_string) for child in value[:max_items]]
+        if len(value) > max_items:
+            preview.append(f"... {len(value) - max_items} more items")
+        return preview
+    if isinstance(value, str) and len(value) > max_string:
+        return value[:max_string] + "..."
+    return value
+
+
+shared_result_store = ResultStore()
@@ -0,0 +1,233 @@
+"""
+GraphQL schema stored by content hash.
+
+The schema documentation is tens of kilobytes of markdown. Keeping it in
+RefinedAgentState put a full copy into every checkpoint of every thread, plus
+one more in messages each time it was re-injected. The state now holds only a
+reference ('schema:sha256:<digest>') and the text lives in a small process
+cache; references are resolved when the swarm's prompt is built, and a worker
+that does not have the text yet fetches the schema again.
+
+migrate_checkpoints rewrites threads checkpointed before this change; run
+`python -m backend.agents.dynamic_agents.schema_cache` once against the
+Telogical database.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, SystemMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver, copy_checkpoint, create_checkpoint
+
+log = logging.getLogger(__name__)
+
+SCHEMA_REF_PREFIX = "schema:sha256:"
+SCHEMA_CACHE_SIZE = 8
+
+SCHEMA_APPENDIX_DELIMITER_START = "\n\n--- BEGIN ATTACHED GRAPHQL SCHEMA (FOR AI REFERENCE) ---\n"
+SCHEMA_APPENDIX_DELIMITER_END = "\n--- END ATTACHED GRAPHQL SCHEMA ---"
+SCHEMA_MESSAGE_INTRO = (
+    "Context: The following GraphQL schema was identified as relevant for the current turn "
+    "and is available to the agent system if needed for query formulation or understanding capabilities:\n"
+)
+SCHEMA_REFERENCE_INTRO = "Context: GraphQL schema attached by reference: "
+
+
+def schema_ref(schema: str) -> str:
+    """Reference of a schema text, e.g. 'schema:sha256:3f5a...'."""
+    return SCHEMA_REF_PREFIX + hashlib.sha256(schema.encode("utf-8")).hexdigest()
+
+
+def is_schema_ref(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(SCHEMA_REF_PREFIX)
+
+
+class SchemaCache:
+    """Schema texts by reference, for the few schema versions a worker sees."""
+
+    def __init__(self, max_size: int = SCHEMA_CACHE_SIZE):
+        self.max_size = max_size
+        self._schemas: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, schema: str) -> str:
+        """Cache a schema text and return its reference."""
+        ref = schema_ref(schema)
+        with self._lock:
+            self._schemas[ref] = schema
+            self._schemas.move_to_end(ref)
+            while len(self._schemas) > self.max_size:
+                self._schemas.popitem(last=False)
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        with self._lock:
+            schema = self._schemas.get(ref)
+            if schema is not None:
+                self._schemas.move_to_end(ref)
+            return schema
+
+    def resolve(self, value: Optional[str]) -> Optional[str]:
+        """
+        Schema text for a state value: a reference is looked up (None if this worker
+        does not have it), and a full text from an older checkpoint is cached and returned.
+        """
+        if not value:
+            return None
+        if is_schema_ref(value):
+            return self.get(value)
+        self.put(value)
+        return value
+
+
+schema_cache = SchemaCache()
+
+
+def schema_message_content(schema: str) -> str:
+    """Content of the SystemMessage that gives the swarm the schema."""
+    return f"{SCHEMA_MESSAGE_INTRO}{SCHEMA_APPENDIX_DELIMITER_START}{schema}{SCHEMA_APPENDIX_DELIMITER_END}"
+
+
+def schema_reference_message(ref: str) -> SystemMessage:
+    """The SystemMessage kept in the thread's messages in place of the schema."""
+    return SystemMessage(content=f"{SCHEMA_REFERENCE_INTRO}{ref}")
+
+
+def _message_schema_ref(message: BaseMessage) -> Optional[str]:
+    content = message.content if isinstance(message, SystemMessage) else None
+    if isinstance(content, str) and content.startswith(SCHEMA_REFERENCE_INTRO):
+        return content[len(SCHEMA_REFERENCE_INTRO):].strip()
+    return None
+
+
+def _embedded_schema(message: BaseMessage) -> Optional[str]:
+    """The schema text inside a SystemMessage written before references were used."""
+    content = message.content if isinstance(message, SystemMessage) else None
+    if not isinstance(content, str) or SCHEMA_APPENDIX_DELIMITER_START not in content:
+        return None
+    schema = content.split(SCHEMA_APPENDIX_DELIMITER_START, 1)[1]
+    return schema.rsplit(SCHEMA_APPENDIX_DELIMITER_END, 1)[0]
+
+
+def expand_schema_references(messages: List[BaseMessage],
+                             fallback_schema: Optional[str] = None,
+                             cache: SchemaCache = schema_cache) -> List[BaseMessage]:
+    """
+    Replace the latest schema reference message with the full schema and drop older ones.
+
+    Older copies are superseded by the latest schema. A reference this worker cannot
+    resolve uses fallback_schema (the thread's current schema), or is dropped.
+    """
+    positions = [i for i, message in enumerate(messages) if _message_schema_ref(message)]
+    if not positions:
+        return messages
+    latest = positions[-1]
+    expanded: List[BaseMessage] = []
+    for i, message in enumerate(messages):
+        ref = _message_schema_ref(message)
+        if ref is None:
+            expanded.append(message)
+        elif i == latest:
+            schema = cache.get(ref) or fallback_schema
+            if schema:
+                expanded.append(SystemMessage(content=schema_message_content(schema)))
+    return expanded
+
+
+def migrate_state_values(values: Dict[str, Any], cache: SchemaCache = schema_cache) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Replace schema copies in a thread's state values by references.
+
+    Returns:
+        The new values and the names of the channels that changed.
+    """
+    migrated = dict(values)
+    changed: List[str] = []
+    schema = values.get("graphql_schema")
+    if isinstance(schema, str) and schema and not is_schema_ref(schema):
+        migrated["graphql_schema"] = cache.put(schema)
+        changed.append("graphql_schema")
+    messages = values.get("messages")
+    if isinstance(messages, list):
+        new_messages = []
+        for message in messages:
+            embedded = _embedded_schema(message) if isinstance(message, BaseMessage) else None
+            new_messages.append(schema_reference_message(cache.put(embedded)) if embedded else message)
+        if any(new is not old for new, old in zip(new_messages, messages)):
+            migrated["messages"] = new_messages
+            changed.append("messages")
+    return migrated, changed
+
+
+async def migrate_checkpoints(checkpointer: BaseCheckpointSaver,
+                              thread_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Rewrite the latest checkpoint of threads that still hold full schema copies.
+
+    A new checkpoint is written on top of the latest one (history stays intact),
+    so only subsequent loads get smaller.
+
+    Args:
+        checkpointer: The graph's checkpointer.
+        thread_ids: Threads to migrate; all threads with checkpoints if None.
+
+    Returns:
+        Dict with threads, migrated, bytes_before and bytes_after (serialized state of the migrated threads).
+    """
+    if thread_ids is None:
+        seen = set()
+        async for item in checkpointer.alist(None):
+            seen.add(item.config["configurable"]["thread_id"])
+        thread_ids = sorted(seen)
+
+    stats = {"threads": 0, "migrated": 0, "bytes_before": 0, "bytes_after": 0}
+    for thread_id in thread_ids:
+        stats["threads"] += 1
+        latest = await checkpointer.aget_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+        if latest is None:
+            continue
+        checkpoint = copy_checkpoint(latest.checkpoint)
+        values, changed = migrate_state_values(checkpoint["channel_values"])
+        if not changed:
+            continue
+        new_versions = {}
+        for channel in changed:
+            new_versions[channel] = checkpointer.get_next_version(checkpoint["channel_versions"].get(channel), None)
+            checkpoint["channel_versions"][channel] = new_versions[channel]
+        checkpoint["channel_values"] = values
+        step = (latest.metadata or {}).get("step", -1) + 1
+        await checkpointer.aput(
+            latest.config,
+            create_checkpoint(checkpoint, None, step),
+            {"source": "update", "step": step, "writes": {"schema_migration": changed}, "parents": {}},
+            new_versions,
+        )
+        stats["migrated"] += 1
+        stats["bytes_before"] += state_size(latest.checkpoint["channel_values"], checkpointer)
+        stats["bytes_after"] += state_size(values, checkpointer)
+    log.info(f"Schema checkpoint migration: {stats}")
+    return stats
+
+
+def state_size(values: Dict[str, Any], checkpointer: BaseCheckpointSaver) -> int:
+    """Serialized size of state values in bytes, as the checkpointer would store them."""
+    return sum(len(checkpointer.serde.dumps_typed(value)[1]) for value in values.values())
+
+
+async def _migrate_telogical_threads() -> None:
+    from backend.memory.postgres import get_telogical_postgres_saver
+
+    stats = await migrate_checkpoints(await get_telogical_postgres_saver())
+    saved = stats["bytes_before"] - stats["bytes_after"]
+    print(f"Migrated {stats['migrated']} of {stats['threads']} threads, "
+          f"latest state {stats['bytes_before']} -> {stats['bytes_after']} bytes ({saved} saved)")
+
+
+if __name__ == "__main__":
+    # python -m backend.agents.dynamic_agents.schema_cache
+    import asyncio
+
+    asyncio.run(_migrate_telogical_threads())
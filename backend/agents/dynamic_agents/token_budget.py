@@ -0,0 +1,47 @@
+"""
+Token counting for sizing what goes into LLM prompts.
+
+Counts use tiktoken. If the encoding cannot be loaded (tiktoken downloads it on
+first use, which fails without network access) they fall back to an estimate of
+CHARS_PER_TOKEN characters per token, so callers never fail on a missing file.
+"""
+
+import logging
+import os
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+log = logging.getLogger(__name__)
+
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str) -> Optional["tiktoken.Encoding"]:
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        log.warning(f"Token encoding '{name}' unavailable, estimating {CHARS_PER_TOKEN} characters per token: {e}")
+        return None
+
+
+def count_tokens(text: str, encoding: str = TOKEN_ENCODING) -> int:
+    """
+    Number of tokens in a text.
+
+    Args:
+        text: The text to count.
+        encoding: tiktoken encoding name.
+
+    Returns:
+        The exact token count, or an estimate if the encoding is unavailable.
+    """
+    if not text:
+        return 0
+    enc = _encoding(encoding)
+    if enc is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(enc.encode(text, disallowed_special=()))
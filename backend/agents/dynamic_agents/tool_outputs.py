@@ -0,0 +1,271 @@
+"""
+Token-budgeted selection of the tool outputs passed to the refinement step.
+
+refine_output_refined used to paste every tool output of the turn into its
+prompt: failed queries and the retries that replaced them, schema dumps from
+the introspection tools, hand-off confirmations and the same result fetched
+twice. Multi-query answers pushed the prompt past 50k tokens.
+
+select_tool_outputs keeps what the refiner checks the answer against, the
+successful data outputs. It drops errors (keeping the last one if nothing
+succeeded, so the refiner can still report a failure), schema and hand-off
+outputs and duplicates. It compacts the rest (JSON re-serialized without
+whitespace, empty fields and result-store bookkeeping). If they still exceed
+REFINE_TOOL_OUTPUT_TOKEN_BUDGET, the outputs sharing the most terms with the
+answer are kept first. Large results that reached the swarm only as a handle
+and a preview are first put back from the result store (resolve_result_handles). Counts of what was dropped are kept per call and for
+the process (served at /admin/metrics).
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.agents.dynamic_agents.answer_cleanup import HANDOFF_TOOL_PREFIX
+from backend.agents.dynamic_agents.result_store import ResultStore, shared_result_store
+from backend.agents.dynamic_agents.token_budget import count_tokens
+
+log = logging.getLogger(__name__)
+
+# Tokens for all tool outputs in the refine prompt (0 passes them all unchanged)
+REFINE_TOOL_OUTPUT_TOKEN_BUDGET = int(os.getenv("REFINE_TOOL_OUTPUT_TOKEN_BUDGET", "12000"))
+# An output is truncated to the remaining budget only if at least this many tokens are left
+MIN_TRUNCATED_TOKENS = 200
+TRUNCATION_MARKER = " ... [truncated]"
+
+SCHEMA_TOOLS = {
+    "graphql_introspection", "analyze_graphql_schema", "find_graphql_type_relationships",
+    "graphql_unified_introspection", "graphql_schema_markdown", "graphql_introspection_agent",
+}
+# Result-store fields meant for the swarm's follow-up tool calls, not for the refiner
+BOOKKEEPING_KEYS = {"result_handle", "list_paths", "note", "_dedup"}
+# Fields parallel_graphql_executor puts next to a result_handle in place of a large result
+PREVIEW_KEYS = {"result_preview", "result_size_chars", "list_paths", "note"}
+DROP_REASONS = ("error", "superseded_retry", "schema", "handoff", "duplicate", "over_budget")
+
+_TERM = re.compile(r"[A-Za-z][A-Za-z0-9&+-]{2,}|\d+(?:\.\d+)?")
+
+
+def _parse(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except (ValueError, TypeError):
+        return None
+
+
+def _is_error(text: str, status: Optional[str], parsed: Any) -> bool:
+    """Whether a tool output carries no data: a failed call, an error result, or only failed queries."""
+    if status == "error" or text.startswith("Error:"):
+        return True
+    if not isinstance(parsed, dict):
+        return False
+    if "error" in parsed and not set(parsed) - {"error", "details"}:
+        return True
+    entries = [v for v in parsed.values() if isinstance(v, dict) and "status" in v]
+    return bool(entries) and all(entry.get("status") == "error" for entry in entries)
+
+
+def _compact_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        compacted = {}
+        has_success = any(isinstance(v, dict) and v.get("status") == "success" for v in value.values())
+        for key, item in value.items():
+            if key in BOOKKEEPING_KEYS:
+                continue
+            # A failed query next to successful ones adds nothing for the refiner
+            if has_success and isinstance(item, dict) and item.get("status") == "error":
+                continue
+            item = _compact_value(item)
+            if item in (None, "", [], {}):
+                continue
+            compacted[key] = item
+        return compacted
+    if isinstance(value, list):
+        return [_compact_value(item) for item in value]
+    return value
+
+
+def compact_output(text: str) -> str:
+    """A tool output with the same data in fewer tokens."""
+    parsed = _parse(text)
+    if isinstance(parsed, (dict, list)):
+        return json.dumps(_compact_value(parsed), ensure_ascii=False, separators=(",", ":"), default=str)
+    return re.sub(r"[ \t]+", " ", re.sub(r"\n\s*\n+", "\n", text)).strip()
+
+
+def _with_stored_results(value: Any, thread_id: str, store: ResultStore) -> Tuple[Any, int]:
+    """JSON data with previews replaced by the stored results, and the number replaced."""
+    if isinstance(value, dict):
+        handle = value.get("result_handle")
+        if isinstance(handle, str) and "result" not in value and "result_preview" in value:
+            stored = store.get(thread_id, handle)
+            if stored is not None:
+                resolved = {key: item for key, item in value.items() if key not in PREVIEW_KEYS}
+                resolved["result"] = stored.data
+                return resolved, 1
+        replaced = 0
+        resolved = {}
+        for key, item in value.items():
+            resolved[key], count = _with_stored_results(item, thread_id, store)
+            replaced += count
+        return resolved, replaced
+    if isinstance(value, list):
+        items = [_with_stored_results(item, thread_id, store) for item in value]
+        return [item for item, _ in items], sum(count for _, count in items)
+    return value, 0
+
+
+def resolve_result_handles(entries: List[Any], thread_id: str, store: Optional[ResultStore] = None) -> List[Any]:
+    """
+    The turn's agent_tool_outputs with the full data of stored results put back.
+
+    The executor hands the swarm a few preview rows of large results, but the
+    refiner checks the answer against the data, so it gets the stored result;
+    select_tool_outputs then fits it into the token budget. Results no longer in
+    the store keep their preview.
+    """
+    store = store or shared_result_store
+    resolved: List[Any] = []
+    for entry in entries:
+        text = _entry_fields(entry)[0]
+        parsed = _parse(text) if "result_handle" in text else None
+        data, replaced = _with_stored_results(parsed, thread_id, store) if parsed is not None else (None, 0)
+        if not replaced:
+            resolved.append(entry)
+            continue
+        output = json.dumps(data, ensure_ascii=False, default=str)
+        resolved.append({**entry, "output": output} if isinstance(entry, dict) else output)
+    return resolved
+
+
+def _terms(text: str) -> set:
+    return {term.lower() for term in _TERM.findall(text)}
+
+
+def _relevance(text: str, answer_terms: set) -> float:
+    """Share of the output's terms that appear in the answer."""
+    terms = _terms(text)
+    return len(terms & answer_terms) / len(terms) if terms else 0.0
+
+
+def _truncate(text: str, tokens: int, max_tokens: int) -> str:
+    keep_chars = max(0, int(len(text) * max_tokens / tokens) - len(TRUNCATION_MARKER))
+    return text[:keep_chars] + TRUNCATION_MARKER
+
+
+def _entry_fields(entry: Any) -> Tuple[str, Optional[str], Optional[str]]:
+    """Text, tool name and status of an agent_tool_outputs entry (older checkpoints hold plain strings)."""
+    if isinstance(entry, dict):
+        return str(entry.get("output") or ""), entry.get("tool"), entry.get("status")
+    return str(entry or ""), None, None
+
+
+def select_tool_outputs(entries: List[Any],
+                        answer: str,
+                        token_budget: int = REFINE_TOOL_OUTPUT_TOKEN_BUDGET) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    The tool outputs to give the refiner, in call order.
+
+    Args:
+        entries: The turn's agent_tool_outputs (dicts with 'output' and, since this
+            selection exists, 'tool' and 'status'; or plain strings).
+        answer: The swarm's answer, used to rank outputs when they exceed the budget.
+        token_budget: Tokens for all selected outputs; 0 returns every output unchanged.
+
+    Returns:
+        The selected output texts, and stats: outputs, kept, truncated, dropped (count per
+        reason), tokens_before and tokens_after.
+    """
+    fields = [_entry_fields(entry) for entry in entries]
+    tokens_before = sum(count_tokens(text) for text, _, _ in fields)
+    stats: Dict[str, Any] = {"outputs": len(entries), "kept": 0, "truncated": 0,
+                             "dropped": Counter(), "tokens_before": tokens_before, "tokens_after": tokens_before}
+    if token_budget <= 0:
+        stats["kept"] = len(entries)
+        stats["dropped"] = {}
+        return [text for text, _, _ in fields], stats
+
+    candidates: List[Tuple[int, str]] = []
+    errors: List[Tuple[int, str, Optional[str]]] = []
+    for index, (text, tool, status) in enumerate(fields):
+        tool = tool or ""
+        if tool.startswith(HANDOFF_TOOL_PREFIX):
+            stats["dropped"]["handoff"] += 1
+        elif tool in SCHEMA_TOOLS or '"__schema"' in text:
+            stats["dropped"]["schema"] += 1
+        elif not text.strip() or _is_error(text.strip(), status, _parse(text)):
+            errors.append((index, text, tool))
+        else:
+            candidates.append((index, text))
+
+    # An error is superseded when the same tool (or, if unknown, any tool) succeeded after it
+    for index, text, tool in errors:
+        later = [fields[i][1] for i, _ in candidates if i > index]
+        superseded = any(not tool or not other or other == tool for other in later)
+        stats["dropped"]["superseded_retry" if superseded else "error"] += 1
+    if not candidates and errors:
+        index, text, _ = errors[-1]
+        stats["dropped"]["error"] -= 1
+        candidates.append((index, text))
+
+    unique: List[Tuple[int, str]] = []
+    seen = set()
+    for index, text in candidates:
+        compacted = compact_output(text)
+        if compacted in seen:
+            stats["dropped"]["duplicate"] += 1
+            continue
+        seen.add(compacted)
+        unique.append((index, compacted))
+
+    # Most relevant first until the budget is used up; the result keeps call order
+    answer_terms = _terms(answer or "")
+    ranked = sorted(unique, key=lambda item: (-_relevance(item[1], answer_terms), item[0]))
+    selected: Dict[int, str] = {}
+    used = 0
+    for index, text in ranked:
+        tokens = count_tokens(text)
+        if used + tokens <= token_budget:
+            selected[index] = text
+            used += tokens
+        elif token_budget - used >= MIN_TRUNCATED_TOKENS:
+            selected[index] = _truncate(text, tokens, token_budget - used)
+            used += count_tokens(selected[index])
+            stats["truncated"] += 1
+        else:
+            stats["dropped"]["over_budget"] += 1
+
+    stats["kept"] = len(selected)
+    stats["dropped"] = {reason: count for reason, count in stats["dropped"].items() if count}
+    stats["tokens_after"] = used
+    _record(stats)
+    return [selected[index] for index in sorted(selected)], stats
+
+
+_totals: Dict[str, int] = {"selections": 0, "outputs": 0, "kept": 0, "truncated": 0,
+                           "tokens_before": 0, "tokens_after": 0}
+_dropped_totals: Counter = Counter()
+_totals_lock = threading.Lock()
+
+
+def _record(stats: Dict[str, Any]) -> None:
+    with _totals_lock:
+        _totals["selections"] += 1
+        for key in ("outputs", "kept", "truncated", "tokens_before", "tokens_after"):
+            _totals[key] += stats[key]
+        _dropped_totals.update(stats["dropped"])
+
+
+def selection_metrics() -> Dict[str, Any]:
+    """Totals of all selections in this process."""
+    with _totals_lock:
+        metrics: Dict[str, Any] = dict(_totals)
+        metrics["dropped"] = {reason: _dropped_totals[reason] for reason in DROP_REASONS}
+    before = metrics["tokens_before"]
+    metrics["token_reduction"] = round(1 - metrics["tokens_after"] / before, 4) if before else 0.0
+    metrics["token_budget"] = REFINE_TOOL_OUTPUT_TOKEN_BUDGET
+    return metrics
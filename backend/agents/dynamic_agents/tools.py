@@ -6,7 +6,7 @@ These tools are intended as free examples to get started. For production use,
 consider implementing more robust and specialized tools tailored to your needs.
 """
 
-from typing import Any, Callable, List, Optional, cast, Dict, Literal, Union
+from typing import Any, Callable, Iterable, List, Optional, cast, Dict, Literal, Tuple, Union
 from typing_extensions import Annotated
 import json
 from enum import Enum
@@ -17,7 +17,7 @@ from pydantic import BaseModel, Field, field_validator, ValidationError, model_v
 from typing import List, Optional, Dict, Any
 import traceback
 from langchain.tools.base import StructuredTool
-from langchain_core.runnables import Runnable
+from langchain_core.runnables import Runnable, RunnableConfig
 from langchain.prompts import ChatPromptTemplate
 from langchain_nvidia_ai_endpoints import ChatNVIDIA
 from langchain_openai import AzureChatOpenAI
@@ -27,13 +27,32 @@ from datetime import datetime, timedelta
 import asyncio
 import aiohttp
 import random 
+import hashlib
+import threading
+import time
+from functools import cached_property
 import re
 import pandas as pd 
 from langchain.schema import HumanMessage, AIMessage
-from langchain_core.messages import AnyMessage, HumanMessage
+from langchain_core.messages import AnyMessage, ChatMessage, HumanMessage
+from langgraph.config import get_stream_writer
 from langchain.chains import create_retrieval_chain
 from langchain.tools import BaseTool, Tool
 from langgraph_swarm import create_handoff_tool, create_swarm, add_active_agent_router
+from backend.agents.dynamic_agents.aggregation import FILTER_OPS, METRIC_OPS, AggregationError, aggregate
+from backend.agents.dynamic_agents.answer_cache import answer_cache
+from backend.agents.dynamic_agents.deadline import deadline_stats, stage_timeout
+from backend.agents.dynamic_agents.entity_dedup import dedup_query_results
+from backend.agents.dynamic_agents.geo_index import DMAIndex, LocationIndex, ReverseGeoIndex, ZipSetIndex
+from backend.agents.dynamic_agents.hedging import Hedger, shared_hedger
+from backend.agents.dynamic_agents.prompt_cache import prompt_cache_stats
+from backend.agents.dynamic_agents.query_classifier import get_query_classifier
+from backend.agents.dynamic_agents.query_sharding import argument_values, merge_results, plan_shards
+from backend.agents.dynamic_agents.reference_data import FileWatcher, deep_sizeof, load_table
+from backend.agents.dynamic_agents.result_store import (
+    find_list_paths, make_preview, resolve_path, shared_result_store, thread_id_from_config
+)
+from backend.agents.dynamic_agents.tool_outputs import selection_metrics
 import requests
 import logging
 from dotenv import load_dotenv
@@ -62,6 +81,33 @@ DEFAULT_AUTH_TOKEN = os.getenv("TELOGICAL_AUTH_TOKEN_2", "YOUR_AUTH_TOKEN_HERE")
 DEFAULT_LOCALE = os.getenv("TELOGICAL_LOCALE", "YOUR_LOCALE_HERE")
 # Path to CSV files in the data folder
 DEFAULT_TIMEOUT = 30  # seconds for each GraphQL request
+# Upper bound on GraphQL requests in flight per tool call, shards and hedges included
+GRAPHQL_MAX_CONCURRENCY = int(os.getenv("GRAPHQL_MAX_CONCURRENCY", "8"))
+# Check ZIP code arguments against geo-data.csv and reject unknown ones before sending the query
+GRAPHQL_VALIDATE_ZIPCODES = os.getenv("GRAPHQL_VALIDATE_ZIPCODES", "true").strip().lower() not in ("0", "false", "no")
+ZIP_ARGUMENT_NAMES = ("zipCodes", "zipCode")
+MAX_ZIP_SUGGESTIONS = 5
+# GraphQL results larger than this (serialized characters) are replaced by a handle and a
+# preview in the tool output; the full result stays in the per-thread result store.
+RESULT_HANDLE_MIN_CHARS = int(os.getenv("RESULT_HANDLE_MIN_CHARS", "8000"))
+# Replace entities repeated across parallel query results by references to a shared table
+GRAPHQL_DEDUP_ENTITIES = os.getenv("GRAPHQL_DEDUP_ENTITIES", "true").strip().lower() not in ("0", "false", "no")
+
+# Fuzzy location matching: a candidate is used automatically only if it scores at
+# least FUZZY_MATCH_MIN_SCORE and beats the next different name by FUZZY_MATCH_MARGIN.
+FUZZY_MATCH_MIN_SCORE = float(os.getenv("FUZZY_MATCH_MIN_SCORE", "0.75"))
+FUZZY_MATCH_MARGIN = float(os.getenv("FUZZY_MATCH_MARGIN", "0.05"))
+
+# How ZipCodeFinder picks one ZIP code for a place: 'deterministic' (stable hash,
+# the default, so identical questions produce identical GraphQL queries),
+# 'seeded' (reproducible pseudo-random, for tests) or 'random'.
+ZIP_SELECTION_MODE = os.getenv("ZIP_SELECTION_MODE", "deterministic")
+ZIP_SELECTION_SEED = int(os.getenv("ZIP_SELECTION_SEED", "0"))
+# Optional JSON file mapping "type|place|state" keys to a representative ZIP code.
+ZIP_REPRESENTATIVES_PATH = os.getenv("ZIP_REPRESENTATIVES_PATH")
+# Identifies ZipCodeFinder's CSV preparation; change it when _prepare_data changes so snapshots are rebuilt.
+ZIP_DATA_VERSION = "zipcode-finder-1"
+DMA_DATA_VERSION = "dma-lookup-1"
 
 
 # --- Telogical LLM ---
@@ -108,13 +154,52 @@ class LocationType(str, Enum):
     COUNTY = 'county'
     STATE = 'state'
 
+class ZipSelectionMode(str, Enum):
+    """How a single ZIP code is picked among all ZIP codes matching a place."""
+    DETERMINISTIC = 'deterministic'
+    SEEDED = 'seeded'
+    RANDOM = 'random'
+
+
+def _load_representative_zips(path: Optional[str]) -> Dict[str, str]:
+    """Load the configured place -> representative ZIP code mapping, if any."""
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            mapping = json.load(f)
+        return {str(k).lower().strip(): str(v).zfill(5) for k, v in mapping.items()}
+    except Exception as e:
+        log.error(f"Could not load representative ZIP codes from {path}: {e}")
+        return {}
+
+
 class ZipCodeFinder:
     """
     Utility class to find ZIP codes based on location information from a local CSV,
     with optional state filtering for disambiguation.
     """
-    def __init__(self, csv_path: str):
+    def __init__(self,
+                 csv_path: str,
+                 selection_mode: Union[ZipSelectionMode, str] = ZIP_SELECTION_MODE,
+                 seed: int = ZIP_SELECTION_SEED,
+                 representative_zips: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            csv_path: Path to the geo data CSV.
+            selection_mode: How get_zipcode picks one ZIP code among the matches.
+            seed: Seed for ZipSelectionMode.SEEDED.
+            representative_zips: Optional mapping of "type|place|state" keys (e.g.
+                "city|oklahoma city|ok") to the ZIP code to always use for that place.
+                Defaults to the file at ZIP_REPRESENTATIVES_PATH.
+        """
         self.csv_path = csv_path
+        self.selection_mode = ZipSelectionMode(selection_mode)
+        self._rng = random.Random(seed)
+        self.representative_zips = (
+            representative_zips if representative_zips is not None
+            else _load_representative_zips(ZIP_REPRESENTATIVES_PATH)
+        )
         # Standardize column names expected in the CSV
         self.COLUMNS = {
             'zip': 'zipcode',
@@ -128,20 +213,40 @@ class ZipCodeFinder:
             raise RuntimeError(f"Failed to load or prepare data from {csv_path}")
         log.info(f"ZipCodeFinder initialized with data from {csv_path}")
 
+    # The indexes are built on first use (or by warm_up), so loading the table stays cheap.
+    @cached_property
+    def location_index(self) -> LocationIndex:
+        return LocationIndex.from_dataframe(self.df, self.COLUMNS)
+
+    @cached_property
+    def reverse_index(self) -> ReverseGeoIndex:
+        return ReverseGeoIndex.from_dataframe(self.df, self.COLUMNS)
+
+    @cached_property
+    def zip_sets(self) -> ZipSetIndex:
+        return ZipSetIndex.from_dataframe(self.df, self.COLUMNS)
+
+    def warm_up(self) -> None:
+        """Build all lazily built indexes now."""
+        self.location_index, self.reverse_index, self.zip_sets
+
     def _load_data(self) -> Optional[pd.DataFrame]:
-        """Load and prepare the ZIP code data."""
+        """Load the prepared ZIP code data, from its binary snapshot when it is up to date."""
         if not os.path.exists(self.csv_path):
             log.error(f"ZIP code CSV file not found: {self.csv_path}")
             return None
+        return load_table(self.csv_path, self._prepare_data, version=ZIP_DATA_VERSION)
 
+    def _prepare_data(self, csv_path: str) -> Optional[pd.DataFrame]:
+        """Parse and normalize the ZIP code CSV."""
         try:
-            df = pd.read_csv(self.csv_path, low_memory=False)
+            df = pd.read_csv(csv_path, low_memory=False)
             df.columns = [str(col).strip().lower() for col in df.columns]
 
             # Check if essential columns exist
             missing_cols = [col for col in self.COLUMNS.values() if col not in df.columns]
             if missing_cols:
-                log.error(f"CSV file {self.csv_path} is missing required columns: {missing_cols}")
+                log.error(f"CSV file {csv_path} is missing required columns: {missing_cols}")
                 return None
 
             # Ensure zipcode is string type with leading zeros
@@ -154,19 +259,19 @@ class ZipCodeFinder:
                     # Handle potential NaN/None values before lowercasing
                     df[col_name] = df[col_name].fillna('').astype(str).str.lower().str.strip()
 
-            log.info(f"Successfully loaded and processed {len(df)} rows from {self.csv_path}")
+            log.info(f"Successfully loaded and processed {len(df)} rows from {csv_path}")
             return df
 
         except Exception as e:
-            log.error(f"Error loading or processing CSV file {self.csv_path}: {e}")
+            log.error(f"Error loading or processing CSV file {csv_path}: {e}")
             return None
 
-    def get_zipcode(self,
-                   location: str,
-                   location_type: LocationType,
-                   state_qualifier: Optional[str] = None) -> Optional[str]:
+    def _matching_zipcodes(self,
+                           location: str,
+                           location_type: LocationType,
+                           state_qualifier: Optional[str] = None) -> List[str]:
         """
-        Get a single random ZIP code for a location, optionally filtered by state.
+        Get all ZIP codes for a location, optionally filtered by state, sorted ascending.
 
         Args:
             location: Location name (e.g., 'Norman', 'Cleveland', 'Illinois', 'OK').
@@ -175,14 +280,14 @@ class ZipCodeFinder:
             state_qualifier: Optional state name or abbreviation to filter results.
 
         Returns:
-            A single ZIP code (as string) or None if no match found.
+            Sorted list of unique ZIP codes (empty if no match found).
         """
         if self.df is None:
             log.warning("ZipCodeFinder DataFrame not loaded. Cannot search.")
-            return None
+            return []
         if not location or not location.strip():
             log.warning("Location cannot be empty.")
-            return None
+            return []
 
         primary_search_val = location.lower().strip()
         primary_search_col = ''
@@ -201,22 +306,22 @@ class ZipCodeFinder:
             state_qualifier = None  # State qualifier is redundant for state searches
         else:
             log.error(f"Invalid location_type provided: {location_type}")
-            return None
+            return []
 
         if primary_search_col not in self.df.columns:
             log.error(f"Primary search column '{primary_search_col}' not found in DataFrame.")
-            return None
+            return []
 
         # Initial filter based on primary location
         try:
-            filtered_df = self.df[self.df[primary_search_col] == primary_search_val].copy()
+            filtered_df = self.df[self.df[primary_search_col] == primary_search_val]
         except Exception as e:
             log.error(f"Error during filtering for '{primary_search_val}' in '{primary_search_col}': {e}")
-            return None
+            return []
 
         if filtered_df.empty:
             log.info(f"No match found for {location_type.value} '{location}'.")
-            return None
+            return []
 
         # Apply secondary state filter if provided and needed
         if state_qualifier and state_qualifier.strip() and location_type != LocationType.STATE:
@@ -233,26 +338,128 @@ class ZipCodeFinder:
                     filtered_df = filtered_df[filtered_df[state_col] == state_qualifier_val]
                 except Exception as e:
                     log.error(f"Error filtering by state '{state_qualifier_val}': {e}")
-                    return None
+                    return []
 
         # Final check if df is empty after state filter
         if filtered_df.empty:
             log.info(f"No match found for {location_type.value} '{location}' in state '{state_qualifier}'.")
-            return None
+            return []
+
+        return sorted(filtered_df[self.COLUMNS['zip']].unique().tolist())
+
+    @cached_property
+    def _state_abbr_by_name(self) -> Dict[str, str]:
+        """Lowercase state name -> lowercase abbreviation, from the geo data."""
+        pairs = self.df[[self.COLUMNS['state_full'], self.COLUMNS['state_abbr']]].drop_duplicates()
+        return {name: abbr for name, abbr in pairs.itertuples(index=False, name=None) if name and abbr}
+
+    def _place_key(self, location: str, location_type: LocationType, state_qualifier: Optional[str]) -> str:
+        """Stable key for a place, e.g. 'city|norman|ok' (also for the qualifier 'Oklahoma')."""
+        state = (state_qualifier or "").lower().strip() if location_type != LocationType.STATE else ""
+        state = self._state_abbr_by_name.get(state, state)
+        return f"{location_type.value}|{location.lower().strip()}|{state}"
+
+    def _select_zipcode(self, zip_codes: List[str], place_key: str) -> str:
+        """Pick one ZIP code from a sorted, non-empty list according to the selection mode."""
+        representative = self.representative_zips.get(place_key)
+        if representative is None and not place_key.endswith("|"):
+            # A representative configured without a state also applies to qualified lookups.
+            representative = self.representative_zips.get(place_key.rsplit("|", 1)[0] + "|")
+        if representative in zip_codes:
+            return representative
+
+        if self.selection_mode == ZipSelectionMode.RANDOM:
+            return random.choice(zip_codes)
+        if self.selection_mode == ZipSelectionMode.SEEDED:
+            return self._rng.choice(zip_codes)
+        # Python's hash() is salted per process, so use a content hash instead.
+        digest = hashlib.sha1(place_key.encode("utf-8")).hexdigest()
+        return zip_codes[int(digest, 16) % len(zip_codes)]
 
-        # Get all matching zip codes
-        zip_codes = filtered_df[self.COLUMNS['zip']].unique().tolist()
-        
+    def get_zipcode(self,
+                   location: str,
+                   location_type: LocationType,
+                   state_qualifier: Optional[str] = None) -> Optional[str]:
+        """
+        Get a single ZIP code for a location, optionally filtered by state.
+
+        Which ZIP code is returned depends on the selection mode: a configured
+        representative ZIP code wins, otherwise DETERMINISTIC always returns the
+        same ZIP code for the same place, SEEDED is reproducible for a given seed
+        and RANDOM picks a new one each call.
+
+        Args:
+            location: Location name (e.g., 'Norman', 'Cleveland', 'Illinois', 'OK').
+                      Search is case-insensitive.
+            location_type: Type of the location (CITY, COUNTY, STATE).
+            state_qualifier: Optional state name or abbreviation to filter results.
+
+        Returns:
+            A single ZIP code (as string) or None if no match found.
+        """
+        location_type = LocationType(location_type)
+        zip_codes = self._matching_zipcodes(location, location_type, state_qualifier)
         if not zip_codes:
             return None
-            
-        # Select one random zip code
-        selected_zip = random.choice(zip_codes)
-        
-        log.info(f"Selected random zip code '{selected_zip}' for {location_type.value} '{location}'"
+
+        selected_zip = self._select_zipcode(
+            zip_codes, self._place_key(location, location_type, state_qualifier)
+        )
+        log.info(f"Selected zip code '{selected_zip}' ({self.selection_mode.value}) for {location_type.value} '{location}'"
                 f"{f' in state {state_qualifier}' if state_qualifier else ''} from {len(zip_codes)} options.")
         return selected_zip
 
+    def get_zipcodes(self,
+                     location: str,
+                     location_type: LocationType,
+                     state_qualifier: Optional[str] = None,
+                     max_zips: Optional[int] = None) -> List[str]:
+        """
+        Get the ZIP codes for a location, either all of them or an evenly spread sample.
+
+        Args:
+            location: Location name. Search is case-insensitive.
+            location_type: Type of the location (CITY, COUNTY, STATE).
+            state_qualifier: Optional state name or abbreviation to filter results.
+            max_zips: If set and more ZIP codes match, return this many, spread evenly
+                      across the sorted list (which roughly spreads them geographically).
+
+        Returns:
+            Sorted list of ZIP codes (empty if no match found). Always the same for the same input.
+        """
+        location_type = LocationType(location_type)
+        zip_codes = self._matching_zipcodes(location, location_type, state_qualifier)
+        if max_zips is None or max_zips <= 0 or len(zip_codes) <= max_zips:
+            return zip_codes
+        if max_zips == 1:
+            return [self._select_zipcode(zip_codes, self._place_key(location, location_type, state_qualifier))]
+        step = (len(zip_codes) - 1) / (max_zips - 1)
+        return [zip_codes[round(i * step)] for i in range(max_zips)]
+
+    def suggest_locations(self,
+                          location: str,
+                          location_type: LocationType,
+                          state_qualifier: Optional[str] = None,
+                          limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Rank known locations whose names resemble a possibly misspelled one.
+
+        Handles typos ("Oklahoma Cty"), abbreviations ("St Louis", "Ft Worth") and
+        county suffixes ("Cleveland County", "Jefferson Parish").
+
+        Args:
+            location: Location name as given by the caller.
+            location_type: Type of the location (CITY, COUNTY, STATE).
+            state_qualifier: Optional state name or abbreviation to filter candidates.
+            limit: Maximum number of candidates.
+
+        Returns:
+            Candidates best first, each with 'location', 'location_type', 'state' and 'score'.
+        """
+        if not location or not location.strip():
+            return []
+        return self.location_index.search(location, location_type, state=state_qualifier, limit=limit)
+
     def parse_location_string(self, location_string: str) -> Dict[str, Any]:
         """
         Parse a location string like "Norman, OK" into its components.
@@ -291,12 +498,27 @@ class ZipCodeFinder:
         return {"location": location_string, "location_type": "city"}
 
 
-# Initialize the shared instance
-try:
-    shared_zip_finder = ZipCodeFinder(ZIP_CODE_CSV_PATH)
-except Exception as e:
-    log.error(f"Failed to initialize ZipCodeFinder: {e}")
-    shared_zip_finder = None
+# The shared instance is created on first use (or by warm_up_reference_data), not at import
+_shared_zip_finder: Optional[ZipCodeFinder] = None
+_shared_zip_finder_lock = threading.Lock()
+
+
+def get_shared_zip_finder() -> Optional[ZipCodeFinder]:
+    """
+    Get the shared ZipCodeFinder, loading the geo data on the first call.
+
+    Returns:
+        The shared instance, or None if the geo data could not be loaded.
+    """
+    global _shared_zip_finder
+    if _shared_zip_finder is None:
+        with _shared_zip_finder_lock:
+            if _shared_zip_finder is None:
+                try:
+                    _shared_zip_finder = ZipCodeFinder(ZIP_CODE_CSV_PATH)
+                except Exception as e:
+                    log.error(f"Failed to initialize ZipCodeFinder: {e}")
+    return _shared_zip_finder
 
 
 # Simple input schema for the tool - accepts different formats
@@ -325,6 +547,15 @@ class MultiLocationZipCodeInput(BaseModel):
         description="Optional list of states (name or abbreviation) to disambiguate locations. "
                    "Use empty string or null for locations that don't need state qualification."
     )
+    return_all: bool = Field(
+        False,
+        description="Set to true to also return every ZIP code of each location in 'zipcodes'."
+    )
+    max_zips_per_location: Optional[int] = Field(
+        None,
+        description="Optional cap on 'zipcodes': returns at most this many ZIP codes per location, "
+                   "spread evenly across the location. Ignored when return_all is true."
+    )
     
     @model_validator(mode='before')
     @classmethod
@@ -368,7 +599,78 @@ class ZipCodeFinderTool:
     """Tool to find ZIP codes for locations with flexible input handling."""
     
     def __init__(self):
-        self.finder = shared_zip_finder
+        # Pinned for the lifetime of this tool call, so a reload can't swap the data mid-lookup
+        self.finder = get_shared_zip_finder()
+
+    def _lookup(self,
+                location: str,
+                location_type: LocationType,
+                state: Optional[str],
+                return_all: bool = False,
+                max_zips: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Look up a ZIP code, falling back to the fuzzy location index when there is no exact hit.
+
+        Args:
+            location: Location name.
+            location_type: Type of the location.
+            state: Optional state qualifier.
+            return_all: Also return every ZIP code of the location as 'zipcodes'.
+            max_zips: Also return up to this many evenly spread ZIP codes as 'zipcodes'.
+
+        Returns:
+            Dictionary with 'zipcode' (or None), 'match' ('exact', 'fuzzy' or None),
+            for fuzzy matches 'resolved_location', 'suggestions' when nothing was resolved,
+            and 'zipcodes'/'total_zipcodes' when a ZIP code set was requested.
+        """
+        lookup: Dict[str, Any] = {"zipcode": None, "match": None}
+        resolved_name = location
+        zipcode = self.finder.get_zipcode(
+            location=location,
+            location_type=location_type,
+            state_qualifier=state
+        )
+        if zipcode:
+            lookup.update({"zipcode": zipcode, "match": "exact"})
+        else:
+            candidates = self.finder.suggest_locations(location, location_type, state)
+            best = candidates[0] if candidates else None
+            if best and best["score"] >= FUZZY_MATCH_MIN_SCORE:
+                runner_up = next((c for c in candidates[1:] if c["location"] != best["location"]), None)
+                if runner_up is None or best["score"] - runner_up["score"] >= FUZZY_MATCH_MARGIN:
+                    zipcode = self.finder.get_zipcode(
+                        location=best["location"],
+                        location_type=location_type,
+                        state_qualifier=state
+                    )
+            if zipcode:
+                log.info(f"Resolved {location_type.value} '{location}' to '{best['location']}' "
+                         f"(score {best['score']})")
+                resolved_name = best["location"]
+                # The same name may exist in several states; only report one if it is unique.
+                states = {c["state"] for c in candidates if c["location"] == best["location"]}
+                lookup.update({
+                    "zipcode": zipcode,
+                    "match": "fuzzy",
+                    "resolved_location": {
+                        "location": best["location"],
+                        "state": best["state"] if len(states) == 1 else None,
+                        "score": best["score"]
+                    }
+                })
+            else:
+                lookup["suggestions"] = [
+                    {"location": c["location"], "state": c["state"], "score": c["score"]}
+                    for c in candidates
+                ]
+
+        if zipcode and (return_all or max_zips):
+            all_zips = self.finder.get_zipcodes(resolved_name, location_type, state)
+            lookup["zipcodes"] = all_zips if return_all else self.finder.get_zipcodes(
+                resolved_name, location_type, state, max_zips=max_zips
+            )
+            lookup["total_zipcodes"] = len(all_zips)
+        return lookup
         
     def find_single_zipcode(self, location: str) -> Dict[str, Any]:
         """
@@ -388,25 +690,30 @@ class ZipCodeFinderTool:
             location_info = self.finder.parse_location_string(location)
             
             # Get the zipcode
-            zipcode = self.finder.get_zipcode(
+            lookup = self._lookup(
                 location=location_info["location"],
-                location_type=location_info["location_type"],
-                state_qualifier=location_info.get("state")
+                location_type=LocationType(location_info["location_type"]),
+                state=location_info.get("state")
             )
             
-            if zipcode:
-                return {
+            if lookup["zipcode"]:
+                result = {
                     "location": location,
-                    "zipcode": zipcode,
+                    "zipcode": lookup["zipcode"],
                     "status": "success",
-                    "parsed_as": location_info
+                    "parsed_as": location_info,
+                    "match": lookup["match"]
                 }
+                if "resolved_location" in lookup:
+                    result["resolved_location"] = lookup["resolved_location"]
+                return result
             else:
                 return {
                     "location": location,
                     "zipcode": None,
                     "status": "no_results_found",
-                    "parsed_as": location_info
+                    "parsed_as": location_info,
+                    "suggestions": lookup.get("suggestions", [])
                 }
                 
         except Exception as e:
@@ -417,12 +724,17 @@ class ZipCodeFinderTool:
                 "status": "error"
             }
     
-    def find_multiple_zipcodes(self, structured_locations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def find_multiple_zipcodes(self,
+                               structured_locations: List[Dict[str, Any]],
+                               return_all: bool = False,
+                               max_zips_per_location: Optional[int] = None) -> Dict[str, Any]:
         """
         Find ZIP codes for multiple locations.
         
         Args:
             structured_locations: List of structured location dictionaries
+            return_all: Also return every ZIP code of each location
+            max_zips_per_location: Also return up to this many evenly spread ZIP codes per location
             
         Returns:
             Dictionary with results for each location
@@ -453,25 +765,32 @@ class ZipCodeFinderTool:
             if state:
                 display_name = f"{location}, {state}"
             
-            zipcode = self.finder.get_zipcode(
+            lookup = self._lookup(
                 location=location,
                 location_type=location_type,
-                state_qualifier=state
+                state=state,
+                return_all=return_all,
+                max_zips=max_zips_per_location
             )
             
-            if zipcode:
+            if lookup["zipcode"]:
                 results[display_name] = {
-                    "zipcode": zipcode,
+                    "zipcode": lookup["zipcode"],
                     "status": "success",
                     "location_type": location_type.value,
-                    "state": state
+                    "state": state,
+                    "match": lookup["match"]
                 }
+                for key in ("resolved_location", "zipcodes", "total_zipcodes"):
+                    if key in lookup:
+                        results[display_name][key] = lookup[key]
             else:
                 results[display_name] = {
                     "zipcode": None,
                     "status": "no_results_found",
                     "location_type": location_type.value,
-                    "state": state
+                    "state": state,
+                    "suggestions": lookup.get("suggestions", [])
                 }
             
         return {
@@ -486,7 +805,9 @@ class ZipCodeFinderTool:
 def find_multiple_zipcodes(
     location_names: List[str],
     location_types: Optional[List[str]] = None,
-    states: Optional[List[Optional[str]]] = None
+    states: Optional[List[Optional[str]]] = None,
+    return_all: bool = False,
+    max_zips_per_location: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Find ZIP codes for multiple locations.
@@ -496,6 +817,8 @@ def find_multiple_zipcodes(
         location_types: Optional list of location types ('city', 'county', 'state')
                        corresponding to each location name
         states: Optional list of states to disambiguate locations
+        return_all: Also return every ZIP code of each location
+        max_zips_per_location: Also return up to this many evenly spread ZIP codes per location
                  
     Returns:
         Dictionary with results for each location
@@ -528,7 +851,11 @@ def find_multiple_zipcodes(
             
         structured_locations.append(loc)
         
-    return tool.find_multiple_zipcodes(structured_locations)
+    return tool.find_multiple_zipcodes(
+        structured_locations,
+        return_all=return_all,
+        max_zips_per_location=max_zips_per_location
+    )
 
 
 # Create simple tool for single location lookups
@@ -546,8 +873,16 @@ def find_zipcode_simple(location: str) -> str:
     result = tool.find_single_zipcode(location)
     
     if result.get("status") == "success":
+        resolved = result.get("resolved_location")
+        if resolved:
+            matched = ", ".join(part for part in (resolved["location"], resolved["state"]) if part)
+            return f"The ZIP code for {result['location']} (matched as {matched}) is {result['zipcode']}."
         return f"The ZIP code for {result['location']} is {result['zipcode']}."
     elif result.get("status") == "no_results_found":
+        suggestions = result.get("suggestions") or []
+        if suggestions:
+            names = ", ".join(f"{s['location']}, {s['state']}" for s in suggestions)
+            return f"No ZIP code found for {result['location']}. Did you mean: {names}?"
         return f"No ZIP code found for {result['location']}."
     else:
         return f"Error finding ZIP code for {result['location']}: {result.get('error', 'Unknown error')}"
@@ -573,7 +908,11 @@ zipcode_finder_tool = StructuredTool(
         "'location_types' (optional): list of location types ('city', 'county', 'state') corresponding to each location, "
         "'states' (optional): list of states to disambiguate locations (e.g., ['OK', 'IL', 'FL']). "
         "Use empty strings for locations that don't need state qualification. "
-        "The tool returns exactly one ZIP code for each location. "
+        "The tool returns one representative ZIP code for each location (always the same one for the same place). "
+        "Set 'return_all' to true to also get every ZIP code of each location, or 'max_zips_per_location' "
+        "to get an evenly spread sample of at most that many. "
+        "Misspelled or abbreviated names (e.g. 'Oklahoma Cty', 'St Louis') are resolved automatically "
+        "when the match is unambiguous; otherwise ranked 'suggestions' are returned. "
         "Example input: {'location_names': ['Norman', 'Chicago'], 'location_types': ['city', 'city'], 'states': ['OK', 'IL']}"
     ),
     func=find_multiple_zipcodes,
@@ -581,6 +920,260 @@ zipcode_finder_tool = StructuredTool(
 )
 
 
+# ------------------------------------------------------------------------------
+# --- Tool 2b: zip_code_location_lookup (ZIP code -> city/county/state) ---
+# ------------------------------------------------------------------------------
+
+MAX_REVERSE_LOOKUP_ZIPS = 1000
+
+
+class ZipCodeLocationLookupInput(BaseModel):
+    """Input schema for the reverse ZIP code lookup tool."""
+    zip_codes: List[str] = Field(
+        ...,
+        description=f"List of ZIP codes to look up (up to {MAX_REVERSE_LOOKUP_ZIPS} per call), e.g. ['73069', '60601']."
+    )
+
+    @field_validator('zip_codes', mode='before')
+    @classmethod
+    def coerce_zip_codes(cls, zip_codes):
+        """Accept a single ZIP code and integer ZIP codes."""
+        if isinstance(zip_codes, (str, int)):
+            zip_codes = [zip_codes]
+        return [str(z) for z in zip_codes]
+
+
+def lookup_zip_code_locations(zip_codes: List[str]) -> Dict[str, Any]:
+    """
+    Look up the city, county, state and state FIPS code of many ZIP codes at once.
+
+    Args:
+        zip_codes: ZIP codes to look up.
+
+    Returns:
+        Dictionary with 'results' (ZIP code -> list of places; a ZIP code can span
+        several counties or cities) and 'not_found'.
+    """
+    finder = get_shared_zip_finder()
+    if not finder:
+        return {"error": "ZipCodeFinder is not initialized. Check CSV path and format."}
+    if len(zip_codes) > MAX_REVERSE_LOOKUP_ZIPS:
+        return {"error": f"Too many ZIP codes ({len(zip_codes)}). Send at most {MAX_REVERSE_LOOKUP_ZIPS} per call."}
+    return finder.reverse_index.lookup(zip_codes)
+
+
+# A zipCode / zipCodes field of a JSON (or Python repr) tool output, with its value
+_ZIP_FIELD_PATTERN = re.compile(
+    r"""["'](?:%s)["']\s*:\s*("[^"]*"|'[^']*'|\[[^\]]*\]|\d+)""" % "|".join(ZIP_ARGUMENT_NAMES)
+)
+
+
+def zip_codes_in_tool_outputs(outputs: Iterable[str]) -> List[str]:
+    """
+    The ZIP codes held in zipCode / zipCodes fields of tool outputs, in order of appearance.
+
+    Other five-digit numbers (channel counts, speeds, prices) are not ZIP codes.
+    Outputs cut short by the refine token budget are read up to the cut.
+    """
+    found: List[str] = []
+    for output in outputs:
+        for match in _ZIP_FIELD_PATTERN.finditer(output or ""):
+            value = match.group(1)
+            if value.isdigit():
+                # JSON numbers lose leading zeros (7030 is 07030)
+                found.append(value.zfill(5) if len(value) >= 3 else value)
+            else:
+                found.extend(re.findall(r"\b\d{5}\b", value))
+    return list(dict.fromkeys(found))
+
+
+def label_zip_codes(query: str = "", tool_outputs: Iterable[str] = (), limit: int = 200) -> Dict[str, str]:
+    """
+    Map the known ZIP codes of a turn to 'City, County, ST' labels.
+
+    Args:
+        query: The user's query; its five-digit numbers that are known ZIP codes count.
+        tool_outputs: Tool outputs; only the values of their zipCode / zipCodes fields count.
+        limit: Maximum number of ZIP codes to label.
+
+    Returns:
+        Dictionary of ZIP code -> label, the query's first, in order of appearance.
+    """
+    finder = get_shared_zip_finder() if query or tool_outputs else None
+    if not finder:
+        return {}
+    index = finder.reverse_index
+    candidates = index.find_known_zipcodes(query, limit=limit) + zip_codes_in_tool_outputs(tool_outputs)
+    known = [z for z in dict.fromkeys(candidates) if z in index][:limit]
+    return {z: index.label(z) for z in known}
+
+
+zip_code_location_lookup_tool = StructuredTool(
+    name="zip_code_location_lookup",
+    description=(
+        "Look up the city, county, state and state FIPS code for a batch of ZIP codes using "
+        "Telogical's local geo data (no GraphQL call needed). Use it to name the places behind ZIP codes "
+        "given by the user or returned in query results. Accepts hundreds of ZIP codes in one call. "
+        "Example input: {'zip_codes': ['73069', '60601']}"
+    ),
+    func=lookup_zip_code_locations,
+    args_schema=ZipCodeLocationLookupInput
+)
+
+
+# ------------------------------------------------------------------------------
+# --- Tool 2c: zip_set_algebra (state/county/footprint ZIP code sets) ---
+# ------------------------------------------------------------------------------
+
+DEFAULT_ZIP_SET_MAX_ZIPS = 100
+
+
+class ZipSetSpec(BaseModel):
+    """One ZIP code set: the union of the given states, counties and ZIP codes."""
+    label: Optional[str] = Field(
+        default=None,
+        description="Optional name for the set, e.g. 'Provider X footprint'."
+    )
+    states: List[str] = Field(
+        default_factory=list,
+        description="State names or abbreviations, e.g. ['OK', 'Texas']."
+    )
+    counties: List[str] = Field(
+        default_factory=list,
+        description="Counties as 'County, ST', e.g. ['Cleveland County, OK', 'Jefferson Parish, LA']. "
+                    "The state may be omitted only if the county name is unique."
+    )
+    zip_codes: List[str] = Field(
+        default_factory=list,
+        description="Explicit ZIP codes, e.g. a list returned by a GraphQL query."
+    )
+
+    @field_validator('zip_codes', mode='before')
+    @classmethod
+    def coerce_zip_codes(cls, zip_codes):
+        """Accept integer ZIP codes."""
+        if isinstance(zip_codes, (str, int)):
+            zip_codes = [zip_codes]
+        return [str(z) for z in zip_codes or []]
+
+
+class ZipSetAlgebraInput(BaseModel):
+    """Input schema for the ZIP code set algebra tool."""
+    sets: List[ZipSetSpec] = Field(
+        ...,
+        description="The ZIP code sets to combine, in order."
+    )
+    operation: Literal["union", "intersection", "difference", "count"] = Field(
+        default="intersection",
+        description="'union', 'intersection', 'difference' (first set minus all the others) "
+                    "or 'count' (size of each set, no combination)."
+    )
+    max_zip_codes: int = Field(
+        default=DEFAULT_ZIP_SET_MAX_ZIPS,
+        description="Maximum number of ZIP codes to list in the result (0 for counts only). "
+                    "The count is always exact."
+    )
+
+
+def _resolve_zip_set(index: ZipSetIndex, spec: ZipSetSpec, not_found: Dict[str, List[str]]):
+    """Build the bitset of a ZipSetSpec, recording the members that could not be resolved."""
+    parts = []
+    for state in spec.states:
+        bits = index.state(state)
+        if bits is None:
+            not_found["states"].append(state)
+        else:
+            parts.append(bits)
+    for county in spec.counties:
+        name, _, state = county.rpartition(",")
+        if not name:
+            name, state = state, ""
+        bits = index.county(name, state.strip() or None)
+        if bits is None:
+            states = index.county_states(name)
+            if not state.strip() and len(states) > 1:
+                not_found["counties"].append(f"{county} (ambiguous, in {', '.join(states)}; add the state)")
+            else:
+                not_found["counties"].append(county)
+        else:
+            parts.append(bits)
+    if spec.zip_codes:
+        bits, unknown = index.zipcodes(spec.zip_codes)
+        parts.append(bits)
+        not_found["zip_codes"].extend(unknown)
+    return ZipSetIndex.combine("union", parts) if parts else index.empty()
+
+
+def zip_set_algebra(sets: List[ZipSetSpec],
+                    operation: str = "intersection",
+                    max_zip_codes: int = DEFAULT_ZIP_SET_MAX_ZIPS) -> Dict[str, Any]:
+    """
+    Combine state, county and explicit ZIP code sets with union, intersection or difference.
+
+    Args:
+        sets: The sets to combine, in order.
+        operation: 'union', 'intersection', 'difference' or 'count'.
+        max_zip_codes: Maximum number of ZIP codes to list in the result.
+
+    Returns:
+        Dictionary with the exact 'count', up to max_zip_codes 'zip_codes', per-state
+        counts, the size of each input set and anything that could not be resolved.
+    """
+    finder = get_shared_zip_finder()
+    if not finder:
+        return {"error": "ZipCodeFinder is not initialized. Check CSV path and format."}
+    if not sets:
+        return {"error": "Provide at least one set."}
+
+    index = finder.zip_sets
+    not_found: Dict[str, List[str]] = {"states": [], "counties": [], "zip_codes": []}
+    bitsets = []
+    set_counts = []
+    for i, spec in enumerate(sets):
+        if isinstance(spec, dict):
+            spec = ZipSetSpec(**spec)
+        bits = _resolve_zip_set(index, spec, not_found)
+        bitsets.append(bits)
+        set_counts.append({"label": spec.label or f"set_{i + 1}", "count": index.count(bits)})
+
+    result: Dict[str, Any] = {"operation": operation, "sets": set_counts}
+    if operation == "count":
+        bits = ZipSetIndex.combine("union", bitsets)
+        result["count"] = index.count(bits)
+        result["note"] = "'count' is the size of the union of all sets."
+    else:
+        try:
+            bits = ZipSetIndex.combine(operation, bitsets)
+        except ValueError as e:
+            return {"error": str(e)}
+        result["count"] = index.count(bits)
+        max_zip_codes = max(0, max_zip_codes)
+        if max_zip_codes:
+            result["zip_codes"] = index.to_zipcodes(bits, limit=max_zip_codes)
+            result["truncated"] = result["count"] > max_zip_codes
+    result["by_state"] = index.count_by_state(bits)
+    if any(not_found.values()):
+        result["not_found"] = {key: values for key, values in not_found.items() if values}
+    return result
+
+
+zip_set_algebra_tool = StructuredTool(
+    name="zip_set_algebra",
+    description=(
+        "Fast set algebra over ZIP codes of states, counties and explicit ZIP code lists, using Telogical's "
+        "local geo data. Use it for footprint questions instead of comparing long lists yourself, e.g. "
+        "'which ZIP codes in Cleveland County, OK are in this provider's footprint' (intersection), "
+        "'which counties of the footprint are outside Texas' (difference) or 'how many ZIP codes does "
+        "this footprint cover' (count). Each set is the union of its states, counties ('County, ST') and "
+        "zip_codes. Returns exact counts, a per-state breakdown and up to max_zip_codes ZIP codes. "
+        "Example input: {'sets': [{'counties': ['Cleveland County, OK']}, {'label': 'footprint', "
+        "'zip_codes': ['73069', '73071', '73102']}], 'operation': 'intersection'}"
+    ),
+    func=zip_set_algebra,
+    args_schema=ZipSetAlgebraInput
+)
+
+
 # ---------------------------------------------------------------------------
 # Tool 2: GraphQL Query Tool (Parallel Execution)
 # ---------------------------------------------------------------------------
@@ -640,7 +1233,10 @@ class ParallelGraphQLExecutor:
         endpoint: Optional[str] = None,
         auth_token: Optional[str] = None,
         locale: Optional[str] = None,
-        timeout: int = DEFAULT_TIMEOUT
+        timeout: int = DEFAULT_TIMEOUT,
+        hedger: Optional[Hedger] = None,
+        max_concurrency: int = GRAPHQL_MAX_CONCURRENCY,
+        validate_zipcodes: bool = GRAPHQL_VALIDATE_ZIPCODES
     ):
         """
         Initialize the GraphQL executor with configuration options.
@@ -650,11 +1246,19 @@ class ParallelGraphQLExecutor:
             auth_token: Authorization token for the GraphQL API. Defaults to environment variable.
             locale: Locale setting for the API. Defaults to environment variable.
             timeout: Timeout in seconds for each GraphQL request. Defaults to 30 seconds.
+            hedger: Sends duplicate requests for slow read-only queries (see hedging.py).
+                Defaults to the process-wide hedger, enabled with GRAPHQL_HEDGING.
+            max_concurrency: Maximum number of requests in flight per call.
+            validate_zipcodes: Reject queries with ZIP code arguments unknown to the geo data
+                without sending them.
         """
         self.endpoint = endpoint or DEFAULT_GRAPHQL_ENDPOINT
         self.auth_token = auth_token or DEFAULT_AUTH_TOKEN
         self.locale = locale or DEFAULT_LOCALE
         self.timeout = timeout
+        self.hedger = hedger or shared_hedger
+        self.max_concurrency = max(1, max_concurrency)
+        self.validate_zipcodes = validate_zipcodes
 
         # Basic configuration validation
         if self.endpoint == "YOUR_GRAPHQL_ENDPOINT_HERE":
@@ -684,12 +1288,26 @@ class ParallelGraphQLExecutor:
 
         query_id = query_item.query_id or "unnamed_query"
 
+        # Never wait past the request's deadline (see deadline.py)
+        timeout = stage_timeout(cap=self.timeout)
+        if timeout < self.timeout:
+            if timeout <= 0:
+                deadline_stats.exceeded("graphql")
+                log.warning(f"Query {query_id} not sent, the request deadline has passed")
+                return {
+                    "query_id": query_id,
+                    "status": "error",
+                    "error": "Deadline exceeded",
+                    "details": "The request's time budget ran out before the query was sent. Answer with the data you have."
+                }
+            deadline_stats.shortened("graphql")
+
         try:
             async with session.post(
                 self.endpoint,
                 headers=headers,
                 json=payload,
-                timeout=self.timeout
+                timeout=timeout
             ) as response:
                 if response.status == 200:
                     result = await response.json()
@@ -714,7 +1332,7 @@ class ParallelGraphQLExecutor:
                 "query_id": query_id,
                 "status": "error",
                 "error": "Timeout",
-                "details": f"The query execution timed out after {self.timeout} seconds."
+                "details": f"The query execution timed out after {timeout:g} seconds."
             }
         except aiohttp.ClientError as e:
             log.error(f"Query {query_id} failed due to a client error: {str(e)}")
@@ -733,35 +1351,182 @@ class ParallelGraphQLExecutor:
                 "details": str(e)
             }
 
-    async def execute_queries_async(self, queries: List[GraphQLQuery]) -> Dict[str, Any]:
+    def _check_zipcodes(self, query_item: GraphQLQuery) -> Optional[Dict[str, Any]]:
+        """
+        Check the zipCodes / zipCode arguments of a query against geo-data.csv.
+
+        Comma-separated strings ("73034,73102") are checked item by item; variables,
+        variable declarations and field aliases are ignored.
+
+        Returns:
+            None if the query may be sent, otherwise an error result listing the unknown
+            ZIP codes with valid ones from the same city or county as suggestions.
+        """
+        if not self.validate_zipcodes:
+            return None
+        zipcodes = [z for name in ZIP_ARGUMENT_NAMES for z in argument_values(query_item.query, name)]
+        if not zipcodes:
+            return None
+        finder = get_shared_zip_finder()
+        if finder is None or not len(finder.reverse_index):
+            return None  # no geo data to check against
+        index = finder.reverse_index
+        invalid = list(dict.fromkeys(
+            z for z in zipcodes if not re.fullmatch(r"\d{5}(-\d{4})?", z) or z not in index
+        ))
+        _count_zip_validation(rejected=bool(invalid), invalid=len(invalid))
+        if not invalid:
+            return None
+        log.info(f"Query {query_item.query_id} rejected, unknown ZIP codes: {invalid[:10]}")
+        return {
+            "query_id": query_item.query_id or "unnamed_query",
+            "status": "error",
+            "error": "Unknown ZIP codes",
+            "details": (
+                f"{', '.join(invalid[:20])}{' ...' if len(invalid) > 20 else ''} "
+                "are not valid ZIP codes in Telogical's geo data, so the query was not sent. "
+                "Replace them (see 'suggestions') or remove them and run the query again."
+            ),
+            "invalid_zipcodes": invalid,
+            "suggestions": {
+                z: index.suggest(z, limit=MAX_ZIP_SUGGESTIONS)
+                for z in invalid[:20] if re.fullmatch(r"\d{5}(-\d{4})?", z)
+            },
+        }
+
+    async def _send(self, session: aiohttp.ClientSession, query_item: GraphQLQuery, limit: asyncio.Semaphore) -> Dict[str, Any]:
+        """
+        _execute_single_query, hedged if enabled; every attempt holds a slot of the concurrency limit.
+
+        The first attempt's slot is taken before the hedger starts timing, and a hedge
+        is only sent when a slot is free, so waiting for the limit neither counts as
+        latency nor triggers hedges.
+        """
+        attempts = 0
+
+        async def attempt() -> Dict[str, Any]:
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                return await self._execute_single_query(session, query_item)
+            async with limit:
+                return await self._execute_single_query(session, query_item)
+
+        async with limit:
+            return await self.hedger.run(query_item.query, attempt, lambda result: result.get("status") == "success",
+                                         can_hedge=lambda: not limit.locked())
+
+    async def _timed_query(self,
+                           session: aiohttp.ClientSession,
+                           index: int,
+                           query_item: GraphQLQuery,
+                           limit: asyncio.Semaphore) -> Tuple[int, Dict[str, Any], float]:
+        """
+        Run one query of the batch, with its position in the batch and its latency in seconds.
+
+        Queries estimated to be too expensive (e.g. hundreds of zipCodes) are split
+        into shards that run in parallel and are merged back into one result.
+        """
+        started = time.perf_counter()
+        rejection = self._check_zipcodes(query_item)
+        if rejection is not None:
+            return index, rejection, time.perf_counter() - started
+        shards = plan_shards(query_item.query)
+        if len(shards) == 1:
+            result = await self._send(session, query_item, limit)
+        else:
+            query_id = query_item.query_id or "unnamed_query"
+            shard_results = await asyncio.gather(*(
+                self._send(session, GraphQLQuery(query=shard, query_id=f"{query_id}#{i + 1}"), limit)
+                for i, shard in enumerate(shards)
+            ))
+            result = merge_results(query_id, list(shard_results))
+        return index, result, time.perf_counter() - started
+
+    async def execute_queries_async(self,
+                                    queries: List[GraphQLQuery],
+                                    on_result: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """
         Asynchronously execute multiple GraphQL queries in parallel.
 
+        Results are handled as they complete, so on_result can report progress
+        while slower queries are still running.
+
         Args:
             queries: List of GraphQLQuery objects to execute.
+            on_result: Called with a progress event (query_id, status, rows, latency_ms,
+                completed, total) for every finished query, in completion order.
 
         Returns:
-            Dictionary where keys are the query_ids and values are the results of each query.
+            Dictionary where keys are the query_ids and values are the results of each query,
+            in the order of the queries.
         """
         if not queries:
             return {"error": "No queries provided"}
         if self.endpoint == "YOUR_GRAPHQL_ENDPOINT_HERE":
             return {"error": "GraphQL endpoint not configured. Please set the TELOGICAL_GRAPHQL_ENDPOINT environment variable or pass it during tool initialization."}
 
+        results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+        limit = asyncio.Semaphore(self.max_concurrency)
         async with aiohttp.ClientSession() as session:
-            tasks = [self._execute_single_query(session, query) for query in queries]
-            results = await asyncio.gather(*tasks)
+            tasks = [self._timed_query(session, i, query, limit) for i, query in enumerate(queries)]
+            for completed, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+                index, result, latency = await next_done
+                results[index] = result
+                if on_result is not None:
+                    on_result(_progress_event(result, latency, completed, len(queries)))
 
         # Structure the output by query_id
         structured_results = {result.get("query_id"): result for result in results}
         return structured_results
 
-    def execute_queries(self, queries: List[Union[GraphQLQuery, str, Dict[str, Any]]]) -> Dict[str, Any]:
+    def _store_results(self,
+                       structured_results: Dict[str, Any],
+                       queries: List[GraphQLQuery],
+                       thread_id: str) -> Dict[str, Any]:
+        """
+        Keep every successful result in the result store and hand out handles.
+
+        Results over RESULT_HANDLE_MIN_CHARS are replaced by their handle and a
+        preview, so the full data does not have to travel through the context.
+
+        Args:
+            structured_results: Results keyed by query_id, as returned by execute_queries_async.
+            queries: The executed queries.
+            thread_id: Conversation thread the results belong to.
+
+        Returns:
+            The results with 'result_handle' added and large 'result' values replaced.
+        """
+        query_text = {query.query_id: query.query for query in queries}
+        for query_id, entry in structured_results.items():
+            if not isinstance(entry, dict) or entry.get("status") != "success" or entry.get("result") is None:
+                continue
+            result = entry["result"]
+            size = len(json.dumps(result, default=str))
+            entry["result_handle"] = shared_result_store.put(
+                thread_id, result, size_bytes=size, query_id=query_id, query=query_text.get(query_id)
+            )
+            if size > RESULT_HANDLE_MIN_CHARS:
+                del entry["result"]
+                entry["result_size_chars"] = size
+                entry["result_preview"] = make_preview(result)
+                entry["list_paths"] = dict(find_list_paths(result))
+                entry["note"] = (
+                    "The full result is stored server-side. Pass result_handle (and a path from list_paths) "
+                    "to math_counting_tool to count, or to stored_result_reader to read rows."
+                )
+        return structured_results
+
+    def execute_queries(self,
+                        queries: List[Union[GraphQLQuery, str, Dict[str, Any]]],
+                        config: RunnableConfig = None) -> Dict[str, Any]:
         """
         Synchronous wrapper for the asynchronous execution function.
 
         Args:
             queries: List of GraphQL queries to execute (can be strings, dicts, or GraphQLQuery objects).
+            config: Run configuration, injected by LangChain; its thread_id scopes the stored results.
 
         Returns:
             Dictionary where keys are the query_ids and values are the results of each query.
@@ -780,7 +1545,83 @@ class ParallelGraphQLExecutor:
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
 
-        return loop.run_until_complete(self.execute_queries_async(normalized_queries))
+        results = loop.run_until_complete(
+            self.execute_queries_async(normalized_queries, on_result=graphql_progress_writer())
+        )
+        if isinstance(results.get("error"), str):
+            return results
+        # Stored results keep the full data; only what goes back to the LLM is deduplicated
+        results = self._store_results(results, normalized_queries, thread_id_from_config(config))
+        if GRAPHQL_DEDUP_ENTITIES:
+            dedup = dedup_query_results(results)
+            if dedup is not None:
+                results["_entities"] = dedup["entities"]
+                results["_dedup"] = dedup["stats"]
+        return results
+
+_zip_validation_stats = {"queries_checked": 0, "queries_rejected": 0, "invalid_zipcodes": 0}
+_zip_validation_lock = threading.Lock()
+
+
+def _count_zip_validation(rejected: bool, invalid: int) -> None:
+    with _zip_validation_lock:
+        _zip_validation_stats["queries_checked"] += 1
+        _zip_validation_stats["queries_rejected"] += int(rejected)
+        _zip_validation_stats["invalid_zipcodes"] += invalid
+
+
+def agent_metrics() -> Dict[str, Dict[str, Any]]:
+    """Counters of the runtime optimizations, by component (served at /admin/metrics)."""
+    with _zip_validation_lock:
+        zip_validation = dict(_zip_validation_stats)
+    return {
+        "graphql_hedging": shared_hedger.stats(),
+        "graphql_zip_validation": zip_validation,
+        "contextualizer_fast_path": get_query_classifier().stats(),
+        "refine_tool_outputs": selection_metrics(),
+        "prompt_cache": prompt_cache_stats.stats(),
+        "answer_cache": answer_cache.stats(),
+        "request_deadline": deadline_stats.stats(),
+    }
+
+
+def _progress_event(result: Dict[str, Any], latency: float, completed: int, total: int) -> Dict[str, Any]:
+    """Progress event for one finished query."""
+    data = result.get("result")
+    list_paths = find_list_paths(data, limit=1) if data is not None else []
+    return {
+        "type": "graphql_query_completed",
+        "query_id": result.get("query_id"),
+        "status": result.get("status"),
+        "error": result.get("error"),
+        "rows": list_paths[0][1] if list_paths else (0 if data is None else 1),
+        "latency_ms": round(latency * 1000, 1),
+        "completed": completed,
+        "total": total,
+    }
+
+
+def graphql_progress_writer() -> Optional[Callable[[Dict[str, Any]], None]]:
+    """
+    Sends progress events as LangGraph 'custom' stream events, which message_generator
+    forwards to the client. None when not running inside a graph.
+
+    Must be called on the tool's own thread (it reads the run context), not from
+    the event loop that executes the queries.
+    """
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return None
+
+    def emit(event: Dict[str, Any]) -> None:
+        try:
+            writer(ChatMessage(role="custom", content=[event]))
+        except Exception as e:
+            log.debug(f"Could not stream GraphQL progress event: {e}")
+
+    return emit
+
 
 # Create the LangChain StructuredTool instance
 parallel_graphql_executor = StructuredTool(
@@ -791,7 +1632,11 @@ parallel_graphql_executor = StructuredTool(
         "Input is a list of GraphQL queries, which can be provided as strings or objects "
         "with 'query' and 'query_id' fields. The output is a dictionary keyed by the query "
         "identifiers, containing the execution status and results. Variables should be "
-        "hardcoded directly in your query strings."
+        "hardcoded directly in your query strings. Every result gets a 'result_handle'; large results "
+        "are returned as a preview only, and the handle can be passed to math_counting_tool and "
+        "stored_result_reader, also in later turns of the conversation, instead of re-querying. "
+        "Entities repeated across results (same packageFactId etc.) appear once in '_entities' and "
+        "as {'$ref': name} everywhere they occur; '_dedup' reports the bytes and tokens saved."
     ),
     func=ParallelGraphQLExecutor().execute_queries,
     args_schema=ParallelGraphQLExecutorInput
@@ -2993,6 +3838,33 @@ graphql_introspection_agent_tool = StructuredTool(
 # Define Input Schema
 class DMACodeLookupInput(BaseModel):
     dma_codes: List[str] = Field(..., description="List of DMA codes to look up.")
+    return_all_columns: bool = Field(
+        default=False,
+        description="Return the DMA, LongDMA and NielsenDMA names for each code instead of just the DMA name."
+    )
+
+    @field_validator('dma_codes', mode='before')
+    @classmethod
+    def coerce_dma_codes(cls, dma_codes):
+        """Accept a single code and integer codes."""
+        if isinstance(dma_codes, (str, int)):
+            dma_codes = [dma_codes]
+        return [str(code) for code in dma_codes]
+
+
+class DMANameSearchInput(BaseModel):
+    names: List[str] = Field(
+        ...,
+        description="Market or city names to find DMA codes for, e.g. ['Oklahoma City', 'Dallas-Ft. Worth']."
+    )
+    limit: int = Field(default=3, description="Maximum number of DMAs to return per name.")
+
+    @field_validator('names', mode='before')
+    @classmethod
+    def coerce_names(cls, names):
+        """Accept a single name."""
+        return [names] if isinstance(names, str) else names
+
     
 # Define the Tool
 class DMACodeLookupTool:
@@ -3004,11 +3876,41 @@ class DMACodeLookupTool:
             csv_path: Path to the CSV file containing DMA codes and descriptions.
         """
         self.csv_path = csv_path
-        # Load the CSV data
+        self._index: Optional[DMAIndex] = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self) -> DMAIndex:
+        """The DMA index, loaded on first use."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build_index()
+        return self._index
+
+    def _build_index(self) -> DMAIndex:
+        df = load_table(self.csv_path, self._prepare_data, version=DMA_DATA_VERSION)
+        return DMAIndex.from_dataframe(df)
+
+    def reload(self) -> int:
+        """
+        Re-read the DMA CSV and swap the new index in.
+
+        Returns:
+            Number of DMA codes loaded.
+        """
+        index = self._build_index()
+        self._index = index
+        return len(index)
+
+    @staticmethod
+    def _prepare_data(csv_path: str) -> pd.DataFrame:
+        """Parse the DMA CSV."""
         try:
-            self.df = pd.read_csv(csv_path)
+            df = pd.read_csv(csv_path)
             # Convert DMACode to string to ensure matching works properly
-            self.df['DMACode'] = self.df['DMACode'].astype(str)
+            df['DMACode'] = df['DMACode'].astype(str)
+            return df
         except Exception as e:
             raise ValueError(f"Error loading DMA code CSV file: {e}")
     
@@ -3024,54 +3926,185 @@ class DMACodeLookupTool:
             Dictionary mapping DMA codes to their descriptions.
         """
         try:
-            # Convert all codes to strings to ensure matching works properly
-            dma_codes = [str(code) for code in dma_codes]
-            
+            return self.index.lookup(dma_codes, return_all_columns=return_all_columns)
+        except Exception as e:
+            return {"error": str(e)}
+
+    def search_dma_names(self, names: List[str], limit: int = 3) -> Dict[str, Any]:
+        """
+        Find DMA codes by market or city name, tolerating typos.
+
+        Args:
+            names: Market or city names.
+            limit: Maximum number of DMAs to return per name.
+
+        Returns:
+            Dictionary with 'results' (name -> list of matching DMAs, best first) and 'not_found'.
+        """
+        try:
+            index = self.index
             results = {}
             not_found = []
-            
-            for code in dma_codes:
-                # Find the matching row for this code
-                matched_rows = self.df[self.df['DMACode'] == code]
-                
-                if not matched_rows.empty:
-                    row = matched_rows.iloc[0]
-                    results[code] = row['DMA']
-
-                else:
-                    not_found.append(code)
-                    results[code] = None
-            
-            response = {
-                "results": results,
-                "not_found": not_found
-            }
-            
-            return response
+            for name in names:
+                matches = index.search(name, limit=max(1, limit))
+                results[name] = matches
+                if not matches:
+                    not_found.append(name)
+            return {"results": results, "not_found": not_found}
         except Exception as e:
             return {"error": str(e)}
 
+# Shared instance; the CSV is read on first lookup (or by warm_up_reference_data)
+shared_dma_lookup = DMACodeLookupTool()
+
 # Create the LangChain Tool
 dma_code_lookup_tool = StructuredTool(
     name="DMA_Code_Lookup",
-    func=DMACodeLookupTool().lookup_dma_codes,
-    description="Converts DMA codes to their corresponding names and descriptions by looking them up in a CSV file.",
+    func=shared_dma_lookup.lookup_dma_codes,
+    description=(
+        "Converts DMA codes to their corresponding names and descriptions by looking them up in a CSV file. "
+        "Set return_all_columns to also get the LongDMA and NielsenDMA names."
+    ),
     args_schema=DMACodeLookupInput
 )
 
+dma_name_search_tool = StructuredTool(
+    name="DMA_Name_Search",
+    func=shared_dma_lookup.search_dma_names,
+    description=(
+        "Finds DMA (Designated Market Area) codes from market or city names, tolerating typos and "
+        "abbreviations, e.g. 'Oklahoma City' -> 650, 'Dallas-Ft. Worth' -> 623. Use it instead of a GraphQL "
+        "query when you need the DMA code of a market. A city that is part of a multi-city market "
+        "(e.g. 'Auburn' in 'Portland-Auburn, ME') also matches. "
+        "Example input: {'names': ['Oklahoma City', 'Tulsa, OK']}"
+    ),
+    args_schema=DMANameSearchInput
+)
+
+
+def warm_up_reference_data() -> None:
+    """
+    Load the geo and DMA reference data and build every index ahead of the first request.
+
+    Safe to call from a background thread; lookups that arrive meanwhile simply
+    wait for (or trigger) the same lazy initialization.
+    """
+    start = time.perf_counter()
+    finder = get_shared_zip_finder()
+    if finder:
+        finder.warm_up()
+    try:
+        shared_dma_lookup.index
+    except ValueError as e:
+        log.error(f"Failed to load DMA data: {e}")
+    log.info(f"Reference data warmed up in {time.perf_counter() - start:.2f}s")
+
+
+# Reference datasets that can be hot-reloaded, by name
+REFERENCE_DATASETS = ("geo", "dma")
+_reload_lock = threading.Lock()
+# Memory held by the last reloaded version of each dataset, for the delta in the next report
+_reference_data_memory: Dict[str, int] = {}
+
+
+def _build_geo() -> Tuple[ZipCodeFinder, int]:
+    finder = ZipCodeFinder(ZIP_CODE_CSV_PATH)
+    finder.warm_up()
+    return finder, len(finder.df)
+
+
+def reload_reference_data(datasets: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Rebuild reference data from the CSVs and swap it in atomically.
+
+    The new ZipCodeFinder (with all of its indexes) or DMA table is built
+    completely before a single reference assignment makes it visible. Lookups
+    already running keep the version they started with. If a build fails the
+    old version stays in place. Reloads are serialized.
+
+    Args:
+        datasets: Any of REFERENCE_DATASETS; all of them if omitted.
+
+    Returns:
+        One report per dataset with 'status', 'rows', 'build_seconds',
+        'memory_bytes' (held by the new version, see deep_sizeof) and
+        'memory_delta_bytes' (against the previously reloaded version, if known).
+    """
+    global _shared_zip_finder
+    reports = []
+    with _reload_lock:
+        for dataset in datasets or REFERENCE_DATASETS:
+            report: Dict[str, Any] = {"dataset": dataset}
+            if dataset not in REFERENCE_DATASETS:
+                report.update(status="error", error=f"Unknown dataset. Use one of {list(REFERENCE_DATASETS)}.")
+                reports.append(report)
+                continue
+
+            start = time.perf_counter()
+            try:
+                if dataset == "geo":
+                    finder, rows = _build_geo()
+                    _shared_zip_finder = finder
+                    memory_bytes = deep_sizeof(finder)
+                else:
+                    rows = shared_dma_lookup.reload()
+                    memory_bytes = deep_sizeof(shared_dma_lookup.index)
+                previous = _reference_data_memory.get(dataset)
+                _reference_data_memory[dataset] = memory_bytes
+                report.update(
+                    status="success",
+                    rows=rows,
+                    build_seconds=round(time.perf_counter() - start, 3),
+                    memory_bytes=memory_bytes,
+                    memory_delta_bytes=memory_bytes - previous if previous is not None else None,
+                )
+                log.info(f"Reloaded reference data '{dataset}': {report}")
+            except Exception as e:
+                log.error(f"Reloading reference data '{dataset}' failed, keeping the current version: {e}")
+                report.update(status="error", error=str(e), build_seconds=round(time.perf_counter() - start, 3))
+            reports.append(report)
+    return reports
+
+
+def watch_reference_data(interval: float) -> FileWatcher:
+    """
+    Start a FileWatcher that hot-reloads geo-data.csv and DMAs.csv when they change.
+
+    Args:
+        interval: Seconds between polls.
+
+    Returns:
+        The running watcher; call stop() on shutdown.
+    """
+    datasets_by_path = {ZIP_CODE_CSV_PATH: "geo", DMA_CSV_PATH: "dma"}
+    return FileWatcher(
+        datasets_by_path,
+        lambda paths: reload_reference_data([datasets_by_path[path] for path in paths]),
+        interval=interval,
+    ).start()
+
 
 # ---------------------------------------------------------------------
 # math_counting_tool: Math Counting Tool
 # ---------------------------------------------------------------------
 # Simplified Input Schema
 class ListCountingToolInput(BaseModel):
-    items: List[Any] = Field(
-        ..., 
-        description="List of items to count or filter (any type)."
+    items: Optional[List[Any]] = Field(
+        None, 
+        description="List of items to count or filter (any type). Omit when passing result_handle."
+    )
+    result_handle: Optional[str] = Field(
+        None,
+        description="Handle of a stored GraphQL result (from parallel_graphql_executor) to count instead of 'items'."
+    )
+    path: Optional[str] = Field(
+        None,
+        description="Dotted path to the list inside the stored result, e.g. 'fetchPackages.packages'. "
+                    "Optional if the result contains a single list."
     )
     operation: str = Field(
         ..., 
-        description="Operation to perform: 'count_all', 'count_unique', or 'count_matching'."
+        description="Operation to perform: 'count_all', 'count_unique', 'count_matching' or 'aggregate'."
     )
     key: Optional[str] = Field(
         None, 
@@ -3081,6 +4114,30 @@ class ListCountingToolInput(BaseModel):
         None,
         description="Value to match when filtering (for 'count_matching' operation)."
     )
+    group_by: Optional[List[str]] = Field(
+        None,
+        description="For 'aggregate': dotted fields to group by, e.g. ['provider.name']."
+    )
+    filters: Optional[List[Dict[str, Any]]] = Field(
+        None,
+        description="For 'aggregate': [{'field': 'price', 'op': 'lte', 'value': 50}], combined with AND. "
+                    f"Ops: {', '.join(FILTER_OPS)}."
+    )
+    metrics: Optional[List[Dict[str, Any]]] = Field(
+        None,
+        description="For 'aggregate': [{'op': 'median', 'field': 'price'}], optional 'as' to name the result. "
+                    f"Ops: {', '.join(METRIC_OPS)}. Defaults to a row count."
+    )
+    unnest: Optional[str] = Field(
+        None,
+        description="For 'aggregate': list field to expand into one row per element first, e.g. 'products'."
+    )
+    sort_by: Optional[str] = Field(
+        None,
+        description="For 'aggregate': metric name (e.g. 'median_price') or group field to sort the groups by."
+    )
+    descending: bool = Field(True, description="For 'aggregate': sort direction.")
+    limit: int = Field(50, description="For 'aggregate': maximum number of groups returned.")
 
 class ListCountingTool:
     def __init__(self):
@@ -3089,23 +4146,45 @@ class ListCountingTool:
     
     def count_items(
         self, 
-        items: List[Any], 
         operation: str, 
+        items: Optional[List[Any]] = None, 
         key: Optional[str] = None,
-        value: Optional[Any] = None
+        value: Optional[Any] = None,
+        result_handle: Optional[str] = None,
+        path: Optional[str] = None,
+        group_by: Optional[List[str]] = None,
+        filters: Optional[List[Dict[str, Any]]] = None,
+        metrics: Optional[List[Dict[str, Any]]] = None,
+        unnest: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        limit: int = 50,
+        config: RunnableConfig = None
     ) -> Dict[str, Any]:
         """
-        Count items in a list, with optional filtering.
+        Count items in a list, with optional filtering, or aggregate them by group.
         
         Args:
+            operation: Type of counting to perform ('count_all', 'count_unique', 'count_matching' or 'aggregate').
             items: List of items to count.
-            operation: Type of counting to perform ('count_all', 'count_unique', or 'count_matching').
             key: For dictionary items, the key to check when filtering.
             value: Value to match when filtering.
+            result_handle: Handle of a stored result to count instead of items.
+            path: Dotted path to the list inside the stored result.
+            group_by, filters, metrics, unnest, sort_by, descending, limit: Arguments of
+                'aggregate', see aggregation.aggregate.
+            config: Run configuration, injected by LangChain, used to find the thread's stored results.
             
         Returns:
             Dictionary containing the count and a simple message.
         """
+        if result_handle:
+            items = load_stored_list(result_handle, path, config)
+            if isinstance(items, dict):
+                return items
+        elif items is None:
+            return {"error": "Provide either 'items' or 'result_handle'."}
+
         try:
             # Count all items (the basic operation)
             if operation == "count_all":
@@ -3132,6 +4211,16 @@ class ListCountingTool:
                     "message": f"There are {unique_count} unique items out of {total_count} total items."
                 }
             
+            # Group-by / filter / aggregate, computed on numpy columns
+            elif operation == "aggregate":
+                result = aggregate(items, metrics=metrics, group_by=group_by, filters=filters,
+                                   unnest_path=unnest, sort_by=sort_by, descending=descending, limit=limit)
+                result["message"] = (
+                    f"{result['matched_rows']} of {result['total_rows']} rows matched, "
+                    f"in {result['group_count']} group(s)."
+                )
+                return result
+
             # Count items matching criteria (filtered counting)
             elif operation == "count_matching":
                 if value is None:
@@ -3163,11 +4252,42 @@ class ListCountingTool:
                 }
                 
             else:
-                return {"error": f"Unknown operation: '{operation}'. Available operations: 'count_all', 'count_unique', 'count_matching'"}
+                return {"error": f"Unknown operation: '{operation}'. Available operations: 'count_all', 'count_unique', 'count_matching', 'aggregate'"}
                 
+        except AggregationError as e:
+            return {"error": f"Invalid aggregation: {e}"}
         except Exception as e:
             return {"error": str(e)}
 
+def load_stored_list(result_handle: str, path: Optional[str], config: Optional[RunnableConfig]) -> Union[List[Any], Dict[str, Any]]:
+    """
+    Get the list at a path inside a stored result.
+
+    Args:
+        result_handle: Handle returned by parallel_graphql_executor.
+        path: Dotted path to the list; may be omitted if the result holds exactly one list.
+        config: Run configuration carrying the thread_id.
+
+    Returns:
+        The list, or a dictionary with an 'error' (and the available list paths) if it can't be resolved.
+    """
+    stored = shared_result_store.get(thread_id_from_config(config), result_handle)
+    if stored is None:
+        return {"error": f"Unknown or expired result handle '{result_handle}'. Re-run the query to get a new one."}
+    list_paths = find_list_paths(stored.data)
+    if path is None:
+        if len(list_paths) != 1:
+            return {"error": "The stored result does not contain exactly one list; pass 'path'.", "list_paths": dict(list_paths)}
+        path = list_paths[0][0]
+    try:
+        value = resolve_path(stored.data, path)
+    except KeyError as e:
+        return {"error": f"Path '{path}' not found in the stored result (missing '{e.args[0]}').", "list_paths": dict(list_paths)}
+    if not isinstance(value, list):
+        return {"error": f"Path '{path}' does not point to a list.", "list_paths": dict(list_paths)}
+    return value
+
+
 # Create the tool instance
 list_counting_tool = ListCountingTool()
 
@@ -3185,7 +4305,99 @@ math_counting_tool = StructuredTool(
         "   - For simple lists: Provide 'value' to match exact items "
         "   - For dictionaries: Use 'key' and 'value' (e.g., key='data', value='unlimited') "
         "   - Works with list fields (e.g., finds plans where 'features' list contains 'international') "
+        "4. 'aggregate': Filters, groups and computes metrics (count, sum, avg, min, max, median, "
+        "   count_distinct, distinct) - use it for questions like 'median price by provider' or "
+        "   'how many packages per zip code have at least 1000 Mbps'. Example: group_by=['provider.name'], "
+        "   filters=[{'field': 'price', 'op': 'lte', 'value': 60}], metrics=[{'op': 'median', 'field': 'price'}], "
+        "   sort_by='median_price'. Use 'unnest' to expand a list field (e.g. 'products') into rows first. "
+        "Instead of pasting a large list into 'items', pass the 'result_handle' of a GraphQL result "
+        "and the 'path' of the list inside it (e.g. path='fetchPackages.packages'). "
     ),
 
     args_schema=ListCountingToolInput
-)
\ No newline at end of file
+)
+
+
+# ---------------------------------------------------------------------
+# stored_result_reader: read stored GraphQL results by handle
+# ---------------------------------------------------------------------
+class StoredResultReaderInput(BaseModel):
+    result_handle: Optional[str] = Field(
+        None,
+        description="Handle of a stored result. Omit to list the stored results of this conversation."
+    )
+    path: Optional[str] = Field(
+        None,
+        description="Dotted path inside the result, e.g. 'fetchPackages.packages' or 'fetchPackages.packages.0'."
+    )
+    offset: int = Field(default=0, description="For lists: index of the first item to return.")
+    limit: int = Field(default=20, description="For lists: maximum number of items to return (at most 100).")
+    fields: Optional[List[str]] = Field(
+        None,
+        description="For lists of objects: only return these keys of each item, e.g. ['packageName', 'price']."
+    )
+
+
+def read_stored_result(result_handle: Optional[str] = None,
+                       path: Optional[str] = None,
+                       offset: int = 0,
+                       limit: int = 20,
+                       fields: Optional[List[str]] = None,
+                       config: RunnableConfig = None) -> Dict[str, Any]:
+    """
+    Read part of a stored result, or list the stored results of the current thread.
+
+    Args:
+        result_handle: Handle of the stored result; None lists all of them.
+        path: Dotted path inside the result.
+        offset: First list item to return.
+        limit: Maximum number of list items to return.
+        fields: Keys to keep from each list item.
+        config: Run configuration, injected by LangChain.
+
+    Returns:
+        Dictionary with the requested slice ('items', 'total') or value.
+    """
+    thread_id = thread_id_from_config(config)
+    if not result_handle:
+        return {"stored_results": shared_result_store.list(thread_id)}
+    stored = shared_result_store.get(thread_id, result_handle)
+    if stored is None:
+        return {"error": f"Unknown or expired result handle '{result_handle}'. Re-run the query to get a new one."}
+    try:
+        value = resolve_path(stored.data, path)
+    except KeyError as e:
+        return {"error": f"Path '{path}' not found (missing '{e.args[0]}').", "list_paths": dict(find_list_paths(stored.data))}
+
+    if not isinstance(value, list):
+        size = len(json.dumps(value, default=str))
+        if size > RESULT_HANDLE_MIN_CHARS:
+            return {"path": path, "value_preview": make_preview(value), "size_chars": size,
+                    "list_paths": dict(find_list_paths(value))}
+        return {"path": path, "value": value}
+
+    offset = max(0, offset)
+    limit = max(1, min(limit, 100))
+    items = value[offset:offset + limit]
+    if fields:
+        items = [{k: item.get(k) for k in fields} if isinstance(item, dict) else item for item in items]
+    return {
+        "path": path,
+        "total": len(value),
+        "offset": offset,
+        "items": items,
+        "has_more": offset + limit < len(value),
+    }
+
+
+stored_result_reader = StructuredTool(
+    name="stored_result_reader",
+    func=read_stored_result,
+    description=(
+        "Reads GraphQL results stored server-side by parallel_graphql_executor, using their 'result_handle'. "
+        "Use it to page through large results (path, offset, limit) and to pick only the fields you need, "
+        "instead of re-running queries. Results stay available for later questions in the same conversation; "
+        "call it without a handle to list them."
+    ),
+    args_schema=StoredResultReaderInput
+)
@@ -114,6 +114,12 @@ class Settings(BaseSettings):
         default_factory=dict, description="Map of model names to Azure deployment IDs"
     )
 
+    # Reference data (data/geo-data.csv, data/DMAs.csv) is loaded lazily; warm it up in the
+    # background at startup so the first location question doesn't pay for it.
+    REFERENCE_DATA_WARMUP: bool = True
+    # Seconds between checks for changed reference CSVs, which are then hot-reloaded (0 disables)
+    REFERENCE_DATA_WATCH_INTERVAL: float = 0
+
     def model_post_init(self, __context: Any) -> None:
         api_keys = {
             Provider.OPENAI: self.OPENAI_API_KEY,
@@ -1,11 +1,15 @@
 from backend.schema.models import AllModelEnum
 from backend.schema.schema import (
     AgentInfo,
+    AgentMetricsResponse,
     ChatHistory,
     ChatHistoryInput,
     ChatMessage,
     Feedback,
     FeedbackResponse,
+    ReferenceDataReloadInput,
+    ReferenceDataReloadReport,
+    ReferenceDataReloadResponse,
     ServiceMetadata,
     StreamInput,
     UserInput,
@@ -13,6 +17,7 @@ from backend.schema.schema import (
 
 __all__ = [
     "AgentInfo",
+    "AgentMetricsResponse",
     "AllModelEnum",
     "UserInput",
     "ChatMessage",
@@ -22,4 +27,7 @@ __all__ = [
     "FeedbackResponse",
     "ChatHistoryInput",
     "ChatHistory",
+    "ReferenceDataReloadInput",
+    "ReferenceDataReloadReport",
+    "ReferenceDataReloadResponse",
 ]
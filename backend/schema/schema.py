@@ -61,9 +61,12 @@ class UserInput(BaseModel):
         examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
     )
     agent_config: dict[str, Any] = Field(
-        description="Additional configuration to pass through to the agent",
+        description=(
+            "Additional configuration to pass through to the agent. 'timeout_seconds' sets the "
+            "request's time budget (default: REQUEST_DEADLINE_SECONDS)"
+        ),
         default={},
-        examples=[{"spicy_level": 0.8}],
+        examples=[{"spicy_level": 0.8}, {"timeout_seconds": 45}],
     )
 
 
@@ -173,3 +176,40 @@ class ChatHistoryInput(BaseModel):
 
 class ChatHistory(BaseModel):
     messages: list[ChatMessage]
+
+
+class ReferenceDataReloadInput(BaseModel):
+    """Which reference datasets to reload."""
+
+    datasets: list[Literal["geo", "dma"]] = Field(
+        description="Datasets to reload: 'geo' (geo-data.csv) and/or 'dma' (DMAs.csv).",
+        default=["geo", "dma"],
+    )
+
+
+class ReferenceDataReloadReport(BaseModel):
+    """Outcome of reloading one reference dataset."""
+
+    dataset: str = Field(description="Reloaded dataset.", examples=["geo"])
+    status: Literal["success", "error"]
+    rows: int | None = Field(description="Rows in the new version.", default=None)
+    build_seconds: float | None = Field(description="Time spent building the new version.", default=None)
+    memory_bytes: int | None = Field(description="Memory held by the new version.", default=None)
+    memory_delta_bytes: int | None = Field(
+        description="Change in memory against the previously reloaded version, if known.",
+        default=None,
+    )
+    error: str | None = None
+
+
+class ReferenceDataReloadResponse(BaseModel):
+    reports: list[ReferenceDataReloadReport]
+
+
+class AgentMetricsResponse(BaseModel):
+    """Counters of the agent's runtime optimizations, per component."""
+
+    metrics: dict[str, dict[str, Any]] = Field(
+        description="Metrics by component, e.g. 'graphql_hedging'.",
+        examples=[{"graphql_hedging": {"requests": 120, "hedged": 4, "hedge_wins": 3}}],
+    )
@@ -1,3 +1,4 @@
+import asyncio
 import inspect
 import json
 import logging
@@ -18,14 +19,25 @@ from langgraph.types import Command, Interrupt
 from langsmith import Client as LangsmithClient
 
 from backend.agents.agents import DEFAULT_AGENT, get_agent, get_all_agent_info
+from backend.agents.dynamic_agents.deadline import DEADLINE_KEY, TIMEOUT_SECONDS_KEY, request_deadline
+from backend.agents.dynamic_agents.tools import (
+    agent_metrics,
+    reload_reference_data,
+    warm_up_reference_data,
+    watch_reference_data,
+)
 from backend.core import settings
 from backend.memory import initialize_database, initialize_store
 from backend.schema.schema import (
+    AgentMetricsResponse,
     ChatHistory,
     ChatHistoryInput,
     ChatMessage,
     Feedback,
     FeedbackResponse,
+    ReferenceDataReloadInput,
+    ReferenceDataReloadReport,
+    ReferenceDataReloadResponse,
     ServiceMetadata,
     StreamInput,
     UserInput,
@@ -59,6 +71,13 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     Configurable lifespan that initializes the appropriate database checkpointer and store
     based on settings.
     """
+    warm_up_task = None
+    if settings.REFERENCE_DATA_WARMUP:
+        # Build the geo/DMA indexes off the event loop; requests are served meanwhile
+        warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up_reference_data))
+    watcher = None
+    if settings.REFERENCE_DATA_WATCH_INTERVAL > 0:
+        watcher = watch_reference_data(settings.REFERENCE_DATA_WATCH_INTERVAL)
     try:
         # Initialize both checkpointer (for short-term memory) and store (for long-term memory)
         async with initialize_database() as saver, initialize_store() as store:
@@ -81,6 +100,11 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     except Exception as e:
         logger.error(f"Error during database/store initialization: {e}")
         raise
+    finally:
+        if warm_up_task and not warm_up_task.done():
+            warm_up_task.cancel()
+        if watcher:
+            watcher.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -110,6 +134,14 @@ async def _handle_input(user_input: UserInput, agent: Pregel) -> tuple[dict[str,
 
     configurable = {"thread_id": thread_id, "model": user_input.model, "user_id": user_id}
 
+    # End-to-end deadline of the run, read by the agent's nodes and tools; clients may set their own budget
+    try:
+        deadline = request_deadline((user_input.agent_config or {}).pop(TIMEOUT_SECONDS_KEY, None))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if deadline is not None:
+        configurable[DEADLINE_KEY] = deadline
+
     if user_input.agent_config:
         # Extract message_history if provided, as we'll handle it specially
         message_history = None
@@ -392,6 +424,28 @@ async def feedback(feedback: Feedback) -> FeedbackResponse:
     return FeedbackResponse()
 
 
+@router.post("/admin/reload-reference-data")
+async def reload_reference_data_endpoint(
+    input: ReferenceDataReloadInput = ReferenceDataReloadInput(),
+) -> ReferenceDataReloadResponse:
+    """
+    Hot-reload geo-data.csv and/or DMAs.csv.
+
+    The new indexes are built in a worker thread and swapped in atomically;
+    requests in flight finish on the version they started with.
+    """
+    reports = await asyncio.to_thread(reload_reference_data, list(input.datasets))
+    return ReferenceDataReloadResponse(
+        reports=[ReferenceDataReloadReport(**report) for report in reports]
+    )
+
+
+@router.get("/admin/metrics")
+async def metrics_endpoint() -> AgentMetricsResponse:
+    """Counters of the agent's runtime optimizations, e.g. GraphQL request hedging."""
+    return AgentMetricsResponse(metrics=agent_metrics())
+
+
 @router.post("/history")
 async def history(input: ChatHistoryInput) -> ChatHistory:
     """
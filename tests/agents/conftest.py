@@ -0,0 +1,12 @@
+import os
+
+# backend.agents imports the whole agent stack, which builds Azure/OpenAI clients at
+# import time. Placeholder credentials are enough for the tests, which never call them.
+for _key, _value in {
+    "OPENAI_API_KEY": "sk-fake-openai-key",
+    "TELOGICAL_API_KEY_GPT": "fake-telogical-key",
+    "TELOGICAL_MODEL_ENDPOINT_GPT": "https://example.openai.azure.com",
+    "TELOGICAL_MODEL_DEPLOYMENT_GPT": "fake-deployment",
+    "TELOGICAL_MODEL_API_VERSION_GPT": "2024-02-01",
+}.items():
+    os.environ.setdefault(_key, _value)
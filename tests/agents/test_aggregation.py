@@ -0,0 +1,83 @@
+import pytest
+
+from backend.agents.dynamic_agents import tools
+from backend.agents.dynamic_agents.aggregation import AggregationError, aggregate
+
+PACKAGES = [
+    {"name": "Basic", "provider": {"name": "AT&T"}, "price": "$40.00", "zip": "73069",
+     "products": [{"type": "Internet", "speed": 300}]},
+    {"name": "Fiber 1G", "provider": {"name": "AT&T"}, "price": 80, "zip": "73071",
+     "products": [{"type": "Internet", "speed": 1000}, {"type": "Video", "speed": None}]},
+    {"name": "Gig", "provider": {"name": "Cox"}, "price": 70.5, "zip": "73069",
+     "products": [{"type": "internet", "speed": "1,000"}]},
+    {"name": "Starter", "provider": {"name": "cox"}, "price": None, "zip": "73069", "products": []},
+    {"name": "Premium", "provider": {"name": "Cox"}, "price": "1,200", "zip": "73102"},
+]
+
+
+def test_group_by_with_metrics_and_sorting() -> None:
+    result = aggregate(
+        PACKAGES,
+        group_by=["provider.name"],
+        metrics=[{"op": "count"}, {"op": "median", "field": "price"}, {"op": "min", "field": "price"},
+                 {"op": "count_distinct", "field": "zip"}],
+        sort_by="median_price",
+    )
+    assert result["matched_rows"] == 5 and result["group_count"] == 2
+    cox, att = result["groups"]
+    # Grouping is case-insensitive and labelled with the first original value
+    assert cox == {"provider.name": "Cox", "count": 3, "median_price": 635.25, "min_price": 70.5,
+                   "count_distinct_zip": 2}
+    assert att["median_price"] == 60.0 and att["count"] == 2
+
+
+def test_sort_by_group_field_of_mixed_types() -> None:
+    records = [{"speed": 300}, {"speed": "1 Gig"}, {"speed": 1000}, {"speed": None}, {"speed": 50.5}]
+    result = aggregate(records, group_by=["speed"], sort_by="speed", descending=False)
+    assert [g["speed"] for g in result["groups"]] == [50.5, 300, 1000, "1 Gig", None]
+
+
+def test_filters_and_unnest() -> None:
+    result = aggregate(
+        PACKAGES,
+        unnest_path="products",
+        filters=[{"field": "products.type", "op": "eq", "value": "INTERNET"},
+                 {"field": "products.speed", "op": "gte", "value": 1000}],
+        group_by=["zip"],
+        metrics=[{"op": "count"}, {"op": "distinct", "field": "name", "as": "packages"}],
+    )
+    assert result["total_rows"] == 4  # records without products are dropped
+    assert result["groups"] == [
+        {"zip": "73069", "count": 1, "packages": ["Gig"]},
+        {"zip": "73071", "count": 1, "packages": ["Fiber 1G"]},
+    ]
+    assert aggregate(PACKAGES, filters=[{"field": "price", "op": "missing"}])["groups"] == [{"count": 1}]
+
+
+def test_invalid_requests_raise() -> None:
+    with pytest.raises(AggregationError):
+        aggregate(PACKAGES, metrics=[{"op": "mode", "field": "price"}])
+    with pytest.raises(AggregationError):
+        aggregate(PACKAGES, metrics=[{"op": "sum", "field": "name"}])
+    with pytest.raises(AggregationError):
+        aggregate(PACKAGES, filters=[{"field": "price", "op": "gt", "value": "cheap"}])
+
+
+def test_counting_tool_aggregates_stored_results(monkeypatch) -> None:
+    store = tools.shared_result_store
+    handle = store.put("agg-thread", {"fetchPackages": {"packages": PACKAGES}})
+    config = {"configurable": {"thread_id": "agg-thread"}}
+    try:
+        result = tools.math_counting_tool.invoke(
+            {"operation": "aggregate", "result_handle": handle, "metrics": [{"op": "sum", "field": "price"}]},
+            config=config,
+        )
+        assert result["groups"] == [{"sum_price": 1390.5}]
+        assert "5 of 5 rows" in result["message"]
+
+        error = tools.math_counting_tool.invoke(
+            {"operation": "aggregate", "items": PACKAGES, "sort_by": "nope"}, config=config
+        )
+        assert error["error"].startswith("Invalid aggregation")
+    finally:
+        store.clear("agg-thread")
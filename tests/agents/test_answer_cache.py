@@ -0,0 +1,91 @@
+import datetime
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from backend.agents.dynamic_agents.answer_cache import AnswerCache, HashedNgramEmbeddings, answer_cache_scope, load_embeddings
+from backend.agents.dynamic_agents.geo_index import LocationIndex
+
+SCOPE = "2026-10-19|en-US"
+PLACES = LocationIndex([("oklahoma city", "oklahoma", "oklahoma", "ok"), ("tulsa", "tulsa", "oklahoma", "ok")])
+
+
+class SameEmbeddings(Embeddings):
+    """An embedding model that finds every question alike, so only the exact terms tell them apart."""
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_exact_and_semantic_hits() -> None:
+    cache = AnswerCache(embeddings=HashedNgramEmbeddings(), place_names=PLACES.find_place_names)
+    cache.store("What are AT&T fiber prices in 73034?", SCOPE, "AT&T Fiber 300 is $55/month.", {"tool_calls": []})
+
+    exact = cache.lookup("what are AT&T fiber prices in 73034", SCOPE)
+    assert exact.match == "exact" and exact.answer == "AT&T Fiber 300 is $55/month."
+    reworded = cache.lookup("Show me the prices of AT&T fiber for zip code 73034", SCOPE)
+    assert reworded.match == "semantic" and reworded.similarity >= 0.9
+
+    # Another provider, product, location, qualifier or scope is a different question
+    assert cache.lookup("What are Verizon fiber prices in 73034?", SCOPE) is None
+    assert cache.lookup("What are AT&T fiber promotions in 73034?", SCOPE) is None
+    assert cache.lookup("What are AT&T fiber prices in 73069?", SCOPE) is None
+    assert cache.lookup("What are AT&T fiber prices in 73034 for seniors?", SCOPE) is None
+    assert cache.lookup("What are AT&T fiber prices in 73034?", "2026-10-20|en-US") is None
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 5)
+    assert stats["hit_rate"] == round(2 / 7, 4)
+
+
+def test_semantic_hits_need_the_same_numbers_negations_and_places() -> None:
+    cache = AnswerCache(embeddings=SameEmbeddings(), place_names=PLACES.find_place_names)
+    cache.store("Spectrum TV packages in Tulsa with HBO and Showtime and sports channels", SCOPE, "With HBO", {})
+    cache.store("AT&T fiber prices in Oklahoma", SCOPE, "Statewide prices", {})
+    cache.store("AT&T fiber prices in 73034", SCOPE, "Prices in 73034", {})
+
+    assert cache.lookup("Spectrum TV packages in Tulsa without HBO and Showtime and sports channels", SCOPE) is None
+    assert cache.lookup("Spectrum TV packages in Tulsa with HBO and Showtime and no sports channels", SCOPE) is None
+    assert cache.lookup("AT&T fiber prices in Oklahoma City", SCOPE) is None
+    assert cache.lookup("AT&T fiber prices in 73069", SCOPE) is None
+    # Everything else is up to the embeddings
+    assert cache.lookup("how much is AT&T fiber in 73034", SCOPE).answer == "Prices in 73034"
+    assert cache.lookup("Which Spectrum TV packages with HBO, Showtime and sports channels in Tulsa?",
+                        SCOPE).answer == "With HBO"
+
+
+def test_ttl_and_size_bound() -> None:
+    clock = FakeClock()
+    cache = AnswerCache(ttl_seconds=60, max_size=2, clock=clock, embeddings=HashedNgramEmbeddings(),
+                        place_names=PLACES.find_place_names)
+    for zipcode in ("73034", "73069", "29056"):
+        cache.store(f"AT&T fiber prices in {zipcode}", SCOPE, f"Prices in {zipcode}", {})
+
+    assert cache.lookup("AT&T fiber prices in 73034", SCOPE) is None
+    assert cache.lookup("AT&T fiber prices in 29056", SCOPE).answer == "Prices in 29056"
+    clock.now = 61
+    assert cache.lookup("AT&T fiber prices in 29056", SCOPE) is None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["expired"] == 2 and cache.stats()["entries"] == 0
+
+
+def test_scope_and_embeddings_loading() -> None:
+    assert answer_cache_scope({"locale": "es-US"}, today=datetime.date(2026, 10, 19)) == "2026-10-19|es-US"
+    assert answer_cache_scope(None, today=datetime.date(2026, 10, 19)) == SCOPE
+    # The data date the request asked for, not the server's date
+    assert answer_cache_scope({"data_date": "2026-09-30"}, today=datetime.date(2026, 10, 19)) == "2026-09-30|en-US"
+    with pytest.raises(ValueError):
+        answer_cache_scope({"data_date": "last week"})
+    assert isinstance(load_embeddings("no_such_module:Embeddings"), HashedNgramEmbeddings)
+    embeddings = load_embeddings("backend.agents.dynamic_agents.answer_cache:HashedNgramEmbeddings")
+    assert embeddings.embed_documents(["a"]) == [embeddings.embed_query("a")]
@@ -0,0 +1,28 @@
+from backend.agents.dynamic_agents.answer_cleanup import clean_answer, refinement_skip_reason
+
+TABLE = "| Package | Price |\n|---|---|\n| Fiber 300 | $55.00 |"
+
+
+def test_clean_answer_removes_narration_and_keeps_data() -> None:
+    answer = (
+        "Let me look that up for you. I'll check the packages.\n\n"
+        "According to the database, AT&T offers two plans in 73069. Based on my queries: both include Wi-Fi.\n\n"
+        f"{TABLE}\n\n"
+        "I will now format the results."
+    )
+    assert clean_answer(answer) == (
+        "AT&T offers two plans in 73069. Both include Wi-Fi.\n\n"
+        f"{TABLE}"
+    )
+    # An answer that is nothing but narration-like text is left alone
+    assert clean_answer("Let me know if you need anything else!") == "Let me know if you need anything else!"
+    assert clean_answer("[LATEST_MESSAGE] Hello!  \n") == "Hello!"
+
+
+def test_refinement_skip_reason() -> None:
+    assert refinement_skip_reason("Hi there!", False, 0) == "no_database_access"
+    assert refinement_skip_reason("Hi there!", None, 0) == "no_tool_outputs"
+    assert refinement_skip_reason("Fiber 300 is $55.", True, 1, max_chars=300) == "short_answer"
+    assert refinement_skip_reason("x" * 400, True, 1, max_chars=300) is None
+    assert refinement_skip_reason("Fiber 300 is $55.", True, 1, max_chars=0) is None
+    assert refinement_skip_reason("Hi there!", False, 0, enabled=False) is None
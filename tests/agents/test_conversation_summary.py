@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from backend.agents.dynamic_agents import agent
+from backend.agents.dynamic_agents.conversation_summary import (SUMMARY_INTRO, select_history, split_turns,
+                                                                turns_to_summarize)
+from backend.agents.dynamic_agents.token_budget import count_tokens
+
+ANSWER = "| Package | Price |\n|---|---|\n" + "".join(f"| Fiber {i}00 | ${40 + i}.00 |\n" for i in range(1, 40))
+
+
+def conversation(turns: int):
+    messages = [SystemMessage(content="Context: GraphQL schema attached by reference: schema:sha256:abc")]
+    for i in range(turns):
+        messages.append(HumanMessage(content=f"What fiber plans does provider {i} offer in 730{i % 100:02d}?"))
+        if i < turns - 1:
+            messages.append(AIMessage(content=ANSWER))
+    return messages
+
+
+def tokens(messages) -> int:
+    return sum(count_tokens(str(m.content)) for m in messages)
+
+
+def test_recent_turns_are_kept_and_older_ones_summarized() -> None:
+    messages = conversation(10)
+    history = select_history(messages, "* User compares fiber plans in Oklahoma.", summarized_turns=5, keep_turns=3)
+
+    assert history[0].content.startswith(SUMMARY_INTRO) and "schema:sha256:abc" in history[1].content
+    humans = [m.content for m in history if isinstance(m, HumanMessage)]
+    # Turns 6 and 7 (index 5, 6) are not in the summary yet, so they stay while the budget allows
+    assert humans == [m.content for m in messages if isinstance(m, HumanMessage)][5:]
+    assert history[-1] is messages[-1]
+
+    pending, covered = turns_to_summarize(messages, summarized_turns=5, keep_turns=3)
+    assert covered == 7 and [turn[0] for turn in pending] == [split_turns(messages)[i][0] for i in (5, 6)]
+
+
+def test_budget_limits_the_verbatim_turns() -> None:
+    messages = conversation(10)
+    history = select_history(messages, None, summarized_turns=0, keep_turns=6, token_budget=2 * tokens([messages[2]]))
+    assert [m for m in history if isinstance(m, HumanMessage)][-1] is messages[-1]
+    assert len([m for m in history if isinstance(m, AIMessage)]) <= 2
+    # The current turn is kept whatever its size
+    assert select_history(messages, None, 0, keep_turns=6, token_budget=1)[-1] is messages[-1]
+
+
+def test_history_cost_per_turn_stays_flat() -> None:
+    """Benchmark: history passed to the swarm at turn 5, 50 and 200."""
+    results = {}
+    for turn in (5, 50, 200):
+        messages = conversation(turn)
+        started = time.perf_counter()
+        summarized = max(0, turn - 6)
+        history = select_history(messages, "* summary " * 50 if summarized else None, summarized, keep_turns=6)
+        results[turn] = (tokens(history), tokens(messages), time.perf_counter() - started)
+    assert results[200][0] <= results[50][0] * 1.1 and results[200][0] * 20 < results[200][1]
+    assert results[200][2] < 0.5
+
+
+def test_summary_is_written_to_state(monkeypatch) -> None:
+    monkeypatch.setattr(agent, "get_telogical_secondary_llm",
+                        lambda: GenericFakeChatModel(messages=iter([AIMessage(content="* User compares fiber plans.")])))
+    monkeypatch.setattr("backend.agents.dynamic_agents.conversation_summary.CONVERSATION_KEEP_TURNS", 6)
+    state = {"messages": conversation(8), "summarized_turns": 0}
+
+    update = asyncio.run(agent.summarize_history_node(state, {}))
+
+    assert update == {"conversation_summary": "* User compares fiber plans.", "summarized_turns": 2}
+    assert asyncio.run(agent.summarize_history_node({**state, **update}, {})) == {}
+
+
+def test_summary_tokens_are_not_streamed(monkeypatch) -> None:
+    async def no_update(state, config):
+        return {}
+
+    async def app_agent(state, config):
+        return {"app_output": ANSWER, "agent_tool_outputs": [], "data_tool_calls": 0}
+
+    monkeypatch.setattr(agent, "get_telogical_secondary_llm",
+                        lambda: GenericFakeChatModel(messages=iter([AIMessage(content="* User compares fiber plans.")])))
+    monkeypatch.setattr("backend.agents.dynamic_agents.conversation_summary.CONVERSATION_KEEP_TURNS", 6)
+    for node in ("contextualize_query_node", "prepare_schema_node", "prefetch_node"):
+        monkeypatch.setattr(agent, node, no_update)
+    monkeypatch.setattr(agent, "run_app_agent_refined", app_agent)
+
+    async def run():
+        graph = await agent.create_refined_agent_workflow(None)
+        streamed = []
+        async for chunk, metadata in graph.astream({"messages": conversation(8)}, stream_mode="messages"):
+            # As the service's message_generator does
+            if "skip_stream" not in metadata.get("tags", []):
+                streamed.append(str(chunk.content))
+        return streamed
+
+    streamed = asyncio.run(run())
+
+    assert "fiber plans." not in "".join(streamed)
@@ -0,0 +1,167 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.runnables import RunnableLambda
+
+from backend.agents.dynamic_agents import agent, tools
+from backend.agents.dynamic_agents.deadline import DeadlineStats, remaining_seconds, request_deadline, stage_timeout
+
+
+def config_with(seconds_left):
+    return {"configurable": {"thread_id": "t1", "deadline": time.time() + seconds_left}}
+
+
+def test_request_deadline_and_stage_timeouts(monkeypatch) -> None:
+    monkeypatch.setattr("backend.agents.dynamic_agents.deadline.REQUEST_DEADLINE_MAX_SECONDS", 300)
+    assert request_deadline(45, now=1000.0) == 1045.0
+    assert request_deadline("3600", now=1000.0) == 1300.0
+    for invalid in (0, -5, "soon", "nan", "inf", float("inf")):
+        with pytest.raises(ValueError):
+            request_deadline(invalid)
+
+    assert remaining_seconds({"configurable": {}}) is None
+    assert stage_timeout({"configurable": {}}, reserve=15, cap=30) == 30
+    config = config_with(20)
+    assert 4.5 < stage_timeout(config, reserve=15) <= 5
+    assert 1 < stage_timeout(config, share=0.25, cap=10) <= 5
+    assert stage_timeout(config, reserve=60) == 0.0
+
+
+def test_contextualizer_gives_up_at_its_share_of_the_deadline(monkeypatch) -> None:
+    async def slow_analysis(_):
+        await asyncio.sleep(5)
+
+    class SlowLLM:
+        def with_structured_output(self, schema):
+            return RunnableLambda(slow_analysis)
+
+    stats = DeadlineStats()
+    monkeypatch.setattr(agent, "CONTEXTUALIZER_FAST_PATH", False)
+    monkeypatch.setattr(agent, "get_telogical_secondary_llm", lambda: SlowLLM())
+    monkeypatch.setattr(agent, "deadline_stats", stats)
+    state = {"messages": [HumanMessage(content="AT&T plans in 73069?"), AIMessage(content="..."),
+                          HumanMessage(content="And what about that one?")]}
+
+    started = time.perf_counter()
+    update = asyncio.run(agent.contextualize_query_node(state, config_with(0.8)))
+
+    assert time.perf_counter() - started < 1
+    assert update == {"internal_context_insights": None, "requires_schema_flag": True, "contextualized_query": None}
+    assert stats.stats()["exceeded"] == {"contextualize_query": 1}
+
+
+def test_swarm_is_stopped_with_time_left_for_refinement(monkeypatch) -> None:
+    class LoopingSwarm:
+        async def astream(self, state, config=None, stream_mode=None):
+            messages = list(state["messages"])
+            yield {"messages": messages}
+            for i in range(100):
+                messages = messages + [
+                    AIMessage(content=f"AT&T Fiber 300 is $55/mo in 73069. Checking Cox ({i})...",
+                              tool_calls=[{"name": "parallel_graphql_executor", "args": {}, "id": f"c{i}"}]),
+                    ToolMessage(content='{"q": {"status": "success"}}', tool_call_id=f"c{i}",
+                                name="parallel_graphql_executor"),
+                ]
+                yield {"messages": messages}
+                await asyncio.sleep(0.1)
+
+    async def fake_dynamic_swarm():
+        return LoopingSwarm()
+
+    stats = DeadlineStats()
+    monkeypatch.setattr(agent, "dynamic_swarm", fake_dynamic_swarm)
+    monkeypatch.setattr(agent, "deadline_stats", stats)
+    monkeypatch.setattr(agent, "DEADLINE_REFINE_RESERVE_SECONDS", 10)
+    state = {"messages": [HumanMessage(content="Hi"), AIMessage(content="Hello! How can I help?"),
+                          HumanMessage(content="Fiber plans in 73069?")], "schema_turn": 2}
+
+    started = time.perf_counter()
+    update = asyncio.run(agent.run_app_agent_refined(state, config_with(10.35)))
+
+    assert 0.3 <= time.perf_counter() - started < 1
+    assert update["deadline_exceeded"] is True and update["data_tool_calls"] >= 3
+    assert update["app_output"].startswith("AT&T Fiber 300 is $55/mo in 73069.")
+    assert stats.stats()["exceeded"] == {"app_agent": 1}
+
+    state.update(update)
+    assert agent.route_after_app_agent(state) == "finish_output"
+    final = asyncio.run(agent.finish_output_node(state))["messages"][0]
+    assert final.custom_data["trace"]["refinement_skipped"] == "deadline"
+
+    # Stopped before the swarm wrote anything: never the previous turn's answer
+    update = asyncio.run(agent.run_app_agent_refined(state, config_with(5)))
+    assert update["app_output"] == agent.DEADLINE_EXCEEDED_ANSWER
+
+
+def test_refinement_is_skipped_or_cut_short_near_the_deadline(monkeypatch) -> None:
+    class SlowChatModel(GenericFakeChatModel):
+        async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+            for word in ["Refined", " answer"]:
+                await asyncio.sleep(1)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+    def no_llm():
+        raise AssertionError("no refinement LLM call expected")
+
+    stats = DeadlineStats()
+    monkeypatch.setattr(agent, "REFINE_STREAMING", True)
+    monkeypatch.setattr(agent, "deadline_stats", stats)
+    monkeypatch.setattr(agent, "get_telogical_primary_llm", no_llm)
+    state = {"messages": [HumanMessage(content="Fiber plans in 73069?")],
+             "app_output": "Let me look that up.\n\nAT&T Fiber 300 is $55/mo in 73069.",
+             "agent_tool_outputs": [], "data_tool_calls": 1}
+
+    update = asyncio.run(agent.refine_output_refined(state, config_with(2)))
+    message = update["messages"][0]
+    assert message.content == "AT&T Fiber 300 is $55/mo in 73069."
+    assert message.custom_data["trace"]["refinement_skipped"] == "deadline"
+
+    monkeypatch.setattr(agent, "get_telogical_primary_llm", lambda: SlowChatModel(messages=iter([])))
+    monkeypatch.setattr(agent, "DEADLINE_MIN_REFINE_SECONDS", 0.1)
+    started = time.perf_counter()
+    update = asyncio.run(agent.refine_output_refined(state, config_with(0.5)))
+    assert time.perf_counter() - started < 1
+    assert update["messages"][0].content == "AT&T Fiber 300 is $55/mo in 73069."
+    assert stats.stats()["exceeded"] == {"refine_output": 2}
+
+
+def test_graphql_timeouts_follow_the_deadline(monkeypatch) -> None:
+    sent = []
+
+    class FakeResponse:
+        status = 200
+
+        async def json(self):
+            return {"data": {"packages": []}}
+
+    class FakeSession:
+        def post(self, url, headers=None, json=None, timeout=None):
+            sent.append(timeout)
+
+            class Request:
+                async def __aenter__(self):
+                    return FakeResponse()
+
+                async def __aexit__(self, *exc):
+                    return False
+            return Request()
+
+    stats = DeadlineStats()
+    monkeypatch.setattr(tools, "deadline_stats", stats)
+    executor = tools.ParallelGraphQLExecutor(endpoint="http://graphql.test", validate_zipcodes=False)
+    query = tools.GraphQLQuery(query="{ packages { name } }", query_id="q1")
+
+    def run(config):
+        return RunnableLambda(
+            lambda _: asyncio.run(executor._execute_single_query(FakeSession(), query))
+        ).invoke(None, config)
+
+    assert run({"configurable": {}})["status"] == "success" and sent == [30]
+    assert run(config_with(5))["status"] == "success" and 4 < sent[1] <= 5
+    result = run(config_with(-1))
+    assert result["error"] == "Deadline exceeded" and len(sent) == 2
+    assert stats.stats()["exceeded"] == {"graphql": 1} and stats.stats()["shortened_timeouts"] == {"graphql": 1}
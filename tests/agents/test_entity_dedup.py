@@ -0,0 +1,57 @@
+import copy
+
+from backend.agents.dynamic_agents import tools
+from backend.agents.dynamic_agents.entity_dedup import dedup_entities, dedup_query_results, expand_refs
+
+
+def package(fact_id: int, name: str, **extra) -> dict:
+    return {"packageFactId": fact_id, "packageName": name, "provider": {"name": "AT&T"}, "price": 55.0, **extra}
+
+
+def zip_result(*packages) -> dict:
+    return {"fetchPackages": {"packages": list(packages)}}
+
+
+def test_repeated_entities_become_references() -> None:
+    shared = package(1, "Fiber 300")
+    values = [zip_result(shared, package(2, "Fiber 1G")), zip_result(copy.deepcopy(shared))]
+    deduped, entities = dedup_entities(values)
+
+    assert list(entities) == ["packageFactId:1"]
+    assert deduped[0]["fetchPackages"]["packages"][0] == {"$ref": "packageFactId:1"}
+    assert deduped[0]["fetchPackages"]["packages"][1]["packageFactId"] == 2  # seen once, stays inline
+    assert deduped[1]["fetchPackages"]["packages"] == [{"$ref": "packageFactId:1"}]
+    assert [expand_refs(value, entities) for value in deduped] == values
+
+
+def test_different_field_selections_are_not_merged() -> None:
+    full, partial = package(1, "Fiber 300", speed=300), package(1, "Fiber 300")
+    deduped, entities = dedup_entities([zip_result(full, partial), zip_result(full, partial)])
+    assert sorted(entities) == ["packageFactId:1", "packageFactId:1~2"]
+    assert [expand_refs(value, entities) for value in deduped] == [zip_result(full, partial)] * 2
+
+
+def test_query_results_report_savings(monkeypatch) -> None:
+    packages = [package(i, f"Plan {i}", description="x" * 200) for i in range(5)]
+
+    async def fake_execute(self, queries, on_result=None):
+        return {q.query_id: {"query_id": q.query_id, "status": "success", "result": zip_result(*packages), "errors": None}
+                for q in queries}
+
+    monkeypatch.setattr(tools.ParallelGraphQLExecutor, "execute_queries_async", fake_execute)
+    config = {"configurable": {"thread_id": "dedup-thread"}}
+    queries = [{"query": "{ q }", "query_id": f"zip_{i}"} for i in range(3)]
+    try:
+        output = tools.parallel_graphql_executor.invoke({"queries": queries}, config=config)
+        stats = output["_dedup"]
+        assert stats["entities"] == 5 and stats["references"] == 15
+        assert stats["bytes_saved"] > 0 and stats["tokens_saved"] > 0
+        for i in range(3):
+            assert expand_refs(output[f"zip_{i}"]["result"], output["_entities"]) == zip_result(*packages)
+            # The stored copy is untouched, so counting still sees full objects
+            stored = tools.shared_result_store.get("dedup-thread", output[f"zip_{i}"]["result_handle"])
+            assert stored.data == zip_result(*packages)
+    finally:
+        tools.shared_result_store.clear("dedup-thread")
+
+    assert dedup_query_results({"q": {"status": "success", "result": zip_result(package(1, "Solo"))}}) is None
@@ -0,0 +1,173 @@
+from backend.agents.dynamic_agents.geo_index import DMAIndex, LocationIndex, ReverseGeoIndex, ZipSetIndex, normalize_place_name
+
+ROWS = [
+    ("oklahoma city", "oklahoma", "oklahoma", "ok"),
+    ("norman", "cleveland", "oklahoma", "ok"),
+    ("saint louis", "st. louis city", "missouri", "mo"),
+    ("chesterfield", "st. louis", "missouri", "mo"),
+    ("fort worth", "tarrant", "texas", "tx"),
+    ("metairie", "jefferson parish", "louisiana", "la"),
+    ("cleveland", "cuyahoga", "ohio", "oh"),
+]
+
+
+def test_normalize_place_name() -> None:
+    assert normalize_place_name("St. Louis") == "saint louis"
+    assert normalize_place_name("Ft Worth") == "fort worth"
+    assert normalize_place_name("Cleveland County", strip_county_suffix=True) == "cleveland"
+    assert normalize_place_name("Jefferson Parish", strip_county_suffix=True) == "jefferson"
+    assert normalize_place_name("Cleveland County") == "cleveland county"
+
+
+def test_search_resolves_typos_and_aliases() -> None:
+    index = LocationIndex(ROWS)
+
+    best = index.search("Oklahoma Cty", "city")[0]
+    assert best["location"] == "oklahoma city"
+    assert best["state"] == "OK"
+
+    assert index.search("St Louis", "city")[0] == {
+        "location": "saint louis",
+        "location_type": "city",
+        "state": "MO",
+        "score": 1.0,
+    }
+    assert index.search("Ft. Worth", "city")[0]["location"] == "fort worth"
+    assert index.search("Jefferson", "county", state="Louisiana")[0]["location"] == "jefferson parish"
+
+
+def test_search_respects_state_filter() -> None:
+    index = LocationIndex(ROWS)
+
+    assert index.search("Cleveland County", "county", state="OK")[0]["location"] == "cleveland"
+    assert all(c["state"] == "OH" for c in index.search("Cleveland", "city", state="OH"))
+    assert index.search("Cleveland", "city", state="ZZ") == []
+
+
+def test_search_returns_nothing_for_unrelated_names() -> None:
+    index = LocationIndex(ROWS)
+
+    assert index.search("Xyzzy", "city") == []
+    assert index.search("", "city") == []
+
+
+
+def test_find_place_names_prefers_the_longest_name() -> None:
+    index = LocationIndex(ROWS)
+
+    assert index.find_place_names("AT&T fiber in Oklahoma City") == ["oklahoma city"]
+    assert index.find_place_names("AT&T fiber in Oklahoma") == ["oklahoma"]
+    assert index.find_place_names("Spectrum in St. Louis and Fort Worth") == ["saint louis", "fort worth"]
+    assert index.find_place_names("cheapest internet plans") == []
+
+
+ZIP_ROWS = [
+    ("73102", "oklahoma city", "oklahoma", "oklahoma", "ok", "40"),
+    ("70001", "metairie", "jefferson parish", "louisiana", "la", "22"),
+    ("63101", "saint louis", "st. louis city", "missouri", "mo", "29"),
+    ("501", "holtsville", "suffolk", "new york", "ny", "36"),
+]
+
+
+def test_reverse_lookup() -> None:
+    index = ReverseGeoIndex(ZIP_ROWS)
+    result = index.lookup(["73102", 501, "99999", "73102"])
+    assert list(result["results"]) == ["73102", "00501"]
+    assert result["results"]["73102"][0]["city"] == "Oklahoma City"
+    assert result["results"]["73102"][0]["state_fips"] == 40
+    assert result["not_found"] == ["99999"]
+
+
+def test_reverse_label() -> None:
+    index = ReverseGeoIndex(ZIP_ROWS)
+    assert index.label("73102") == "Oklahoma City, Oklahoma County, OK"
+    assert index.label("70001") == "Metairie, Jefferson Parish, LA"
+    assert index.label("63101") == "Saint Louis, St. Louis City, MO"
+    assert ReverseGeoIndex([("23030", "charles city", "charles city", "virginia", "va", "51")]).label("23030") == \
+        "Charles City, Charles City County, VA"
+    assert index.label("12345") is None
+
+
+def test_find_known_zipcodes_skips_prices_and_decimals() -> None:
+    index = ReverseGeoIndex(ZIP_ROWS)
+    text = "Plans in 73102 start at $63101 (sic), speed 70001.5 Mbps; also 63101-1234 and 99999."
+    assert index.find_known_zipcodes(text) == ["73102", "63101"]
+
+
+def test_suggest_prefers_same_city_then_county() -> None:
+    index = ReverseGeoIndex([
+        ("73069", "norman", "cleveland", "oklahoma", "ok", "40"),
+        ("73072", "norman", "cleveland", "oklahoma", "ok", "40"),
+        ("73068", "noble", "cleveland", "oklahoma", "ok", "40"),
+        ("73102", "oklahoma city", "oklahoma", "oklahoma", "ok", "40"),
+        ("74101", "tulsa", "tulsa", "oklahoma", "ok", "40"),
+    ])
+    result = index.suggest("73070", limit=3)
+    assert result["near"] == "Norman, Cleveland County, OK"
+    assert [s["zipcode"] for s in result["suggestions"]] == ["73069", "73072", "73068"]
+    # Nothing known in the same three-digit region
+    assert index.suggest("75001")["suggestions"] == []
+    assert index.suggest("7307")["near"] is None
+
+
+SET_ROWS = [
+    ("73069", "cleveland", "oklahoma", "ok"),
+    ("73071", "cleveland", "oklahoma", "ok"),
+    ("73102", "oklahoma", "oklahoma", "ok"),
+    ("72801", "cleveland", "arkansas", "ar"),
+    ("70001", "jefferson parish", "louisiana", "la"),
+    ("59101", "yellowstone", "montana", "mt"),
+]
+
+
+def test_zip_set_algebra() -> None:
+    index = ZipSetIndex(SET_ROWS)
+    oklahoma = index.state("Oklahoma")
+    cleveland = index.county("Cleveland County", "OK")
+    footprint, unknown = index.zipcodes(["73071", 73102, "99999"])
+
+    assert unknown == ["99999"]
+    assert index.to_zipcodes(index.combine("intersection", [cleveland, footprint])) == ["73071"]
+    assert index.to_zipcodes(index.combine("difference", [oklahoma, cleveland])) == ["73102"]
+    assert index.count(index.combine("union", [cleveland, index.county("Jefferson", "LA")])) == 3
+    assert index.count_by_state(index.combine("union", [oklahoma, index.state("AR")])) == {"OK": 3, "AR": 1}
+
+
+def test_zip_set_county_needs_state_when_ambiguous() -> None:
+    index = ZipSetIndex(SET_ROWS)
+    assert index.county("Cleveland") is None
+    assert index.county_states("Cleveland") == ["AR", "OK"]
+    assert index.to_zipcodes(index.county("Jefferson Parish")) == ["70001"]
+
+
+def test_zip_set_state_abbreviations_are_not_expanded() -> None:
+    index = ZipSetIndex(SET_ROWS)
+    assert index.to_zipcodes(index.state("MT")) == index.to_zipcodes(index.state("Montana")) == ["59101"]
+    assert index.to_zipcodes(index.county("Yellowstone County", "MT")) == ["59101"]
+
+
+DMA_ROWS = [
+    {"DMACode": "500", "DMA": "Portland, ME", "LongDMA": "Portland-Auburn, ME", "NielsenDMA": "PORTLAND-AUBURN"},
+    {"DMACode": "501", "DMA": "New York, NY", "LongDMA": "New York, NY", "NielsenDMA": "NEW YORK"},
+    {"DMACode": "650", "DMA": "Oklahoma City, OK", "LongDMA": "Oklahoma City, OK", "NielsenDMA": float("nan")},
+    {"DMACode": "820", "DMA": "Portland, OR", "LongDMA": "Portland, OR", "NielsenDMA": "PORTLAND, OR"},
+]
+
+
+def test_dma_lookup() -> None:
+    index = DMAIndex(DMA_ROWS)
+    result = index.lookup(["501", 650, "999"], return_all_columns=True)
+    assert result["results"]["501"] == {"DMA": "New York, NY", "LongDMA": "New York, NY", "NielsenDMA": "NEW YORK"}
+    assert result["results"]["650"]["NielsenDMA"] == ""
+    assert result["results"]["999"] is None
+    assert result["not_found"] == ["999"]
+    assert index.lookup(["0501"])["results"] == {"0501": "New York, NY"}
+
+
+def test_dma_name_search() -> None:
+    index = DMAIndex(DMA_ROWS)
+    assert index.search("Oklahoma Cty")[0]["dma_code"] == "650"
+    assert index.search("Auburn")[0]["dma_code"] == "500"
+    assert [m["dma_code"] for m in index.search("Portland")] == ["500", "820"]
+    assert [m["dma_code"] for m in index.search("Portland, OR")] == ["820"]
+    assert index.search("zzzz") == []
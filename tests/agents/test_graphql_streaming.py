@@ -0,0 +1,63 @@
+import asyncio
+from typing import TypedDict
+
+from langgraph.graph import END, START, StateGraph
+
+from backend.agents.dynamic_agents import tools
+
+DELAYS = {"slow": 0.15, "fast": 0.0, "medium": 0.05}
+
+
+async def fake_single_query(self, session, query_item):
+    await asyncio.sleep(DELAYS[query_item.query_id])
+    if query_item.query_id == "medium":
+        return {"query_id": "medium", "status": "error", "error": "Timeout", "details": "..."}
+    rows = [{"zip": "73069"}] * (3 if query_item.query_id == "slow" else 1)
+    return {"query_id": query_item.query_id, "status": "success", "result": {"packages": rows}, "errors": None}
+
+
+def queries():
+    return [tools.GraphQLQuery(query="{ q }", query_id=query_id) for query_id in DELAYS]
+
+
+def test_results_are_reported_as_they_complete(monkeypatch) -> None:
+    monkeypatch.setattr(tools.ParallelGraphQLExecutor, "_execute_single_query", fake_single_query)
+    executor = tools.ParallelGraphQLExecutor(endpoint="http://graphql.test")
+    events = []
+
+    results = asyncio.run(executor.execute_queries_async(queries(), on_result=events.append))
+
+    assert [e["query_id"] for e in events] == ["fast", "medium", "slow"]
+    assert [e["completed"] for e in events] == [1, 2, 3] and events[0]["total"] == 3
+    assert events[1]["status"] == "error" and events[1]["rows"] == 0
+    assert events[2]["rows"] == 3 and events[2]["latency_ms"] >= 100
+    # The aggregated result keeps the query order and does not change with streaming
+    assert list(results) == list(DELAYS)
+    assert results == asyncio.run(executor.execute_queries_async(queries()))
+
+
+def test_progress_is_streamed_as_custom_events(monkeypatch) -> None:
+    monkeypatch.setattr(tools.ParallelGraphQLExecutor, "_execute_single_query", fake_single_query)
+    monkeypatch.setattr(tools, "GRAPHQL_DEDUP_ENTITIES", False)
+    executor = tools.ParallelGraphQLExecutor(endpoint="http://graphql.test")
+
+    class State(TypedDict):
+        done: bool
+
+    def run_tool(state, config):
+        executor.execute_queries([q.model_dump() for q in queries()], config=config)
+        return {"done": True}
+
+    builder = StateGraph(State)
+    builder.add_node("tool", run_tool)
+    builder.add_edge(START, "tool")
+    builder.add_edge("tool", END)
+    graph = builder.compile()
+
+    async def collect():
+        return [event async for mode, event in graph.astream({"done": False}, stream_mode=["custom", "updates"])
+                if mode == "custom"]
+
+    custom = asyncio.run(collect())
+    assert all(message.role == "custom" for message in custom)
+    assert [message.content[0]["query_id"] for message in custom] == ["fast", "medium", "slow"]
@@ -0,0 +1,89 @@
+import asyncio
+
+from backend.agents.dynamic_agents import tools
+from backend.agents.dynamic_agents.hedging import HedgeBudget, Hedger, LatencyTracker, operation_info
+
+QUERY = "query Packages { fetchPackages(zipCodes: [\"73069\"]) { packageName } }"
+
+
+def is_success(result):
+    return result.get("status") == "success"
+
+
+def warmed_hedger(budget_ratio: float = 1.0) -> Hedger:
+    tracker = LatencyTracker(min_samples=5)
+    for _ in range(100):
+        tracker.record("fetchPackages", 0.01)
+    return Hedger(enabled=True, percentile=95, tracker=tracker, budget=HedgeBudget(ratio=budget_ratio, burst=1))
+
+
+def attempts(*delays):
+    """send() that returns the attempts' results after the given delays, recording cancellations."""
+    state = {"started": 0, "cancelled": 0}
+
+    async def send():
+        number = state["started"]
+        state["started"] += 1
+        try:
+            await asyncio.sleep(delays[number])
+        except asyncio.CancelledError:
+            state["cancelled"] += 1
+            raise
+        return {"status": "success", "attempt": number}
+
+    return send, state
+
+
+def test_operation_info() -> None:
+    assert operation_info(QUERY) == ("query", "fetchPackages")
+    assert operation_info("{ fetchProviders { name } }") == ("query", "fetchProviders")
+    assert operation_info("mutation { updateThing(id: 1) { id } }") == ("mutation", "updateThing")
+
+
+def test_slow_request_is_hedged_and_loser_cancelled() -> None:
+    hedger = warmed_hedger()
+    send, state = attempts(1.0, 0.0)
+
+    result = asyncio.run(hedger.run(QUERY, send, is_success))
+
+    assert result["attempt"] == 1 and state == {"started": 2, "cancelled": 1}
+    stats = hedger.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1 and stats["win_rate"] == 1.0
+
+
+def test_fast_requests_and_mutations_are_not_hedged() -> None:
+    hedger = warmed_hedger()
+    send, state = attempts(0.0)
+    asyncio.run(hedger.run(QUERY, send, is_success))
+    send, mutation_state = attempts(0.05)
+    asyncio.run(hedger.run("mutation { updateThing { id } }", send, is_success))
+    assert state["started"] == 1 and mutation_state["started"] == 1
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_budget_limits_hedges() -> None:
+    hedger = warmed_hedger(budget_ratio=0.5)
+    for _ in range(4):
+        send, _ = attempts(0.05, 0.0)
+        asyncio.run(hedger.run(QUERY, send, is_success))
+    stats = hedger.stats()
+    # Each request earns half a hedge, so only every second slow request is hedged
+    assert stats["requests"] == 4 and stats["hedged"] == 2 and stats["budget_denied"] == 2
+    assert stats["hedge_rate"] == 0.5
+
+
+def test_waiting_for_the_concurrency_limit_is_not_latency(monkeypatch) -> None:
+    async def fake_single_query(self, session, query_item):
+        await asyncio.sleep(0.05)
+        return {"query_id": query_item.query_id, "status": "success", "result": {}, "errors": None}
+
+    monkeypatch.setattr(tools.ParallelGraphQLExecutor, "_execute_single_query", fake_single_query)
+    tracker = LatencyTracker(min_samples=1)
+    executor = tools.ParallelGraphQLExecutor(endpoint="http://graphql.test", max_concurrency=1, validate_zipcodes=False,
+                                             hedger=Hedger(enabled=False, tracker=tracker))
+    queries = [tools.GraphQLQuery(query=QUERY, query_id=f"q{i}") for i in range(4)]
+
+    asyncio.run(executor.execute_queries_async(queries))
+
+    # The queries ran one after another, but each one took 50 ms
+    assert tracker.percentile("fetchPackages", 100) < 0.09
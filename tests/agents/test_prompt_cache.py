@@ -0,0 +1,79 @@
+import asyncio
+import datetime
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from backend.agents.dynamic_agents import agent
+from backend.agents.dynamic_agents.prompt_cache import PromptCacheStats, prompt_token_usage
+from backend.agents.dynamic_agents.prompts import MAIN_PROMPT, REFINE_PLAIN_TEXT_PROMPT, REFINE_PROMPT, REFLECTION_PROMPT
+
+
+def test_agent_prompts_start_with_a_static_prefix() -> None:
+    first_turn = MAIN_PROMPT({"messages": [HumanMessage(content="AT&T plans in 73069?")]})
+    later_turn = MAIN_PROMPT({"messages": [HumanMessage(content="AT&T plans in 73069?"), AIMessage(content="..."),
+                                           HumanMessage(content="And Cox?")]})
+
+    assert first_turn[0].content == later_turn[0].content
+    assert "{current_date}" not in first_turn[0].content and "{tools}" not in first_turn[0].content
+    assert "parallel_graphql_executor:" in first_turn[0].content
+    assert first_turn[1].content.endswith(f"{datetime.date.today()}**")
+    assert [m.content for m in later_turn[2:]] == ["AT&T plans in 73069?", "...", "And Cox?"]
+    assert "{current_date}" not in REFLECTION_PROMPT({"messages": []})[0].content
+
+
+def test_refine_prompt_is_compiled_with_a_static_system_message() -> None:
+    for template in (REFINE_PROMPT, REFINE_PLAIN_TEXT_PROMPT):
+        one = template.format_messages(current_date="2026-01-01", original_query="q1", agent_output="{a}",
+                                       tool_outputs='{"rows": 1}')
+        two = template.format_messages(current_date="2026-01-02", original_query="q2", agent_output="b",
+                                       tool_outputs="none")
+        assert one[0].content == two[0].content and "{current_date}" not in one[0].content
+        assert one[1].content.endswith("2026-01-01**")
+        assert one[2].content.endswith('Supporting Tool Outputs from Agent\'s Process: {"rows": 1}')
+    assert "refined_text" not in REFINE_PLAIN_TEXT_PROMPT.messages[0].content.split("Key Refinement Guidelines")[0]
+
+
+def test_prompt_token_usage() -> None:
+    reported = AIMessage(content="", usage_metadata={"input_tokens": 5000, "output_tokens": 10, "total_tokens": 5010,
+                                                     "input_token_details": {"cache_read": 4096}})
+    legacy = AIMessage(content="", response_metadata={"token_usage": {"prompt_tokens": 2000,
+                                                                      "prompt_tokens_details": {"cached_tokens": 1024}}})
+    assert prompt_token_usage(reported) == (5000, 4096)
+    assert prompt_token_usage(legacy) == (2000, 1024)
+    assert prompt_token_usage(AIMessage(content="")) is None
+
+    stats = PromptCacheStats()
+    stats.record_messages("swarm", [HumanMessage(content="hi"), reported, legacy, AIMessage(content="")])
+    assert stats.stats()["swarm"] == {"calls": 3, "calls_without_usage": 1, "prompt_tokens": 7000,
+                                      "cached_tokens": 5120, "uncached_tokens": 1880, "hit_rate": 0.7314}
+
+
+def test_swarm_gets_insights_after_the_history_and_usage_is_recorded(monkeypatch) -> None:
+    seen = []
+
+    class FakeSwarm:
+        async def ainvoke(self, state, config=None):
+            seen.extend(state["messages"])
+            usage = {"input_tokens": 3000, "output_tokens": 5, "total_tokens": 3005,
+                     "input_token_details": {"cache_read": 2048}}
+            return {"messages": state["messages"] + [AIMessage(content="Cox offers ...", usage_metadata=usage)]}
+
+    async def fake_dynamic_swarm():
+        return FakeSwarm()
+
+    stats = PromptCacheStats()
+    monkeypatch.setattr(agent, "dynamic_swarm", fake_dynamic_swarm)
+    monkeypatch.setattr(agent, "prompt_cache_stats", stats)
+    state = {
+        "messages": [HumanMessage(content="AT&T plans in 73069?"), AIMessage(content="AT&T offers ..."),
+                     HumanMessage(content="And Cox?")],
+        "internal_context_insights": "The user asks about Cox in 73069.",
+        "schema_turn": 2,
+    }
+
+    update = asyncio.run(agent.run_app_agent_refined(state, {"configurable": {"thread_id": "t1"}}))
+
+    assert [type(m).__name__ for m in seen] == ["HumanMessage", "AIMessage", "SystemMessage", "HumanMessage"]
+    assert isinstance(seen[2], SystemMessage) and seen[2].content == "The user asks about Cox in 73069."
+    assert update["app_output"] == "Cox offers ..."
+    assert stats.stats()["swarm"]["cached_tokens"] == 2048
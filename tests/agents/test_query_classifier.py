@@ -0,0 +1,59 @@
+import json
+
+from backend.agents.dynamic_agents.query_classifier import (NaiveBayesModel, QueryClassifier, SEED_EXAMPLES,
+                                                            load_decision_log, record_contextualizer_decision)
+
+
+def test_rules_decide_trivial_turns() -> None:
+    classifier = QueryClassifier()
+    for query in ["hi", "Thanks!", "thank you so much", "Good morning", "who are you?"]:
+        decision = classifier.classify(query)
+        assert (decision.requires_database_access, decision.source) == (False, "rule"), query
+    for query in ["73069", "73069, 73071", "73069-1234"]:
+        decision = classifier.classify(query)
+        assert (decision.requires_database_access, decision.source) == (True, "rule"), query
+
+
+def test_model_decides_clear_queries_and_defers_the_rest() -> None:
+    classifier = QueryClassifier()
+    decision = classifier.classify("What internet plans are available in 73071?")
+    assert decision.requires_database_access is True and decision.source == "model"
+    # Follow-ups need the conversation, unknown words give the model nothing to go on
+    assert not classifier.classify("what about fiber there?").confident
+    assert not classifier.classify("zorp blarg").confident
+    # Providers and places the model has not seen are not skipped over
+    for query in ["what can you tell me about frontier", "what can you tell me about windstream",
+                  "what are the prices for ziply fiber", "fiber plans in boise"]:
+        assert not classifier.classify(query).confident, query
+
+
+def test_fragments_and_bare_zip_codes_go_to_the_llm_after_the_first_turn() -> None:
+    classifier = QueryClassifier()
+    for query in ["And in 73069?", "73069", "what about in 73071?", "for cox fiber only"]:
+        assert not classifier.classify(query, has_history=True).confident, query
+    assert classifier.classify("73069").requires_database_access is True
+    assert classifier.classify("What internet plans are available in 73071?", has_history=True).confident
+
+
+def test_decisions_are_cached_and_counted() -> None:
+    classifier = QueryClassifier()
+    for query in ["Hi!", "hi", "what about fiber there?"]:
+        classifier.classify(query)
+    stats = classifier.stats()
+    assert stats["queries"] == 3 and stats["cache_hits"] == 1 and stats["cached_queries"] == 2
+    assert stats["skipped"] == 2 and stats["llm"] == 1 and stats["skip_rate"] == round(2 / 3, 4)
+
+
+def test_model_trains_from_the_decision_log(tmp_path) -> None:
+    path = str(tmp_path / "decisions.jsonl")
+    for _ in range(5):
+        record_contextualizer_decision("churn report for q3", True, path=path)
+    with open(path, "a") as f:
+        f.write("not json\n")
+    logged = load_decision_log(path)
+    assert logged == [("churn report for q3", True)] * 5
+    assert json.loads(open(path).readline()) == {"query": "churn report for q3", "requires_database_access": True}
+
+    classifier = QueryClassifier(model=NaiveBayesModel().train(SEED_EXAMPLES + logged))
+    assert not QueryClassifier().classify("churn report for q3").confident
+    assert classifier.classify("churn report for q3").requires_database_access is True
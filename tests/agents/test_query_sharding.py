@@ -0,0 +1,97 @@
+import asyncio
+import re
+
+from backend.agents.dynamic_agents import tools
+from backend.agents.dynamic_agents.query_sharding import (argument_values, estimate_query_cost, merge_results,
+                                                          plan_shards)
+
+ZIPS = [str(73000 + i) for i in range(300)]
+
+
+def packages_query(zips) -> str:
+    return (f'query {{ fetchCompetitivePackages(where: {{zipCodes: "{",".join(zips)}", competitor: "Cox Communications"}}) '
+            f'{{ packages {{ zip packageName provider {{ name }} }} }} }}')
+
+
+def query_zips(query: str):
+    return re.search(r'zipCodes: "([\d,]*)"', query).group(1).split(",")
+
+
+def test_cost_estimate() -> None:
+    cost = estimate_query_cost(packages_query(ZIPS))
+    # The input object in the arguments is not a selection
+    assert cost.list_arguments == {"zipCodes": 300} and cost.depth == 3 and cost.nested_selections == 2
+    assert cost.cost == 300 * 3 * 3
+    assert estimate_query_cost(packages_query(ZIPS[:2])).cost == 18
+    # Literal lists count too; single-value strings do not
+    assert estimate_query_cost('{ f(ids: ["a", "b", "c"], city: "Tulsa, OK") { x } }').list_arguments == {"ids": 3}
+
+
+def test_argument_values() -> None:
+    assert argument_values('{ f(where: {zipCodes: "73034,73102, 73114"}) { x } }', "zipCodes") == [
+        "73034", "73102", "73114"]
+    assert argument_values('{ f(zipCodes: ["73069", "73071"]) { x } }', "zipCodes") == ["73069", "73071"]
+    assert argument_values('{ f(zipCode: 73069) { x } }', "zipCode") == ["73069"]
+    # Variable declarations, variables and aliases are not values
+    query = 'query Q($zipCode: String!) { f(zipCode: $zipCode) { zipCode: zip } g(note: "zipCode: 1") { y } }'
+    assert argument_values(query, "zipCode") == []
+
+
+def test_plan_shards_splits_the_largest_list() -> None:
+    shards = plan_shards(packages_query(ZIPS), max_cost=1000)
+    assert len(shards) == 3
+    assert [z for shard in shards for z in query_zips(shard)] == ZIPS
+    assert all('competitor: "Cox Communications"' in shard for shard in shards)
+
+    assert plan_shards(packages_query(ZIPS[:2]), max_cost=1000) == [packages_query(ZIPS[:2])]
+    mutation = 'mutation { tagZips(zipCodes: "' + ",".join(ZIPS) + '") { ok } }'
+    assert plan_shards(mutation, max_cost=10) == [mutation]
+
+    shards = plan_shards('{ f(ids: [' + ", ".join(f'"{z}"' for z in ZIPS) + ']) { a { b } } }', max_cost=300)
+    assert [z for shard in shards for z in re.findall(r'"(\d{5})"', shard)] == ZIPS
+
+
+def test_merge_results_reports_failed_shards() -> None:
+    ok = {"status": "success", "result": {"fetchPackages": {"packages": [1, 2], "market": "OKC"}}, "errors": None}
+    ok2 = {"status": "success", "result": {"fetchPackages": {"packages": [3], "market": "OKC"}}, "errors": None}
+    failed = {"status": "error", "error": "Timeout", "details": "slow"}
+
+    merged = merge_results("q", [ok, failed, ok2])
+    assert merged["result"] == {"fetchPackages": {"packages": [1, 2, 3], "market": "OKC"}}
+    assert merged["shards"] == 3 and merged["shard_errors"] == ["Timeout: slow"]
+    assert merge_results("q", [failed, failed])["status"] == "error"
+
+    counted = [{"status": "success", "result": {"fetchPackages": {"packages": [i], "totalCount": 1, "complete": True}}}
+               for i in range(3)]
+    assert merge_results("q", counted)["result"]["fetchPackages"] == {"packages": [0, 1, 2], "totalCount": 3,
+                                                                      "complete": True}
+    # Only counts are added up, not other integers
+    summary = {"status": "success", "result": {"summary": {"year": 2024, "dmaCode": 650, "count": 3}}}
+    assert merge_results("q", [summary, summary])["result"]["summary"] == {"year": 2024, "dmaCode": 650, "count": 6}
+
+
+def test_executor_shards_under_the_concurrency_limit(monkeypatch) -> None:
+    in_flight = {"now": 0, "max": 0, "requests": 0}
+
+    async def fake_single_query(self, session, query_item):
+        in_flight["now"] += 1
+        in_flight["requests"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        data = {"fetchCompetitivePackages": {"packages": [{"zip": z} for z in query_zips(query_item.query)]}}
+        return {"query_id": query_item.query_id, "status": "success", "result": data, "errors": None}
+
+    monkeypatch.setattr(tools.ParallelGraphQLExecutor, "_execute_single_query", fake_single_query)
+    monkeypatch.setattr(tools, "plan_shards", lambda query: plan_shards(query, max_cost=100))
+    executor = tools.ParallelGraphQLExecutor(endpoint="http://graphql.test", max_concurrency=4,
+                                         validate_zipcodes=False)  # the test ZIP codes are made up
+    queries = [tools.GraphQLQuery(query=packages_query(ZIPS), query_id="all_zips"),
+               tools.GraphQLQuery(query=packages_query(ZIPS[:1]), query_id="one_zip")]
+
+    results = asyncio.run(executor.execute_queries_async(queries))
+
+    assert list(results) == ["all_zips", "one_zip"]
+    assert [p["zip"] for p in results["all_zips"]["result"]["fetchCompetitivePackages"]["packages"]] == ZIPS
+    assert results["all_zips"]["shards"] == 20 and "shards" not in results["one_zip"]
+    assert in_flight["requests"] == 21 and in_flight["max"] == 4
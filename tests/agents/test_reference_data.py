@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from backend.agents.dynamic_agents.reference_data import FileWatcher, deep_sizeof, load_table, snapshot_path
+
+CSV = "code,name,share\n501,New York,1.5\n602,Chicago,\n"
+
+
+class CountingPrepare:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, csv_path: str) -> pd.DataFrame:
+        self.calls += 1
+        df = pd.read_csv(csv_path, dtype={"code": str})
+        df["name"] = df["name"].str.lower()
+        return df
+
+
+def test_snapshot_round_trip(tmp_path) -> None:
+    csv_path = tmp_path / "dmas.csv"
+    csv_path.write_text(CSV)
+    prepare = CountingPrepare()
+
+    first = load_table(str(csv_path), prepare, version="v1")
+    assert os.path.exists(snapshot_path(str(csv_path)))
+    second = load_table(str(csv_path), prepare, version="v1")
+
+    assert prepare.calls == 1
+    assert list(second.columns) == ["code", "name", "share"]
+    assert second["code"].tolist() == ["501", "602"]
+    assert second["name"].tolist() == first["name"].tolist()
+    assert second["share"].iloc[0] == 1.5 and pd.isna(second["share"].iloc[1])
+
+
+def test_snapshot_rebuilt_when_csv_changes(tmp_path) -> None:
+    csv_path = tmp_path / "dmas.csv"
+    csv_path.write_text(CSV)
+    prepare = CountingPrepare()
+    load_table(str(csv_path), prepare, version="v1")
+
+    # Touched but unchanged: the content hash keeps the snapshot
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    load_table(str(csv_path), prepare, version="v1")
+    assert prepare.calls == 1
+
+    csv_path.write_text(CSV + "623,Dallas,2.0\n")
+    df = load_table(str(csv_path), prepare, version="v1")
+    assert prepare.calls == 2
+    assert df["name"].tolist() == ["new york", "chicago", "dallas"]
+
+    load_table(str(csv_path), prepare, version="v2")
+    assert prepare.calls == 3
+
+
+def test_file_watcher_reports_settled_changes(tmp_path) -> None:
+    csv_path = tmp_path / "dmas.csv"
+    csv_path.write_text(CSV)
+    watcher = FileWatcher([str(csv_path)], callback=lambda paths: None)
+    assert watcher.check() == []
+
+    csv_path.write_text(CSV + "623,Dallas,2.0\n")
+    assert watcher.check() == []  # still settling
+    assert watcher.check() == [str(csv_path)]
+    assert watcher.check() == []
+
+
+def test_deep_sizeof_counts_buffers_once() -> None:
+    array = np.zeros(100_000, dtype=np.uint8)
+
+    class Holder:
+        def __init__(self):
+            self.bits = {"ok": array, "ok-again": array}
+            self.rows = [("73069", "norman")] * 1000
+
+    size = deep_sizeof(Holder())
+    assert 100_000 < size < 120_000
+    assert deep_sizeof(pd.DataFrame({"zip": ["73069"] * 1000})) > 1000 * 50
@@ -0,0 +1,221 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+
+from backend.agents.dynamic_agents import agent
+
+
+def sleeping_node(seconds, update=None):
+    async def node(state, config):
+        await asyncio.sleep(seconds)
+        return dict(update or {})
+    return node
+
+
+async def fake_refine(state):
+    timings = agent.summarize_node_timings(state.get("node_timings"))
+    return {"messages": [AIMessage(content="done", custom_data={"trace": {"timings": timings}})]}
+
+
+def test_preparation_nodes_run_in_parallel(monkeypatch) -> None:
+    monkeypatch.setattr(agent, "contextualize_query_node", sleeping_node(0.2, {"internal_context_insights": "ctx"}))
+    monkeypatch.setattr(agent, "prepare_schema_node", sleeping_node(0.2, {"graphql_schema": "schema"}))
+    monkeypatch.setattr(agent, "prefetch_node", sleeping_node(0.2))
+    seen = {}
+
+    async def fake_app_agent(state, config):
+        seen.update(state)
+        return {"app_output": "answer " * 100, "agent_tool_outputs": ["rows"], "data_tool_calls": 1}
+
+    monkeypatch.setattr(agent, "run_app_agent_refined", fake_app_agent)
+    monkeypatch.setattr(agent, "refine_output_refined", fake_refine)
+
+    async def run():
+        graph = await agent.create_refined_agent_workflow(None)
+        started = asyncio.get_running_loop().time()
+        final = await graph.ainvoke({"messages": [HumanMessage(content="hi")]})
+        return final, asyncio.get_running_loop().time() - started
+
+    final, elapsed = asyncio.run(run())
+
+    # The swarm starts once, after all three branches, and sees all their updates
+    assert seen["internal_context_insights"] == "ctx" and seen["graphql_schema"] == "schema"
+    assert elapsed < 0.45
+    nodes = agent.summarize_node_timings(final["node_timings"])["nodes"]
+    assert set(nodes) == {"contextualize_query", "prepare_schema", "prefetch", "app_agent", "refine_output",
+                          "summarize_history", "answer_cache"}
+    timings = final["messages"][-1].custom_data["trace"]["timings"]
+    assert timings["preparation_sequential"] >= 0.6 and timings["preparation_parallel"] < 0.3
+    assert timings["saved"] >= 0.3
+
+
+def test_swarm_does_not_wait_for_the_conversation_summary(monkeypatch) -> None:
+    for node in ("contextualize_query_node", "prepare_schema_node", "prefetch_node"):
+        monkeypatch.setattr(agent, node, sleeping_node(0))
+    monkeypatch.setattr(agent, "summarize_history_node", sleeping_node(1, {"conversation_summary": "* Summary."}))
+    started_at = {}
+
+    async def app_agent(state, config):
+        started_at["app_agent"] = asyncio.get_running_loop().time()
+        return {"app_output": "Hello! How can I help?", "data_tool_calls": 0}
+
+    monkeypatch.setattr(agent, "run_app_agent_refined", app_agent)
+
+    async def run():
+        graph = await agent.create_refined_agent_workflow(None)
+        started = asyncio.get_running_loop().time()
+        final = await graph.ainvoke({"messages": [HumanMessage(content="hi")]})
+        return final, started_at["app_agent"] - started
+
+    final, app_agent_delay = asyncio.run(run())
+
+    assert app_agent_delay < 0.5
+    assert final["conversation_summary"] == "* Summary." and final["messages"][-1].content == "Hello! How can I help?"
+
+
+def test_answers_without_tool_calls_skip_refinement(monkeypatch) -> None:
+    monkeypatch.setattr(agent, "contextualize_query_node", sleeping_node(0, {"requires_schema_flag": False}))
+    monkeypatch.setattr(agent, "prepare_schema_node", sleeping_node(0))
+    monkeypatch.setattr(agent, "prefetch_node", sleeping_node(0))
+    monkeypatch.setattr(agent, "run_app_agent_refined", sleeping_node(
+        0, {"app_output": "Let me check.\n\nHello! How can I help you today?", "data_tool_calls": 0}))
+    refined = []
+
+    async def refine(state):
+        refined.append(state)
+        return {}
+
+    monkeypatch.setattr(agent, "refine_output_refined", refine)
+
+    async def run():
+        graph = await agent.create_refined_agent_workflow(None)
+        return await graph.ainvoke({"messages": [HumanMessage(content="hi")]})
+
+    final = asyncio.run(run())
+
+    assert not refined
+    message = final["messages"][-1]
+    assert message.content == "Hello! How can I help you today?"
+    assert message.custom_data["trace"]["refinement_skipped"] == "no_database_access"
+    assert "finish_output" in final["node_timings"] and final["requires_schema_flag"] is None
+
+
+def test_route_after_app_agent() -> None:
+    long_answer = "x" * 1000
+    assert agent.route_after_app_agent({"app_output": long_answer, "data_tool_calls": 2}) == "refine_output"
+    assert agent.route_after_app_agent({"app_output": long_answer, "data_tool_calls": 0}) == "finish_output"
+    assert agent.route_after_app_agent({"app_output": "Fiber 300 is $55.", "data_tool_calls": 1}) == "finish_output"
+    assert agent.route_after_app_agent({"app_output": "", "data_tool_calls": 0}) == "refine_output"
+
+
+def test_refinement_is_streamed_as_tokens(monkeypatch) -> None:
+    from langchain_core.language_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessageChunk
+
+    answer = "Here are the AT&T plans in 73069:\n\n- Fiber 300: $55/month\n- Fiber 1000: $70/month"
+    monkeypatch.setattr(agent, "REFINE_STREAMING", True)
+    monkeypatch.setattr(agent, "get_telogical_primary_llm",
+                        lambda: GenericFakeChatModel(messages=iter([AIMessage(content=answer)])))
+    monkeypatch.setattr(agent, "contextualize_query_node", sleeping_node(0, {"requires_schema_flag": True}))
+    monkeypatch.setattr(agent, "prepare_schema_node", sleeping_node(0))
+    monkeypatch.setattr(agent, "prefetch_node", sleeping_node(0))
+    monkeypatch.setattr(agent, "run_app_agent_refined", sleeping_node(
+        0, {"app_output": "I searched the database. " + answer * 10, "agent_tool_outputs": ["rows"], "data_tool_calls": 1}))
+
+    async def run():
+        graph = await agent.create_refined_agent_workflow(None)
+        tokens, final = [], None
+        async for mode, event in graph.astream({"messages": [HumanMessage(content="AT&T plans in 73069?")]},
+                                               stream_mode=["messages", "values"]):
+            if mode == "messages" and isinstance(event[0], AIMessageChunk):
+                assert event[1]["langgraph_node"] == "refine_output"
+                tokens.append(event[0].content)
+            elif mode == "values":
+                final = event
+        return tokens, final
+
+    tokens, final = asyncio.run(run())
+
+    assert len(tokens) > 5 and "".join(tokens) == answer
+    message = final["messages"][-1]
+    assert message.content == answer
+    assert message.custom_data["trace"]["tool_calls"] == ["rows"] and "timings" in message.custom_data["trace"]
+
+
+def test_contextualizer_llm_is_skipped_for_trivial_turns(monkeypatch) -> None:
+    def no_llm():
+        raise AssertionError("the contextualizer LLM should not be called")
+
+    monkeypatch.setattr(agent, "CONTEXTUALIZER_FAST_PATH", True)
+    monkeypatch.setattr(agent, "get_telogical_secondary_llm", no_llm)
+    state = {"messages": [HumanMessage(content="Thanks!")]}
+
+    update = asyncio.run(agent.contextualize_query_node(state, {}))
+
+    assert update == {"internal_context_insights": None, "requires_schema_flag": False, "contextualized_query": "Thanks!"}
+
+    # Later turns decided locally are not resolved against the history, so they are no answer cache key
+    state = {"messages": [HumanMessage(content="AT&T fiber prices in 73034?"), AIMessage(content="$55/month."),
+                          HumanMessage(content="What internet plans are available in 73071?")]}
+    update = asyncio.run(agent.contextualize_query_node(state, {}))
+    assert update["requires_schema_flag"] is True and update["contextualized_query"] is None
+
+
+def test_elliptical_follow_up_is_resolved_by_the_contextualizer_llm(monkeypatch) -> None:
+    class ResolvingLLM:
+        def with_structured_output(self, schema):
+            return RunnableLambda(lambda _: schema(contextual_insights="* AT&T fiber prices",
+                                                   requires_database_access=True,
+                                                   standalone_query="What are AT&T fiber prices in 73069?"))
+
+    monkeypatch.setattr(agent, "CONTEXTUALIZER_FAST_PATH", True)
+    monkeypatch.setattr(agent, "get_telogical_secondary_llm", lambda: ResolvingLLM())
+    state = {"messages": [HumanMessage(content="What are AT&T fiber prices in 73034?"),
+                          AIMessage(content="AT&T Fiber 300 is $55/month."), HumanMessage(content="73069")]}
+
+    update = asyncio.run(agent.contextualize_query_node(state, {}))
+
+    assert update["contextualized_query"] == "What are AT&T fiber prices in 73069?"
+
+
+def test_repeated_question_is_answered_from_the_answer_cache(monkeypatch) -> None:
+    from backend.agents.dynamic_agents.answer_cache import AnswerCache
+
+    cache = AnswerCache()
+    monkeypatch.setattr(agent, "answer_cache", cache)
+    monkeypatch.setattr(agent, "ANSWER_CACHE", True)
+    queries = iter(["What are AT&T fiber prices in 73034?", "AT&T fiber prices in zip 73034"])
+
+    async def contextualize(state, config):
+        return {"requires_schema_flag": True, "contextualized_query": next(queries)}
+
+    swarm_runs = []
+
+    async def app_agent(state, config):
+        swarm_runs.append(state["contextualized_query"])
+        return {"app_output": "Let me check.\n\nAT&T Fiber 300 is $55/month.", "agent_tool_outputs": ["rows"],
+                "data_tool_calls": 1}
+
+    monkeypatch.setattr(agent, "contextualize_query_node", contextualize)
+    monkeypatch.setattr(agent, "prepare_schema_node", sleeping_node(0))
+    monkeypatch.setattr(agent, "prefetch_node", sleeping_node(0))
+    monkeypatch.setattr(agent, "run_app_agent_refined", app_agent)
+
+    async def run():
+        graph = await agent.create_refined_agent_workflow(MemorySaver())
+        config = {"configurable": {"thread_id": "t1"}}
+        first = await graph.ainvoke({"messages": [HumanMessage(content="AT&T fiber prices in 73034?")]}, config)
+        second = await graph.ainvoke({"messages": [HumanMessage(content="at&t fiber prices, zip 73034")]}, config)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert swarm_runs == ["What are AT&T fiber prices in 73034?"]
+    assert len(second["messages"]) == 4 and "app_agent" in first["node_timings"]
+    assert second["messages"][-1].content == first["messages"][-1].content == "AT&T Fiber 300 is $55/month."
+    trace = second["messages"][-1].custom_data["trace"]
+    assert trace["answer_cache"]["match"] == "semantic" and trace["tool_calls"] == ["rows"]
+    assert "app_agent" not in second["node_timings"]
+    assert cache.stats()["semantic_hits"] == 1 and cache.stats()["stores"] == 1
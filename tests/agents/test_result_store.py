@@ -0,0 +1,66 @@
+import pytest
+
+from backend.agents.dynamic_agents import tools
+from backend.agents.dynamic_agents.result_store import (
+    ResultStore,
+    find_list_paths,
+    make_preview,
+    resolve_path,
+)
+
+RESULT = {"fetchPackages": {"packages": [{"name": f"P{i}", "provider": "ATT" if i % 2 else "Cox"} for i in range(50)]}}
+
+
+def test_store_is_scoped_per_thread() -> None:
+    store = ResultStore()
+    handle = store.put("t1", RESULT, query_id="q1")
+    assert store.get("t1", handle).data is RESULT
+    assert store.get("t2", handle) is None
+    assert [r["query_id"] for r in store.list("t1")] == ["q1"]
+
+
+def test_store_evicts_least_recently_used() -> None:
+    store = ResultStore(max_bytes_per_thread=100, max_bytes=200)
+    first = store.put("t1", "x", size_bytes=60)
+    second = store.put("t1", "y", size_bytes=60)
+    assert store.get("t1", first) is None and store.get("t1", second) is not None
+
+    store.put("t2", "z", size_bytes=90)
+    store.put("t3", "w", size_bytes=90)
+    assert store.get("t1", second) is None  # oldest thread dropped to stay under max_bytes
+    assert store.total_bytes == 180
+
+
+def test_paths_and_preview() -> None:
+    assert resolve_path(RESULT, "fetchPackages.packages.1.name") == "P1"
+    with pytest.raises(KeyError):
+        resolve_path(RESULT, "fetchPackages.missing")
+    assert find_list_paths(RESULT) == [("fetchPackages.packages", 50)]
+    preview = make_preview(RESULT)["fetchPackages"]["packages"]
+    assert len(preview) == 4 and preview[-1] == "... 47 more items"
+
+
+def test_executor_returns_handles_usable_by_counting(monkeypatch) -> None:
+    async def fake_execute(self, queries, on_result=None):
+        return {q.query_id: {"query_id": q.query_id, "status": "success", "result": RESULT, "errors": None}
+                for q in queries}
+
+    monkeypatch.setattr(tools.ParallelGraphQLExecutor, "execute_queries_async", fake_execute)
+    monkeypatch.setattr(tools, "RESULT_HANDLE_MIN_CHARS", 100)
+    config = {"configurable": {"thread_id": "thread-a"}}
+
+    output = tools.parallel_graphql_executor.invoke({"queries": [{"query": "{ q }", "query_id": "q"}]}, config=config)
+    entry = output["q"]
+    assert "result" not in entry and entry["list_paths"] == {"fetchPackages.packages": 50}
+
+    counted = tools.math_counting_tool.invoke(
+        {"operation": "count_matching", "result_handle": entry["result_handle"], "key": "provider", "value": "ATT"},
+        config=config,
+    )
+    assert counted["matching_count"] == 25
+
+    page = tools.stored_result_reader.invoke(
+        {"result_handle": entry["result_handle"], "path": "fetchPackages.packages", "offset": 48, "fields": ["name"]},
+        config=config,
+    )
+    assert page["items"] == [{"name": "P48"}, {"name": "P49"}] and page["total"] == 50
@@ -0,0 +1,89 @@
+import asyncio
+import operator
+from typing import Annotated, List, Optional, TypedDict
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from backend.agents.dynamic_agents import agent
+from backend.agents.dynamic_agents.schema_cache import (SchemaCache, expand_schema_references, is_schema_ref,
+                                                        migrate_checkpoints, schema_cache, schema_message_content,
+                                                        schema_reference_message, state_size)
+
+SCHEMA = "type Query {\n" + "".join(f"  field{i}(zipCodes: [String]): [Package]  # docs {i}\n" for i in range(1500)) + "}"
+
+
+def test_latest_reference_is_expanded_and_older_ones_dropped() -> None:
+    cache = SchemaCache()
+    old_ref, new_ref = cache.put("type Query { old: Int }"), cache.put("type Query { new: Int }")
+    messages = [schema_reference_message(old_ref), HumanMessage(content="hi"),
+                schema_reference_message(new_ref), AIMessage(content="Hello!")]
+
+    expanded = expand_schema_references(messages, cache=cache)
+
+    assert [type(m) for m in expanded] == [HumanMessage, SystemMessage, AIMessage]
+    assert expanded[1].content == schema_message_content("type Query { new: Int }")
+    # A worker without the text uses the thread's current schema
+    assert expand_schema_references(messages, "type Query { x: Int }", cache=SchemaCache())[1].content \
+        == schema_message_content("type Query { x: Int }")
+
+
+def test_state_holds_a_reference_and_workers_reload_the_text(monkeypatch) -> None:
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        return {"documentation": SCHEMA}
+
+    monkeypatch.setattr(agent, "async_graphql_schema", fetch)
+    config = {"configurable": {"thread_id": "t"}}
+    state = {"messages": [HumanMessage(content="hi")]}
+
+    update = asyncio.run(agent.prepare_schema_node(state, config))
+    assert is_schema_ref(update["graphql_schema"]) and schema_cache.get(update["graphql_schema"]) == SCHEMA
+
+    # Another worker: same reference in the state, empty cache
+    monkeypatch.setattr(agent, "schema_cache", SchemaCache())
+    again = asyncio.run(agent.prepare_schema_node({**state, **update}, config))
+    assert again["graphql_schema"] == update["graphql_schema"] and again["schema_refreshed"] is False
+    assert len(fetches) == 2 and agent.schema_cache.get(update["graphql_schema"]) == SCHEMA
+
+    # A full schema text from an older checkpoint becomes a reference without a fetch
+    legacy = asyncio.run(agent.prepare_schema_node({**state, "graphql_schema": SCHEMA, "schema_turn": 1}, config))
+    assert legacy["graphql_schema"] == update["graphql_schema"] and len(fetches) == 2
+
+
+class LegacyState(TypedDict):
+    messages: Annotated[List[BaseMessage], operator.add]
+    graphql_schema: Optional[str]
+
+
+def test_migration_replaces_schema_copies_in_checkpoints() -> None:
+    def legacy_turn(state):
+        # What run_app_agent_refined wrote before: the full schema, in the state and as a message
+        return {"graphql_schema": SCHEMA,
+                "messages": [SystemMessage(content=schema_message_content(SCHEMA)), AIMessage(content="Hello!")]}
+
+    builder = StateGraph(LegacyState)
+    builder.add_node("turn", legacy_turn)
+    builder.add_edge(START, "turn")
+    builder.add_edge("turn", END)
+    saver = InMemorySaver()
+    graph = builder.compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": "legacy"}}
+
+    async def run():
+        for _ in range(3):
+            await graph.ainvoke({"messages": [HumanMessage(content="plans in 73069?")]}, config)
+        stats = await migrate_checkpoints(saver)
+        return stats, (await graph.aget_state(config)).values
+
+    stats, values = asyncio.run(run())
+
+    assert stats["threads"] == 1 and stats["migrated"] == 1
+    assert is_schema_ref(values["graphql_schema"]) and len(values["messages"]) == 9
+    assert all(SCHEMA not in str(m.content) for m in values["messages"])
+    assert state_size(values, saver) == stats["bytes_after"]
+    # Four copies of the schema (state + three messages) shrink to references
+    assert stats["bytes_after"] * 20 < stats["bytes_before"]
@@ -0,0 +1,66 @@
+import asyncio
+import gc
+import tracemalloc
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from backend.agents.dynamic_agents import agent
+
+
+def fake_schema(counter):
+    async def fetch():
+        counter["fetches"] += 1
+        return {"documentation": "type Query { fetchPackages: [Package] }"}
+    return fetch
+
+
+def test_turns_are_counted_in_the_thread_state(monkeypatch) -> None:
+    counter = {"fetches": 0}
+    monkeypatch.setattr(agent, "async_graphql_schema", fake_schema(counter))
+    state = {"messages": [HumanMessage(content="hi")]}
+    config = {"configurable": {"thread_id": "t1"}}
+
+    updates = []
+    for turn in range(1, agent.MAX_TURNS_BETWEEN_SCHEMA_INJECTION + 2):
+        update = asyncio.run(agent.prepare_schema_node(state, config))
+        updates.append(update)
+        state = {**state, **update}
+
+    assert [u["schema_turn"] for u in updates] == list(range(1, agent.MAX_TURNS_BETWEEN_SCHEMA_INJECTION + 2))
+    # Fetched on the first turn and again once MAX_TURNS_BETWEEN_SCHEMA_INJECTION turns have passed
+    assert counter["fetches"] == 2 and updates[-1]["last_schema_injection_turn"] == updates[-1]["schema_turn"]
+    assert not hasattr(agent, "schema_injection_tracker")
+
+
+def test_threads_from_before_the_state_fields_continue_their_count(monkeypatch) -> None:
+    monkeypatch.setattr(agent, "async_graphql_schema", fake_schema({"fetches": 0}))
+    history = [HumanMessage(content="hi"), AIMessage(content="Hello!"), HumanMessage(content="plans in 73069?")]
+    state = {"messages": history, "graphql_schema": "type Query { x: Int }"}
+
+    update = asyncio.run(agent.prepare_schema_node(state, {"configurable": {"thread_id": "old"}}))
+
+    assert update["schema_turn"] == 2 and update["schema_refreshed"] is False
+
+
+def test_memory_stays_flat_across_many_threads(monkeypatch) -> None:
+    monkeypatch.setattr(agent, "async_graphql_schema", fake_schema({"fetches": 0}))
+    state = {"messages": [HumanMessage(content="hi")], "graphql_schema": "type Query { x: Int }"}
+
+    async def soak(threads: int) -> None:
+        for i in range(threads):
+            await agent.prepare_schema_node(state, {"configurable": {"thread_id": f"thread-{i}"}})
+
+    asyncio.run(soak(1_000))  # warm up caches and the allocator
+    gc.collect()
+    tracemalloc.start()
+    try:
+        asyncio.run(soak(10_000))
+        gc.collect()
+        after_10k = tracemalloc.get_traced_memory()[0]
+        asyncio.run(soak(100_000))
+        gc.collect()
+        after_110k = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # A per-thread entry of even 100 bytes would add about 10 MB here
+    assert after_110k - after_10k < 256 * 1024
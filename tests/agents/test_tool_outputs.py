@@ -0,0 +1,112 @@
+import json
+
+from backend.agents.dynamic_agents.token_budget import count_tokens
+from backend.agents.dynamic_agents.result_store import ResultStore, make_preview
+from backend.agents.dynamic_agents.tool_outputs import (compact_output, resolve_result_handles, select_tool_outputs,
+                                                        selection_metrics)
+
+
+def output(tool, content, status="success"):
+    text = content if isinstance(content, str) else json.dumps(content, indent=2)
+    return {"name": "GraphQLTool", "input": "Query execution", "output": text, "tool": tool, "status": status}
+
+
+def packages(provider, zipcode, count=3):
+    rows = [{"provider": provider, "package": f"{provider} Fiber {i}00", "price": 40 + i, "promotion": None}
+            for i in range(1, count + 1)]
+    return {f"q_{zipcode}": {"query_id": f"q_{zipcode}", "status": "success", "result": {"packages": rows},
+                             "result_handle": "res_abc"}}
+
+
+def test_errors_schema_handoffs_and_duplicates_are_dropped() -> None:
+    entries = [
+        output("transfer_to_reflection_agent", "Successfully transferred to ReflectionAgent"),
+        output("graphql_schema_markdown", "# Schema\n\n## Queries\n..." * 20),
+        output("parallel_graphql_executor", "Error: 1 validation error for ParallelGraphQLExecutorInput", "error"),
+        output("parallel_graphql_executor", packages("AT&T", "73069")),
+        output("parallel_graphql_executor", packages("AT&T", "73069")),
+        output("zipcode_finder_tool", {"error": "ZipCodeFinder is not initialized. Check CSV path and format."}),
+    ]
+
+    selected, stats = select_tool_outputs(entries, "AT&T Fiber 100 is $41.", token_budget=5000)
+
+    assert len(selected) == 1 and "AT&T Fiber 300" in selected[0]
+    assert "result_handle" not in selected[0] and "promotion" not in selected[0]
+    assert stats["dropped"] == {"handoff": 1, "schema": 1, "superseded_retry": 1, "duplicate": 1, "error": 1}
+    assert stats["kept"] == 1 and stats["tokens_after"] < stats["tokens_before"]
+
+
+def test_last_error_is_kept_when_nothing_succeeded() -> None:
+    failed = {"q1": {"query_id": "q1", "status": "error", "error": "Timeout"}}
+    entries = [output("parallel_graphql_executor", failed), output("parallel_graphql_executor", failed)]
+
+    selected, stats = select_tool_outputs(entries, "We are experiencing technical difficulties.", token_budget=5000)
+
+    assert selected == [compact_output(json.dumps(failed))]
+    assert stats["dropped"] == {"error": 1}
+
+
+def test_budget_keeps_outputs_relevant_to_the_answer() -> None:
+    entries = [output("parallel_graphql_executor", packages(provider, zipcode, count=40))
+               for provider, zipcode in [("Cox", "85001"), ("AT&T", "73069"), ("Spectrum", "29056")]]
+    answer = "AT&T offers AT&T Fiber 100 through AT&T Fiber 4000 in 73069."
+    one_output = count_tokens(compact_output(entries[1]["output"]))
+
+    selected, stats = select_tool_outputs(entries, answer, token_budget=one_output + 100)
+
+    assert len(selected) == 1 and '"provider":"AT&T"' in selected[0]
+    assert stats["dropped"] == {"over_budget": 2}
+
+    # With room for a truncated second output, call order is kept
+    selected, stats = select_tool_outputs(entries, answer, token_budget=one_output + 400)
+    assert '"Cox"' in selected[0] and selected[0].endswith("[truncated]") and '"AT&T"' in selected[1]
+    assert stats["truncated"] == 1 and stats["tokens_after"] <= one_output + 400
+
+
+def test_plain_strings_and_disabled_budget() -> None:
+    entries = ["Zip code 73069 is Norman, OK.", "Zip code 73069 is Norman, OK."]
+
+    assert select_tool_outputs(entries, "", token_budget=0)[0] == entries
+    selected, stats = select_tool_outputs(entries, "", token_budget=100)
+    assert selected == ["Zip code 73069 is Norman, OK."] and stats["dropped"] == {"duplicate": 1}
+    metrics = selection_metrics()
+    assert metrics["selections"] >= 1 and metrics["dropped"]["duplicate"] >= 1
+
+
+def test_multi_query_refine_input_stays_within_budget() -> None:
+    # 12 queries of 100 packages each, every one retried once after a validation error, plus schema lookups
+    entries = []
+    for i in range(12):
+        entries.append(output("parallel_graphql_executor", "Error: invalid query, please fix your mistakes.", "error"))
+        entries.append(output("parallel_graphql_executor", packages(f"Provider{i}", f"7{i:04d}", count=100)))
+        entries.append(output("graphql_unified_introspection", {"__schema": {"types": ["Package"] * 200}}))
+    answer = " ".join(f"Provider{i} Fiber 100 costs $41." for i in range(3))
+
+    selected, stats = select_tool_outputs(entries, answer, token_budget=12000)
+
+    assert stats["tokens_before"] > 50000
+    assert stats["tokens_after"] <= 12000
+    assert stats["dropped"]["superseded_retry"] == 12 and stats["dropped"]["schema"] == 12
+    assert all(f"Provider{i} " in "".join(selected) for i in range(3))
+
+
+def test_stored_results_replace_their_previews_for_the_refiner() -> None:
+    store = ResultStore()
+    rows = packages("AT&T", "73069", count=40)["q_73069"]["result"]
+    handle = store.put("t1", rows)
+    stored = {"q_73069": {"query_id": "q_73069", "status": "success", "result_handle": handle,
+                          "result_preview": make_preview(rows), "result_size_chars": 9000,
+                          "list_paths": {"packages": 40}, "note": "The full result is stored server-side."}}
+    gone = {"q_73070": {**stored["q_73069"], "query_id": "q_73070", "result_handle": "res_expired"}}
+    entries = [output("parallel_graphql_executor", stored), output("parallel_graphql_executor", gone), "plain text"]
+
+    resolved = resolve_result_handles(entries, "t1", store=store)
+
+    data = json.loads(resolved[0]["output"])["q_73069"]
+    assert data["result"] == rows and "result_preview" not in data and resolved[0]["tool"] == "parallel_graphql_executor"
+    assert resolved[1] is entries[1] and resolved[2] == "plain text"
+    # Handles only resolve within their thread
+    assert resolve_result_handles(entries, "t2", store=store)[0] is entries[0]
+
+    selected, _ = select_tool_outputs(resolved[:1], "AT&T Fiber 4000 is $80.", token_budget=5000)
+    assert "AT&T Fiber 4000" in selected[0]
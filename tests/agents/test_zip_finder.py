@@ -0,0 +1,144 @@
+import os
+
+import pytest
+
+from backend.agents.dynamic_agents.tools import LocationType, ZipCodeFinder
+
+CSV = """state_fips,state,state_abbr,zipcode,county,city
+40,Oklahoma,OK,73069,Cleveland,Norman
+40,Oklahoma,OK,73071,Cleveland,Norman
+40,Oklahoma,OK,73072,Cleveland,Norman
+40,Oklahoma,OK,73102,Oklahoma,Oklahoma City
+40,Oklahoma,OK,73103,Oklahoma,Oklahoma City
+40,Oklahoma,OK,73104,Oklahoma,Oklahoma City
+40,Oklahoma,OK,73105,Oklahoma,Oklahoma City
+40,Oklahoma,OK,73106,Oklahoma,Oklahoma City
+"""
+
+
+@pytest.fixture
+def geo_csv(tmp_path):
+    path = tmp_path / "geo-data.csv"
+    path.write_text(CSV)
+    return str(path)
+
+
+def test_deterministic_selection_is_stable(geo_csv) -> None:
+    first = ZipCodeFinder(geo_csv, selection_mode="deterministic")
+    second = ZipCodeFinder(geo_csv, selection_mode="deterministic")
+
+    picks = {first.get_zipcode("Norman", LocationType.CITY, "OK") for _ in range(20)}
+    assert len(picks) == 1
+    assert picks == {second.get_zipcode("norman", LocationType.CITY, "ok")}
+    # The state may be given by name or abbreviation
+    assert first._place_key("Norman", LocationType.CITY, "Oklahoma") == "city|norman|ok"
+    assert picks == {first.get_zipcode("Norman", LocationType.CITY, "Oklahoma")}
+
+
+def test_seeded_selection_is_reproducible(geo_csv) -> None:
+    def picks(seed: int) -> list[str]:
+        finder = ZipCodeFinder(geo_csv, selection_mode="seeded", seed=seed)
+        return [finder.get_zipcode("Oklahoma City", LocationType.CITY) for _ in range(10)]
+
+    assert picks(7) == picks(7)
+
+
+def test_representative_zip_wins(geo_csv) -> None:
+    finder = ZipCodeFinder(
+        geo_csv, representative_zips={"city|oklahoma city|": "73104"}
+    )
+
+    assert finder.get_zipcode("Oklahoma City", LocationType.CITY) == "73104"
+    assert finder.get_zipcode("Oklahoma City", LocationType.CITY, "OK") == "73104"
+
+
+def test_get_zipcodes_all_and_sample(geo_csv) -> None:
+    finder = ZipCodeFinder(geo_csv)
+
+    assert finder.get_zipcodes("Oklahoma City", LocationType.CITY) == [
+        "73102", "73103", "73104", "73105", "73106",
+    ]
+    assert finder.get_zipcodes("Oklahoma City", LocationType.CITY, max_zips=3) == [
+        "73102", "73104", "73106",
+    ]
+    assert finder.get_zipcodes("Nowhere", LocationType.CITY) == []
+
+
+def test_finder_reloads_from_snapshot(geo_csv) -> None:
+    fresh = ZipCodeFinder(geo_csv)
+    os.remove(geo_csv.replace(".csv", ".npz"))
+    ZipCodeFinder(geo_csv)
+    from_snapshot = ZipCodeFinder(geo_csv)
+
+    assert from_snapshot.df.equals(fresh.df)
+    assert from_snapshot.get_zipcodes("Norman", LocationType.CITY, "OK") == ["73069", "73071", "73072"]
+
+
+def test_reload_swaps_finder_atomically(geo_csv, monkeypatch) -> None:
+    from backend.agents.dynamic_agents import tools
+
+    monkeypatch.setattr(tools, "ZIP_CODE_CSV_PATH", geo_csv)
+    monkeypatch.setattr(tools, "_shared_zip_finder", None)
+    in_flight = tools.ZipCodeFinderTool()
+
+    with open(geo_csv, "a") as f:
+        f.write("40,Oklahoma,OK,73019,Cleveland,Norman\n")
+    [report] = tools.reload_reference_data(["geo"])
+
+    assert report["status"] == "success" and report["rows"] == 9
+    assert report["build_seconds"] >= 0 and report["memory_bytes"] > 0
+    assert "73019" not in in_flight.finder.get_zipcodes("Norman", LocationType.CITY, "OK")
+    assert "73019" in tools.get_shared_zip_finder().get_zipcodes("Norman", LocationType.CITY, "OK")
+
+
+def test_executor_rejects_unknown_zip_codes(geo_csv, monkeypatch) -> None:
+    import asyncio
+
+    from backend.agents.dynamic_agents import tools
+
+    sent = []
+
+    async def fake_single_query(self, session, query_item):
+        sent.append(query_item.query_id)
+        return {"query_id": query_item.query_id, "status": "success", "result": {}, "errors": None}
+
+    monkeypatch.setattr(tools, "ZIP_CODE_CSV_PATH", geo_csv)
+    monkeypatch.setattr(tools, "_shared_zip_finder", None)
+    monkeypatch.setattr(tools.ParallelGraphQLExecutor, "_execute_single_query", fake_single_query)
+    executor = tools.ParallelGraphQLExecutor(endpoint="http://graphql.test")
+    queries = [
+        tools.GraphQLQuery(query='{ fetchCompetitivePackages(where: {zipCodes: "73069,73070,7307", '
+                                 'competitor: "Cox Communications"}) { packageName } }', query_id="bad"),
+        tools.GraphQLQuery(query='{ fetchMyCurrentPackages(where: {zipCodes: "73069,73102, 73103"}) '
+                                 '{ packageName } }', query_id="good"),
+        # A variable declaration, a variable value and an alias are not ZIP codes
+        tools.GraphQLQuery(query='query Q($zipCode: String!) { fetchLocationDetails(where: {zipCodes: $zipCode}) '
+                                 '{ zipCode: zip city } }', query_id="variables"),
+    ]
+
+    results = asyncio.run(executor.execute_queries_async(queries))
+
+    assert sorted(sent) == ["good", "variables"]
+    bad = results["bad"]
+    assert bad["status"] == "error" and bad["invalid_zipcodes"] == ["73070", "7307"]
+    assert [s["zipcode"] for s in bad["suggestions"]["73070"]["suggestions"]] == ["73069", "73071", "73072"]
+    assert "7307" not in bad["suggestions"]
+
+
+def test_only_zip_fields_of_tool_outputs_are_labelled(geo_csv, monkeypatch) -> None:
+    from backend.agents.dynamic_agents import tools
+
+    monkeypatch.setattr(tools, "ZIP_CODE_CSV_PATH", geo_csv)
+    monkeypatch.setattr(tools, "_shared_zip_finder", None)
+    outputs = [
+        '{"q1": {"status": "success", "result": {"fetchLocationDetails": [{"zipCode": "73102", "city": "Oklahoma City"}], '
+        '"channelCount": 73104, "speed": 73105}}}',
+        "{'where': {'zipCodes': '73069,73071'}}",
+    ]
+
+    labels = tools.label_zip_codes("AT&T prices in 73072? Or 73103", outputs)
+
+    # Known ZIP codes in the query count, numbers that are no ZIP field in the results do not
+    assert list(labels) == ["73072", "73103", "73102", "73069", "73071"]
+    assert labels["73102"].startswith("Oklahoma City")
+    assert tools.zip_codes_in_tool_outputs(['{"zipCode": 7030}']) == ["07030"]